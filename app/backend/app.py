@@ -1,9 +1,11 @@
 import os
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
-from flask import Flask, send_from_directory
+from flask import Flask
 import logging
 
+logger = logging.getLogger(__name__)
+
 def create_app():
     from config import DevelopmentConfig, TestingConfig, ProductionConfig, Config
     logging.basicConfig(level=getattr(logging, getattr(Config, 'LOG_LEVEL', 'INFO'), logging.INFO))
@@ -19,52 +21,53 @@ def create_app():
     else:
         app.config.from_object(DevelopmentConfig)
 
-    # --- Auto-init DB ---
-    try:
-        from database import init_db
-        init_db()
-        print("[DEBUG] Database initialized (auto-init on app startup)")
-    except Exception as e:
-        print(f"[ERROR] Database initialization failed: {e}")
+    # Schema init: once per process by default, or once per deployment with DB_INIT_ON_STARTUP=false
+    # and `flask init-db` (a preloaded gunicorn master also runs it only once)
+    if app.config.get('DB_INIT_ON_STARTUP'):
+        try:
+            from database import init_db
+            init_db()
+            logger.debug("Database initialized (auto-init on app startup)")
+        except Exception as e:
+            logger.error(f"Database initialization failed: {e}")
+    # Request-scoped sessions are removed when each request's app context ends
+    import database
+    database.init_app(app)
 
     # Import and register blueprints
     from routes.recommend import recommend_bp
     from routes.feedback import feedback_bp
     from routes.train import train_bp
     from routes.plex import plex_bp
-    app.register_blueprint(recommend_bp)
-    print("[DEBUG] Registered blueprint: recommend_bp")
-    app.register_blueprint(feedback_bp)
-    print("[DEBUG] Registered blueprint: feedback_bp")
-    app.register_blueprint(train_bp)
-    print("[DEBUG] Registered blueprint: train_bp")
-    app.register_blueprint(plex_bp)
-    print("[DEBUG] Registered blueprint: plex_bp")
+    from routes.metrics import metrics_bp
+    from routes.similar import similar_bp
+    from routes.poster import poster_bp
+    for blueprint in (recommend_bp, feedback_bp, train_bp, plex_bp, metrics_bp, similar_bp, poster_bp):
+        app.register_blueprint(blueprint)
+        logger.debug(f"Registered blueprint: {blueprint.name}")
+
+    # Compress API responses (see responses.py)
+    import responses
+    responses.init_app(app)
 
     # Register error handlers
     from errors import register_error_handlers
     register_error_handlers(app)
 
+    # Register CLI commands (flask --app app <command>)
+    from commands import register_commands
+    register_commands(app)
+
     # Debug test route
     @app.route('/test')
     def test():
         return {"status": "ok"}
 
-    # Serve frontend index.html at root
-    @app.route('/')
-    def serve_index():
-        # In development, static serving is not needed if using Next.js dev server
-        frontend_dir = os.environ.get('FRONTEND_PATH', os.path.abspath(os.path.join(os.path.dirname(__file__), '../../moodie-next/out')))
-        print(f"[DEBUG] Resolved frontend_dir: {frontend_dir}")
-        return send_from_directory(frontend_dir, 'index.html')
-
-    # Serve static frontend files (js, css, etc.)
-    @app.route('/<path:path>')
-    def serve_static(path):
-        frontend_dir = os.environ.get('FRONTEND_PATH', os.path.abspath(os.path.join(os.path.dirname(__file__), '../../moodie-next/out')))
-        return send_from_directory(frontend_dir, path)
+    # Serve the exported frontend (index built once here, see static_files.py)
+    import static_files
+    static_files.init_app(app)
 
-    print("[DEBUG] Flask app created and all blueprints registered.")
+    logger.debug("Flask app created and all blueprints registered.")
     return app
 
 if __name__ == '__main__':
@@ -0,0 +1,86 @@
+import json
+import os
+import shutil
+import threading
+import time
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CURRENT_POINTER = 'CURRENT'
+
+def write_json(path, data):
+    """Write via a temp file and rename, so readers never see a partial file."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def publish_artifact(directory, version, arrays, meta, keep=3):
+    """
+    Write a versioned artifact directory (one .npy per array plus meta.json),
+    then point CURRENT at it with an atomic rename. Readers pick it up on
+    their next reload check; older versions beyond `keep` are removed.
+    """
+    path = os.path.join(directory, version)
+    os.makedirs(path)
+    for name, array in arrays.items():
+        np.save(os.path.join(path, f'{name}.npy'), array)
+    write_json(os.path.join(path, 'meta.json'), meta)
+    pointer = os.path.join(directory, CURRENT_POINTER)
+    tmp = f'{pointer}.{os.getpid()}.tmp'
+    with open(tmp, 'w') as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, pointer)
+    versions = sorted(d for d in os.listdir(directory) if d.startswith('v') and os.path.isdir(os.path.join(directory, d)))
+    for old in versions[:-keep]:
+        shutil.rmtree(os.path.join(directory, old), ignore_errors=True)
+    return path
+
+def load_artifact(path, names):
+    """(meta, {name: memory-mapped array}) for a published artifact directory."""
+    with open(os.path.join(path, 'meta.json')) as f:
+        meta = json.load(f)
+    return meta, {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r') for name in names}
+
+class ArtifactStore:
+    """
+    The current published artifact in `directory` for this process. The
+    CURRENT pointer is re-read at most every reload_interval seconds and a
+    new version is swapped in (via `loader(path)`) without a restart.
+    """
+    def __init__(self, directory, loader, reload_interval=10):
+        self.directory = directory
+        self.loader = loader
+        self.reload_interval = reload_interval
+        self._artifact = None
+        self._pointer = None
+        self._checked_at = 0
+        self._lock = threading.Lock()
+
+    def current(self):
+        if time.time() - self._checked_at < self.reload_interval:
+            return self._artifact
+        with self._lock:
+            if time.time() - self._checked_at < self.reload_interval:
+                return self._artifact
+            self._checked_at = time.time()
+            try:
+                with open(os.path.join(self.directory, CURRENT_POINTER)) as f:
+                    pointer = f.read().strip()
+            except FileNotFoundError:
+                return self._artifact
+            if pointer and pointer != self._pointer:
+                try:
+                    self._artifact = self.loader(os.path.join(self.directory, pointer))
+                    self._pointer = pointer
+                    logger.info(f"Loaded {self.directory} version {pointer}")
+                except Exception as e:
+                    logger.error(f"Failed to load {self.directory} version {pointer}: {e}")
+            return self._artifact
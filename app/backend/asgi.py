@@ -0,0 +1,157 @@
+"""
+ASGI serving mode, for when Plex is slow enough that waiting on it should
+not cost a worker (run from app/backend):
+
+    uvicorn asgi:app --workers 4 --host 0.0.0.0 --port 8000
+
+Endpoints whose requests spend their time waiting on Plex (status polls and
+poster fetches) are served natively on the event loop through
+plex_async.ASYNC_PLEX, so one worker holds hundreds of them at once. Every
+other route (recommend, feedback, plex connect, train, metrics, the
+frontend) is the unchanged Flask app, run on a pool of ASGI_WSGI_THREADS
+threads per worker: scoring and database work stay off the event loop, and
+a request blocked on Plex (a live-mode recommend, a connect handshake)
+occupies one of those threads instead of a whole process.
+"""
+import asyncio
+import logging
+import re
+from functools import partial
+from urllib.parse import parse_qsl
+from a2wsgi import WSGIMiddleware
+from itsdangerous import BadSignature
+from werkzeug.http import parse_cookie, parse_etags
+from app import create_app
+from catalog import get_catalog
+from config import Config
+from feedback_queue import FEEDBACK_WRITER
+from plex_async import ASYNC_PLEX
+from responses import JSON_MIMETYPE, body_etag, dumps, etag_matches
+from routes.poster import POSTER_CACHE, poster_cache_control, poster_key, poster_width
+from singleflight import AsyncSingleFlight
+
+logger = logging.getLogger(__name__)
+
+class Request:
+    """The parts of an ASGI HTTP scope the native handlers read."""
+    def __init__(self, scope):
+        self.method = scope['method']
+        self.path = scope['path']
+        self.args = dict(parse_qsl(scope.get('query_string', b'').decode('latin-1')))
+        self.headers = {k.decode('latin-1').lower(): v.decode('latin-1') for k, v in scope['headers']}
+
+    @property
+    def if_none_match(self):
+        return parse_etags(self.headers.get('if-none-match'))
+
+class Response:
+    def __init__(self, body=b'', status=200, headers=None):
+        self.body = body
+        self.status = status
+        self.headers = headers or {}
+
+    async def send(self, send):
+        headers = [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in self.headers.items()]
+        headers.append((b'content-length', str(len(self.body)).encode()))
+        await send({'type': 'http.response.start', 'status': self.status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': self.body})
+
+def json_error(message, status):
+    return Response(dumps({'error': message}), status, {'Content-Type': JSON_MIMETYPE})
+
+class MoodieASGI:
+    def __init__(self, flask_app, threads=64):
+        self.flask_app = flask_app
+        self.wsgi = WSGIMiddleware(flask_app, workers=threads)
+        self.routes = [
+            ('GET', re.compile(r'/api/v1/plex/status/?'), self.plex_status),
+            ('GET', re.compile(r'/api/v1/poster/(?P<media_id>\d+)'), self.poster),
+        ]
+        self.poster_flight = AsyncSingleFlight('poster_asgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] == 'http':
+            for method, pattern, handler in self.routes:
+                match = pattern.fullmatch(scope['path'])
+                if match and scope['method'] == method:
+                    try:
+                        response = await handler(Request(scope), **match.groupdict())
+                    except Exception:
+                        logger.exception(f"500 Internal Server Error: {scope['path']}")
+                        response = json_error('Internal server error', 500)
+                    return await response.send(send)
+        await self.wsgi(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await ASYNC_PLEX.aclose()
+                # Queued feedback is written before the worker exits (also registered atexit, for WSGI servers)
+                await self.run_sync(FEEDBACK_WRITER.close, Config.FEEDBACK_SHUTDOWN_TIMEOUT)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def run_sync(self, fn, *args):
+        """Run a blocking call (database, disk) on the loop's default executor."""
+        return await asyncio.get_running_loop().run_in_executor(None, partial(fn, *args))
+
+    def session(self, request):
+        """The Flask session from the signed cookie, read the way Flask's session interface reads it."""
+        value = parse_cookie(request.headers.get('cookie', '')).get(self.flask_app.config['SESSION_COOKIE_NAME'])
+        serializer = self.flask_app.session_interface.get_signing_serializer(self.flask_app)
+        if not value or serializer is None:
+            return {}
+        try:
+            return serializer.loads(value, max_age=int(self.flask_app.permanent_session_lifetime.total_seconds()))
+        except BadSignature:
+            return {}
+
+    async def plex_status(self, request):
+        """Same answers, ETags and 304s as routes.plex.plex_status, without a thread per poll."""
+        session = self.session(request)
+        data = {'connected': False}
+        if session.get('plex_token'):
+            status = await ASYNC_PLEX.status(session['plex_token'], session.get('plex_server_name'))
+            if status['connected']:
+                data = status
+        body = dumps(data)
+        etag = body_etag(body)
+        headers = {'ETag': f'"{etag}"', 'Vary': 'Accept-Encoding'}
+        if etag_matches(request.if_none_match, etag):
+            return Response(status=304, headers=headers)
+        return Response(body, headers=dict(headers, **{'Content-Type': JSON_MIMETYPE}))
+
+    async def poster(self, request, media_id):
+        """Same as routes.poster.poster: cached on disk, fetched from Plex on a miss (once per key)."""
+        session = self.session(request)
+        token = session.get('plex_token')
+        if not token:
+            return json_error('Not connected to Plex', 401)
+        catalog = await self.run_sync(get_catalog)
+        poster_path = catalog.poster_paths.get(int(media_id))
+        if not poster_path:
+            return json_error('No poster for this item', 404)
+        width = poster_width(request.args.get('w'))
+        key = poster_key(poster_path, width)
+        headers = {'ETag': f'"{key}"', 'Cache-Control': poster_cache_control(poster_path, request.args.get('v'))}
+        if key in request.if_none_match:
+            return Response(status=304, headers=headers)
+        data = await self.run_sync(POSTER_CACHE.get, key)
+        if data is None:
+            async def fetch():
+                fetched = await ASYNC_PLEX.fetch_poster(token, session.get('plex_server_name'), poster_path, width, width * 3 // 2)
+                await self.run_sync(POSTER_CACHE.set, key, fetched)
+                return fetched
+            try:
+                data, _ = await self.poster_flight.do(key, fetch)
+            except Exception as e:
+                logger.warning(f"Poster fetch for media {media_id} failed: {e}")
+                return json_error('Poster unavailable', 502)
+        return Response(data, headers=dict(headers, **{'Content-Type': 'image/jpeg'}))
+
+app = MoodieASGI(create_app(), threads=Config.ASGI_WSGI_THREADS)
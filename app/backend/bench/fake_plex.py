@@ -0,0 +1,217 @@
+"""
+Local stand-in for a Plex Media Server, serving a synthetic library.
+
+Implements the endpoints the app and plexapi use (/, /identity, /library,
+/library/sections, /library/sections/{id}/all with container paging and
+updatedAt filtering, /library/metadata/{keys} and the /photo/:/transcode
+poster resizer), with configurable latency and failure injection. Run it
+standalone and point the app's PLEX_URL at it:
+
+    python -m bench.fake_plex --size 10000 --port 32400 --latency 20
+"""
+import argparse
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qsl
+from xml.sax.saxutils import quoteattr
+from bench.synthetic import LibraryGenerator
+
+SECTIONS = {
+    '1': {'title': 'Movies', 'type': 'movie', 'libtype': '1'},
+    '2': {'title': 'TV Shows', 'type': 'show', 'libtype': '2'},
+}
+MACHINE_IDENTIFIER = 'fake-plex-0000000000000000000000000000'
+UPDATED_AT_BASE = 1700000000
+
+def _attrs(**attrs):
+    return ' '.join(f'{k}={quoteattr(str(v))}' for k, v in attrs.items() if v is not None)
+
+def _tags(tag, values):
+    return ''.join(f'<{tag} {_attrs(tag=v)}/>' for v in (values or '').split(',') if v)
+
+def item_xml(record, section_key):
+    """One library item as Plex returns it: <Video> for movies, <Directory> for shows."""
+    attrs = _attrs(
+        ratingKey=record['plex_id'],
+        key=f"/library/metadata/{record['plex_id']}" + ('/children' if record['type'] == 'show' else ''),
+        type=record['type'],
+        title=record['title'],
+        librarySectionID=section_key,
+        summary=record['summary'],
+        year=record['year'],
+        duration=record['duration'] * 60000,
+        viewCount=record['view_count'] or None,
+        thumb=record['poster_path'],
+        contentRating=record['content_rating'],
+        rating=record['rating'],
+        addedAt=record['updated_at'],
+        updatedAt=record['updated_at'],
+    )
+    if record['type'] == 'show':
+        # Listings carry season/episode counts; without them plexapi reloads each show
+        attrs += ' ' + _attrs(childCount=3, leafCount=30, viewedLeafCount=min(30, record['view_count'] or 0))
+    children = _tags('Genre', record['genres']) + _tags('Role', record['cast'])
+    if record['type'] == 'movie':
+        return f'<Video {attrs}>{children}{_tags("Director", record["directors"])}</Video>'
+    return f'<Directory {attrs}>{children}</Directory>'
+
+class FakePlex:
+    """
+    A synthetic library plus request accounting. `latency` and `jitter` are
+    milliseconds added to every response; `fail_rate` is the fraction of
+    requests answered with a 503.
+    """
+    def __init__(self, size=1000, seed=0, latency=0, jitter=0, fail_rate=0.0, name='Fake Plex'):
+        self.name = name
+        self.latency = latency
+        self.jitter = jitter
+        self.fail_rate = fail_rate
+        self.requests = Counter()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+        records = LibraryGenerator(seed).records(size)
+        for i, record in enumerate(records):
+            record['updated_at'] = UPDATED_AT_BASE + i
+        self.records_by_section = {
+            key: [r for r in records if r['type'] == section['type']] for key, section in SECTIONS.items()
+        }
+
+    def touch(self, count=1):
+        """Bump updatedAt on `count` random items, as edits in Plex would."""
+        with self._lock:
+            now = int(time.time())
+            for records in self.records_by_section.values():
+                for record in self._rng.sample(records, min(count, len(records))):
+                    record['updated_at'] = now
+                    record['view_count'] += 1
+
+    def _delay_and_fail(self):
+        with self._lock:
+            delay = self.latency + self._rng.uniform(0, self.jitter)
+            fail = self._rng.random() < self.fail_rate
+        if delay:
+            time.sleep(delay / 1000)
+        return fail
+
+    def respond(self, path, query, headers):
+        """(status, body) for a request: XML text, or bytes for an image."""
+        self.requests['/library/metadata/{keys}' if path.startswith('/library/metadata/') else path] += 1
+        if self._delay_and_fail():
+            return 503, '<html><body>Service Unavailable</body></html>'
+        if path == '/':
+            return 200, f'<MediaContainer {_attrs(size=0, friendlyName=self.name, machineIdentifier=MACHINE_IDENTIFIER, version="1.40.0.0", platform="Linux", myPlex=0)}/>'
+        if path == '/identity':
+            return 200, f'<MediaContainer {_attrs(size=0, machineIdentifier=MACHINE_IDENTIFIER, version="1.40.0.0")}/>'
+        if path == '/library':
+            dirs = '<Directory key="sections" title="Library Sections"/>'
+            return 200, f'<MediaContainer {_attrs(size=1, title1="Plex Library")}>{dirs}</MediaContainer>'
+        if path == '/library/sections':
+            dirs = ''.join(
+                f'<Directory {_attrs(key=key, title=s["title"], type=s["type"], agent="tv.plex.agents.movie", scanner="Plex Movie", language="en-US", uuid=f"section-{key}")}/>'
+                for key, s in SECTIONS.items()
+            )
+            return 200, f'<MediaContainer {_attrs(size=len(SECTIONS), title1="Plex Library")}>{dirs}</MediaContainer>'
+        if path == '/photo/:/transcode':
+            return 200, self.poster(query)
+        parts = path.strip('/').split('/')
+        if len(parts) == 3 and parts[:2] == ['library', 'metadata']:
+            return self.metadata(parts[2].split(','))
+        if len(parts) == 4 and parts[:2] == ['library', 'sections'] and parts[3] == 'all' and parts[2] in SECTIONS:
+            return 200, self.section_page(parts[2], query, headers)
+        return 404, '<html><body>Not Found</body></html>'
+
+    def metadata(self, rating_keys):
+        """Full items for /library/metadata/{key[,key...]}, as plexapi's reload and batch fetches use."""
+        with self._lock:
+            found = [
+                item_xml(r, key)
+                for key, records in self.records_by_section.items()
+                for r in records if r['plex_id'] in rating_keys
+            ]
+        if not found:
+            return 404, '<html><body>Not Found</body></html>'
+        return 200, f'<MediaContainer {_attrs(size=len(found))}>{"".join(found)}</MediaContainer>'
+
+    def poster(self, query):
+        """Stand-in JPEG bytes for a resized thumb, sized roughly like a real one (~1 byte per 10 pixels)."""
+        width = int(query.get('width') or 300)
+        height = int(query.get('height') or 450)
+        seed = query.get('url', '').encode()
+        return b'\xff\xd8\xff\xe0' + (seed * (width * height // 10 // max(len(seed), 1) + 1))[:width * height // 10] + b'\xff\xd9'
+
+    def section_page(self, section_key, query, headers):
+        with self._lock:
+            records = list(self.records_by_section[section_key])
+        since = query.get('updatedAt>>')
+        if since is not None:
+            records = [r for r in records if r['updated_at'] > int(since)]
+        if query.get('sort', '').split(':')[0] == 'updatedAt':
+            records.sort(key=lambda r: r['updated_at'])
+        start = int(headers.get('X-Plex-Container-Start') or query.get('X-Plex-Container-Start') or 0)
+        size = int(headers.get('X-Plex-Container-Size') or query.get('X-Plex-Container-Size') or len(records))
+        page = records[start:start + size]
+        body = ''.join(item_xml(r, section_key) for r in page)
+        attrs = _attrs(size=len(page), totalSize=len(records), offset=start, librarySectionID=section_key,
+                       librarySectionTitle=SECTIONS[section_key]['title'])
+        return f'<MediaContainer {attrs}>{body}</MediaContainer>'
+
+    def start(self, host='127.0.0.1', port=0):
+        """Serve on a background thread; returns the base URL."""
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                status, body = fake.respond(url.path, dict(parse_qsl(url.query)), self.headers)
+                image = isinstance(body, bytes)
+                data = body if image else body.encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'image/jpeg' if image else 'text/xml;charset=utf-8')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self.url
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=1000, help='Number of library items.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=32400)
+    parser.add_argument('--latency', type=float, default=0, help='Milliseconds added to every response.')
+    parser.add_argument('--jitter', type=float, default=0, help='Extra random milliseconds, uniform in [0, jitter].')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='Fraction of requests answered with 503.')
+    args = parser.parse_args(argv)
+    fake = FakePlex(args.size, args.seed, args.latency, args.jitter, args.fail_rate)
+    print(f"Fake Plex with {args.size} items at {fake.start(args.host, args.port)}", flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        fake.stop()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,243 @@
+"""
+End-to-end load test: the app under gunicorn against a local fake Plex.
+
+For each worker count the app is started under gunicorn with a scratch
+database, and virtual users connect, request recommendations, follow
+pagination cursors and send feedback. Latency percentiles and throughput
+are reported per endpoint. From app/backend:
+
+    python -m bench.load --workers 1,2,4 --concurrency 16 --duration 30
+    python -m bench.load --base-url http://localhost:8000 --plex-url http://localhost:32400
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+import requests
+from bench.fake_plex import FakePlex
+from bench.synthetic import LibraryGenerator
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(pct / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+class Recorder:
+    def __init__(self):
+        self.samples = defaultdict(list)  # endpoint -> [(seconds, ok)]
+        self._lock = threading.Lock()
+
+    def request(self, session, label, method, url, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = session.request(method, url, timeout=60, **kwargs)
+            ok = response.status_code < 400
+        except requests.RequestException:
+            response, ok = None, False
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.samples[label].append((elapsed, ok))
+        return response if ok else None
+
+    def summary(self, wall_seconds):
+        report = {}
+        for label, samples in sorted(self.samples.items()):
+            latencies = sorted(s for s, _ in samples)
+            report[label] = {
+                'requests': len(samples),
+                'errors': sum(1 for _, ok in samples if not ok),
+                'throughput': round(len(samples) / wall_seconds, 2),
+                'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+                'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+                'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+            }
+        total = sum(len(s) for s in self.samples.values())
+        report['total'] = {'requests': total, 'throughput': round(total / wall_seconds, 2)}
+        return report
+
+def virtual_user(base_url, recorder, deadline, users, pages, token, rng):
+    """One client: connect, then loop recommend -> follow cursors -> posters -> feedback until the deadline."""
+    session = requests.Session()
+    posters = set()  # like a browser cache: versioned poster URLs are fetched once
+    if recorder.request(session, 'connect', 'POST', f'{base_url}/api/v1/plex/connect', json={'token': token}) is None:
+        return
+    while time.time() < deadline:
+        answers = rng.choice(users)
+        response = recorder.request(session, 'recommend', 'POST', f'{base_url}/api/v1/recommend?size=3', json=answers)
+        if response is None:
+            continue
+        body = response.json()
+        shown = list(body.get('recommendations', []))
+        cursor = body.get('nextCursor')
+        for _ in range(pages - 1):
+            if not cursor or time.time() >= deadline:
+                break
+            response = recorder.request(session, 'recommend_page', 'POST', f'{base_url}/api/v1/recommend?size=3&cursor={cursor}', json=answers)
+            if response is None:
+                break
+            body = response.json()
+            shown.extend(body.get('recommendations', []))
+            cursor = body.get('nextCursor')
+        for item in shown:
+            url = item.get('posterUrl')
+            if url and url.startswith('/') and url not in posters and time.time() < deadline:
+                posters.add(url)
+                recorder.request(session, 'poster', 'GET', f'{base_url}{url}')
+        if shown:
+            item = rng.choice(shown)
+            recorder.request(session, 'feedback', 'POST', f'{base_url}/api/v1/feedback',
+                             json={'title': item['title'], 'feedback': rng.choice(['up', 'down'])})
+
+def run_load(base_url, concurrency, duration, pages, token, seed=0):
+    users = LibraryGenerator(seed).users(50)
+    recorder = Recorder()
+    deadline = time.time() + duration
+    started = time.perf_counter()
+    threads = [
+        threading.Thread(target=virtual_user, args=(base_url, recorder, deadline, users, pages, token, random.Random(seed + i)))
+        for i in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder.summary(time.perf_counter() - started)
+
+class AppServer:
+    """The app under gunicorn with `workers` workers, configured through the environment."""
+    def __init__(self, workers, env):
+        self.workers = workers
+        self.env = env
+        self.port = free_port()
+        self.process = None
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.port}'
+
+    def start(self, timeout=60):
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-w', str(self.workers), '-b', f'127.0.0.1:{self.port}',
+             '--log-level', 'warning', 'app:create_app()'],
+            cwd=BACKEND_DIR, env=self.env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f'gunicorn exited with status {self.process.returncode}')
+            try:
+                if requests.get(f'{self.url}/test', timeout=1).ok:
+                    return self
+            except requests.RequestException:
+                pass
+            time.sleep(0.2)
+        raise RuntimeError('gunicorn did not come up in time')
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+def app_env(plex_url, workdir, token, source):
+    env = dict(os.environ)
+    env.update({
+        'PLEX_URL': plex_url,
+        'PLEX_TOKEN': token,
+        'PLEX_SYNC_ON_CONNECT': 'false',
+        'DATABASE_URL': f"sqlite:///{os.path.join(workdir, 'app.db')}",
+        'RECOMMEND_CACHE_BACKEND': 'sqlite',
+        'RECOMMEND_CACHE_PATH': os.path.join(workdir, 'cache.db'),
+        'POSTER_CACHE_DIR': os.path.join(workdir, 'posters'),
+        'RECOMMEND_SOURCE': source,
+        'SECRET_KEY': 'load-test',
+        # Production config marks the session cookie Secure, which a plain-HTTP client never sends back
+        'FLASK_ENV': 'development',
+        'LOG_LEVEL': 'WARNING',
+    })
+    return env
+
+def print_report(workers, report):
+    print(f"\n== {workers} worker(s) ==")
+    print(f"{'endpoint':<16}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for label, stats in report.items():
+        if label == 'total':
+            continue
+        print(f"{label:<16}{stats['requests']:>10}{stats['errors']:>8}{stats['throughput']:>10}"
+              f"{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}")
+    print(f"{'total':<16}{report['total']['requests']:>10}{'':>8}{report['total']['throughput']:>10}", flush=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', default='1,2,4', help='Comma-separated gunicorn worker counts to compare.')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent virtual users.')
+    parser.add_argument('--duration', type=float, default=20, help='Seconds of load per worker count.')
+    parser.add_argument('--pages', type=int, default=3, help='Recommendation pages each user views (1 + cursor follow-ups).')
+    parser.add_argument('--size', type=int, default=5000, help='Fake Plex library size.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--plex-latency', type=float, default=0, help='Milliseconds added to every fake Plex response.')
+    parser.add_argument('--plex-jitter', type=float, default=0, help='Extra random fake Plex latency in milliseconds.')
+    parser.add_argument('--plex-fail-rate', type=float, default=0.0, help='Fraction of fake Plex requests failing with 503.')
+    parser.add_argument('--source', choices=['catalog', 'live'], default='catalog', help='RECOMMEND_SOURCE for the app.')
+    parser.add_argument('--token', default='load-test-token')
+    parser.add_argument('--base-url', default=None, help='Load an already running app instead of starting gunicorn.')
+    parser.add_argument('--plex-url', default=None, help='Use an already running Plex (or fake) instead of starting one.')
+    parser.add_argument('--out', default=None, help='Write the reports as JSON to this file.')
+    args = parser.parse_args(argv)
+
+    if args.base_url:
+        report = run_load(args.base_url, args.concurrency, args.duration, args.pages, args.token, args.seed)
+        print_report('external', report)
+        reports = {'external': report}
+    else:
+        fake = None
+        plex_url = args.plex_url
+        if plex_url is None:
+            fake = FakePlex(args.size, args.seed, args.plex_latency, args.plex_jitter, args.plex_fail_rate)
+            plex_url = fake.start()
+        workdir = tempfile.mkdtemp(prefix='moodie-load-')
+        env = app_env(plex_url, workdir, args.token, args.source)
+        reports = {}
+        try:
+            if args.source == 'catalog':
+                # Sync once up front; every worker count then reads the same catalog
+                subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'sync-plex', '--full'],
+                               cwd=BACKEND_DIR, env=env, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            for workers in [int(w) for w in args.workers.split(',')]:
+                server = AppServer(workers, env).start()
+                try:
+                    reports[workers] = run_load(server.url, args.concurrency, args.duration, args.pages, args.token, args.seed)
+                finally:
+                    server.stop()
+                print_report(workers, reports[workers])
+        finally:
+            if fake is not None:
+                print(f"\nFake Plex requests: {dict(fake.requests)}")
+                fake.stop()
+            shutil.rmtree(workdir, ignore_errors=True)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump({'args': vars(args), 'reports': reports}, f, indent=2)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,217 @@
+"""
+Microbenchmarks for the recommendation pipeline on synthetic libraries.
+
+Runs offline against a throwaway SQLite database, so no Plex server or app
+database is needed. From app/backend:
+
+    python -m bench.run --sizes 1k,10k --out bench/results/before.json
+    python -m bench.run --sizes 1k,10k --compare bench/results/before.json
+"""
+import argparse
+import atexit
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# The app reads its database URL at import time: point it at a scratch file first
+_TMPDIR = tempfile.mkdtemp(prefix='moodie-bench-')
+atexit.register(shutil.rmtree, _TMPDIR, True)
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_TMPDIR, 'bench.db')}"
+os.environ.setdefault('RECOMMEND_CACHE_BACKEND', 'memory')
+
+import logging
+import numpy as np
+from bench.synthetic import LibraryGenerator, media_dicts
+from candidates import CandidateIndex
+from database import Media, Recommendation, Feedback, get_session, init_db, reset_db, sync_plex_metadata
+from profiles import get_preferences, profile_from_history, rebuild_profiles, update_profile
+from routes.recommend import filter_media, get_suggestions, score_item
+from scoring import FeatureMatrix, score_batch
+
+SIZES = {'1k': 1000, '10k': 10000, '100k': 100000, '250k': 250000}
+BENCH_SESSION = 'bench-session'
+
+def parse_sizes(value):
+    if value == 'all':
+        return list(SIZES.values())
+    return [SIZES[s] if s in SIZES else int(s) for s in value.split(',')]
+
+def timed(fn, repeat):
+    """Run fn `repeat` times; returns per-run seconds."""
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return times
+
+class Suite:
+    def __init__(self, repeat=5, users=5, seed=0, feedback_events=500):
+        self.repeat = repeat
+        self.generator = LibraryGenerator(seed)
+        self.users = self.generator.users(users)
+        self.feedback_events = feedback_events
+        self.results = []
+
+    def record(self, name, size, times, per=1):
+        times = [t / per for t in times]
+        result = {
+            'name': name,
+            'size': size,
+            'repeat': len(times),
+            'min': min(times),
+            'median': statistics.median(times),
+            'mean': statistics.fmean(times),
+        }
+        self.results.append(result)
+        print(f"{name:<28} {size:>8}  median {result['median'] * 1000:10.3f} ms  min {result['min'] * 1000:10.3f} ms", flush=True)
+        return result
+
+    def each_user(self, fn):
+        return lambda: [fn(user) for user in self.users]
+
+    def run(self, size):
+        records = self.generator.records(size)
+        media = media_dicts(records)
+        n = len(self.users)
+        # Big libraries take seconds per pass; fewer repeats keep the suite usable
+        repeat = self.repeat if size <= 10000 else max(1, self.repeat // 2)
+
+        self.record('filter_media', size, timed(self.each_user(lambda u: filter_media(media, u)), repeat), per=n)
+        index = None
+        def build_index():
+            nonlocal index
+            index = CandidateIndex(media)
+        self.record('candidate_index_build', size, timed(build_index, repeat))
+        self.record('filter_media_indexed', size, timed(self.each_user(lambda u: filter_media(media, u, index=index)), repeat), per=n)
+
+        self.record('score_item', size, timed(self.each_user(lambda u: [score_item(item, u) for item in media]), repeat), per=n)
+        features = None
+        def build_features():
+            nonlocal features
+            features = FeatureMatrix(media)
+        self.record('feature_matrix_build', size, timed(build_features, repeat))
+        self.record('score_batch', size, timed(self.each_user(lambda u: score_batch(features, u)), repeat), per=n)
+        random.seed(0)
+        self.record('get_suggestions_rules', size, timed(self.each_user(lambda u: get_suggestions(media, u)), repeat), per=n)
+        rows = np.arange(len(media))
+        self.record('get_suggestions_vector', size, timed(
+            self.each_user(lambda u: get_suggestions(media, u, features=features, rows=rows)), repeat), per=n)
+
+        self.bench_sync(size, records)
+        self.bench_profiles(size)
+
+    def bench_sync(self, size, records):
+        changed = self.generator.mutate(records)
+        session = get_session()
+        try:
+            def fresh_insert():
+                reset_db()
+                sync_plex_metadata(session, records, prune=False)
+            # Inserting needs an empty table each run, so only the last run's table is kept
+            self.record('sync_insert', size, timed(fresh_insert, 1))
+            self.record('sync_unchanged', size, timed(lambda: sync_plex_metadata(session, records, prune=False), 1))
+            self.record('sync_changed_5pct', size, timed(lambda: sync_plex_metadata(session, changed, prune=False), 1))
+        finally:
+            session.close()
+
+    def bench_profiles(self, size):
+        """Feedback history for one session plus background noise from other sessions."""
+        rng = random.Random(size)
+        session = get_session()
+        try:
+            media_ids = [row[0] for row in session.query(Media.id)]
+            recs = []
+            for event in range(self.feedback_events * 2):
+                session_id = BENCH_SESSION if event % 2 == 0 else f'other-{event % 50}'
+                rec = Recommendation(media_id=rng.choice(media_ids), group_size=session_id, timestamp=datetime.utcnow())
+                rec.feedback = [Feedback(rating=rng.choice([1, 5]), would_watch_again=None)]
+                recs.append(rec)
+            session.add_all(recs)
+            session.commit()
+            self.record('profile_from_history', size, timed(lambda: profile_from_history(session, BENCH_SESSION), self.repeat))
+            rebuild_profiles(session)
+            self.record('get_preferences', size, timed(lambda: get_preferences(BENCH_SESSION), self.repeat))
+            media = session.get(Media, media_ids[0])
+            def feedback_write():
+                update_profile(session, BENCH_SESSION, media, 5, True)
+                session.commit()
+            self.record('update_profile', size, timed(feedback_write, self.repeat))
+        finally:
+            session.close()
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+def compare(results, baseline_path, threshold):
+    """Print median changes against a previous results file; returns names that regressed."""
+    with open(baseline_path) as f:
+        baseline = {(r['name'], r['size']): r for r in json.load(f)['results']}
+    regressions = []
+    print(f"\nCompared with {baseline_path} (regression threshold x{threshold}):")
+    for result in results:
+        before = baseline.get((result['name'], result['size']))
+        if before is None or not before['median']:
+            continue
+        ratio = result['median'] / before['median']
+        flag = '  REGRESSION' if ratio > threshold else ''
+        print(f"{result['name']:<28} {result['size']:>8}  x{ratio:6.2f}{flag}")
+        if flag:
+            regressions.append(f"{result['name']}@{result['size']}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1k,10k', help="Comma-separated sizes (1k, 10k, 100k, 250k or a number), or 'all'.")
+    parser.add_argument('--repeat', type=int, default=5, help='Timed runs per benchmark.')
+    parser.add_argument('--users', type=int, default=5, help='Questionnaire answers scored per run.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the synthetic library.')
+    parser.add_argument('--out', default=None, help='Results file (default bench/results/<git revision>-<time>.json).')
+    parser.add_argument('--compare', default=None, help='Previous results file to compare medians against.')
+    parser.add_argument('--threshold', type=float, default=1.2, help='Slowdown ratio reported as a regression.')
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.INFO)  # the pipeline logs every call at INFO
+    init_db()
+    suite = Suite(repeat=args.repeat, users=args.users, seed=args.seed)
+    for size in parse_sizes(args.sizes):
+        suite.run(size)
+
+    revision = git_revision()
+    out = args.out or os.path.join(os.path.dirname(__file__), 'results', f"{revision or 'local'}-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump({
+            'meta': {
+                'revision': revision,
+                'created_at': datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'numpy': np.__version__,
+                'platform': platform.platform(),
+                'seed': args.seed,
+                'repeat': args.repeat,
+                'users': args.users,
+            },
+            'results': suite.results,
+        }, f, indent=2)
+    print(f"\nWrote {out}")
+    if args.compare:
+        regressions = compare(suite.results, args.compare, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
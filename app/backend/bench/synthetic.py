@@ -0,0 +1,108 @@
+"""
+Seeded generator for synthetic Plex-like libraries.
+
+Records have the same shape plex_item_to_record() produces for sync, so they
+can be fed to sync_plex_metadata() directly, or turned into the dicts the
+recommendation engine scores with media_dicts().
+"""
+import random
+from types import SimpleNamespace
+from catalog import media_to_dict
+
+# Roughly in order of how common they are in a home library
+GENRES = [
+    'Drama', 'Comedy', 'Action', 'Thriller', 'Adventure', 'Crime', 'Romance', 'Science Fiction',
+    'Horror', 'Family', 'Animation', 'Fantasy', 'Mystery', 'Documentary', 'History', 'Biography',
+    'War', 'Music', 'Musical', 'Western', 'Sport', 'Reality', 'Children', 'Talk Show',
+]
+
+SUMMARY_WORDS = (
+    'a the of and to in his her their after when young old city family friends war love life world '
+    'secret journey mission town story team past future house night girl boy man woman must find '
+    'help save fight discover truth escape dangerous new home lost father mother brother sister'
+).split()
+
+# Words that trip the summary mood matcher; they appear in a minority of summaries
+MOOD_WORDS = [
+    'comedy', 'family', 'animation', 'action', 'thriller', 'crime', 'drama', 'romance', 'biography',
+    'musical', 'mystery', 'historical', 'dramatic', 'funny',
+]
+
+CONTENT_RATINGS = ['G', 'PG', 'PG-13', 'R', 'TV-14', 'TV-MA', 'TV-PG', 'NR']
+
+def _zipf_weights(n, s=1.1):
+    return [1 / (rank ** s) for rank in range(1, n + 1)]
+
+class LibraryGenerator:
+    """
+    Builds synthetic libraries. The same seed and size always produce the
+    same library. People pools scale with the library, and appearances are
+    Zipf-distributed, so a few actors and directors recur across many
+    titles as in real libraries.
+    """
+    def __init__(self, seed=0):
+        self.seed = seed
+
+    def records(self, size):
+        rng = random.Random(f'{self.seed}:{size}')
+        genre_weights = _zipf_weights(len(GENRES))
+        actors = [f'Actor {i}' for i in range(max(50, size // 2))]
+        actor_weights = _zipf_weights(len(actors), 1.05)
+        directors = [f'Director {i}' for i in range(max(20, size // 8))]
+        director_weights = _zipf_weights(len(directors), 0.9)
+        records = []
+        for i in range(size):
+            media_type = 'show' if rng.random() < 0.2 else 'movie'
+            if media_type == 'movie':
+                duration = int(min(220, max(60, rng.gauss(108, 22))))
+            else:
+                duration = rng.choice([22, 25, 30, 42, 45, 50, 58])
+            genres = set(rng.choices(GENRES, genre_weights, k=rng.choices([1, 2, 3, 4], [30, 40, 22, 8])[0]))
+            # Most of a library is never watched; a few titles are rewatched a lot
+            view_count = 0 if rng.random() < 0.6 else min(50, int(rng.paretovariate(1.3)))
+            words = rng.choices(SUMMARY_WORDS, k=rng.randint(25, 80))
+            for _ in range(rng.choices([0, 1, 2], [55, 35, 10])[0]):
+                words.insert(rng.randrange(len(words) + 1), rng.choice(MOOD_WORDS))
+            records.append({
+                'plex_id': str(100000 + i),
+                'title': f'{rng.choice(SUMMARY_WORDS).title()} {rng.choice(SUMMARY_WORDS).title()} {i}',
+                'type': media_type,
+                'year': rng.randint(1950, 2025),
+                'genres': ','.join(sorted(genres)),
+                'summary': ' '.join(words).capitalize() + '.',
+                'duration': duration,
+                'view_count': view_count,
+                'last_viewed_at': None,
+                'directors': ','.join(sorted(set(rng.choices(directors, director_weights, k=rng.choice([1, 1, 1, 2]))))),
+                'cast': ','.join(dict.fromkeys(rng.choices(actors, actor_weights, k=rng.randint(4, 15)))),
+                'poster_path': f'/library/metadata/{100000 + i}/thumb/{rng.randint(1500000000, 1750000000)}',
+                'content_rating': rng.choice(CONTENT_RATINGS),
+                'rating': round(rng.uniform(3.0, 9.5), 1),
+            })
+        return records
+
+    def mutate(self, records, fraction=0.05):
+        """Copies of `records` with `fraction` of them changed, as between two syncs."""
+        rng = random.Random(f'{self.seed}:mutate:{len(records)}')
+        changed = [dict(r) for r in records]
+        for record in rng.sample(changed, int(len(changed) * fraction)):
+            record['view_count'] += 1
+            record['rating'] = round(rng.uniform(3.0, 9.5), 1)
+        return changed
+
+    def users(self, count):
+        """Questionnaire answers in the shape recommend() builds them."""
+        from mood_tags import MOOD_TAGS
+        rng = random.Random(f'{self.seed}:users')
+        return [{
+            'time': rng.choice(['under_1h', '1_2h', '2plus', 'open']),
+            'moods': rng.sample(sorted(MOOD_TAGS), rng.randint(0, 2)),
+            'genres': [g.lower() for g in rng.sample(GENRES[:12], rng.choice([0, 0, 1, 2]))],
+            'format': rng.choice(['any', 'any', 'movie', 'show']),
+            'comfortMode': rng.random() < 0.2,
+            'surprise': False,
+        } for _ in range(count)]
+
+def media_dicts(records):
+    """Scoring dicts for records, as the catalog builds them (ids are 1-based row numbers)."""
+    return [media_to_dict(SimpleNamespace(id=i + 1, **record)) for i, record in enumerate(records)]
@@ -0,0 +1,356 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import logging
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+class CacheBackend(ABC):
+    """
+    Key/value cache with a TTL, a size bound and tags. Tags form a secondary
+    index (e.g. session id -> keys) so related entries can be dropped together
+    even though keys themselves are opaque hashes.
+    """
+    def __init__(self, max_entries=1000, ttl=600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, name, n=1):
+        with self._stats_lock:
+            self._stats[name] += n
+
+    @abstractmethod
+    def get(self, key):
+        ...
+
+    @abstractmethod
+    def set(self, key, value, tags=(), ttl=None):
+        ...
+
+    @abstractmethod
+    def delete(self, key):
+        ...
+
+    @abstractmethod
+    def invalidate_tag(self, tag):
+        """Drop every entry stored with `tag`; returns how many were removed."""
+
+    @abstractmethod
+    def clear(self):
+        ...
+
+    @abstractmethod
+    def __len__(self):
+        ...
+
+    def stats(self):
+        """Counters for this process plus the current entry count."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['entries'] = len(self)
+        return stats
+
+class MemoryCache(CacheBackend):
+    """Bounded LRU + TTL cache local to one process."""
+    def __init__(self, max_entries=1000, ttl=600):
+        super().__init__(max_entries, ttl)
+        self._entries = OrderedDict()  # key -> (expires_at, value, tags)
+        self._tags = {}  # tag -> set of keys
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.time():
+                self._remove(key)
+                self._count('expirations')
+                entry = None
+            if entry is None:
+                self._count('misses')
+                return None
+            self._entries.move_to_end(key)
+            self._count('hits')
+            return entry[1]
+
+    def set(self, key, value, tags=(), ttl=None):
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (expires_at, value, tuple(tags))
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self._count('evictions')
+
+    def delete(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def invalidate_tag(self, tag):
+        with self._lock:
+            keys = list(self._tags.get(tag, ()))
+            for key in keys:
+                self._remove(key)
+        self._count('invalidations', len(keys))
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+class SQLiteCache(CacheBackend):
+    """
+    Cache stored in a local SQLite file, so every gunicorn worker on the host
+    shares entries and invalidations. Values are pickled; the file is private
+    to the app and never exposed to clients.
+    """
+    # accessed_at is rewritten on a hit only once it is older than this fraction of the TTL
+    TOUCH_FRACTION = 0.1
+
+    def __init__(self, path, max_entries=1000, ttl=600, namespace='cache'):
+        super().__init__(max_entries, ttl)
+        self.path = path
+        self.namespace = namespace  # table prefix, so several caches can share one file
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.namespace}_entries ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute(f"CREATE INDEX IF NOT EXISTS ix_{self.namespace}_entries_accessed_at ON {self.namespace}_entries (accessed_at)")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS ix_{self.namespace}_entries_expires_at ON {self.namespace}_entries (expires_at)")
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.namespace}_tags ("
+                "tag TEXT NOT NULL, key TEXT NOT NULL, PRIMARY KEY (tag, key))"
+            )
+            conn.execute(f"CREATE INDEX IF NOT EXISTS ix_{self.namespace}_tags_key ON {self.namespace}_tags (key)")
+
+    def _conn(self):
+        # One connection per thread (and per process: reconnect after fork)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _connect(self):
+        """The thread's connection inside a write transaction."""
+        return _Transaction(self._conn())
+
+    def get(self, key):
+        # A plain (deferred) read: lookups from every worker and thread run side by side instead of queueing
+        # on the write lock. Expired rows read as misses and are deleted by the next set().
+        now = time.time()
+        conn = self._conn()
+        row = conn.execute(
+            f"SELECT value, expires_at, accessed_at FROM {self.namespace}_entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or row[1] <= now:
+            self._count('misses')
+            return None
+        if now - row[2] >= self.ttl * self.TOUCH_FRACTION:
+            # LRU order only needs to be roughly right: the access time is written once per slice of the TTL
+            conn.execute(f"UPDATE {self.namespace}_entries SET accessed_at = ? WHERE key = ?", (now, key))
+        self._count('hits')
+        return pickle.loads(row[0])
+
+    def set(self, key, value, tags=(), ttl=None):
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._connect() as conn:
+            conn.execute(f"DELETE FROM {self.namespace}_tags WHERE key = ?", (key,))
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.namespace}_entries (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, blob, expires_at, now),
+            )
+            conn.executemany(f"INSERT OR IGNORE INTO {self.namespace}_tags (tag, key) VALUES (?, ?)", [(t, key) for t in tags])
+            expired = [r[0] for r in conn.execute(f"SELECT key FROM {self.namespace}_entries WHERE expires_at <= ?", (now,))]
+            if expired:
+                self._delete(conn, expired)
+                self._count('expirations', len(expired))
+            overflow = conn.execute(f"SELECT COUNT(*) FROM {self.namespace}_entries").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                lru = [r[0] for r in conn.execute(
+                    f"SELECT key FROM {self.namespace}_entries ORDER BY accessed_at LIMIT ?", (overflow,)
+                )]
+                self._delete(conn, lru)
+                self._count('evictions', len(lru))
+
+    def delete(self, key):
+        with self._connect() as conn:
+            self._delete(conn, [key])
+
+    def _delete(self, conn, keys):
+        conn.executemany(f"DELETE FROM {self.namespace}_entries WHERE key = ?", [(k,) for k in keys])
+        conn.executemany(f"DELETE FROM {self.namespace}_tags WHERE key = ?", [(k,) for k in keys])
+
+    def invalidate_tag(self, tag):
+        with self._connect() as conn:
+            keys = [r[0] for r in conn.execute(f"SELECT key FROM {self.namespace}_tags WHERE tag = ?", (tag,))]
+            self._delete(conn, keys)
+        self._count('invalidations', len(keys))
+        return len(keys)
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute(f"DELETE FROM {self.namespace}_entries")
+            conn.execute(f"DELETE FROM {self.namespace}_tags")
+
+    def __len__(self):
+        return self._conn().execute(f"SELECT COUNT(*) FROM {self.namespace}_entries").fetchone()[0]
+
+class DiskLRUCache(CacheBackend):
+    """
+    Byte values stored as files under `directory`, bounded by total size
+    rather than entry count and shared by every worker on the host. A hit
+    touches the file's mtime, so eviction removes the least recently used
+    files first. Keys are expected to be content-addressed (they change when
+    the value would), so entries never expire and tags are not supported.
+    """
+    def __init__(self, directory, max_bytes=200 * 1024 * 1024):
+        super().__init__(max_entries=None, ttl=None)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._size = None  # (bytes, files) on disk, approximate between scans
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def _scan(self):
+        """[(mtime, size, path)] for every cached file."""
+        files = []
+        for shard in os.scandir(self.directory):
+            if shard.is_dir():
+                for entry in os.scandir(shard.path):
+                    if not entry.name.endswith('.tmp'):
+                        try:
+                            stat = entry.stat()
+                        except FileNotFoundError:
+                            continue
+                        files.append((stat.st_mtime, stat.st_size, entry.path))
+        return files
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            self._count('misses')
+            return None
+        self._count('hits')
+        return value
+
+    def set(self, key, value, tags=(), ttl=None):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(value)
+        os.replace(tmp, path)
+        with self._lock:
+            if self._size is None:
+                files = self._scan()
+                self._size = [sum(size for _, size, _ in files), len(files)]
+            else:
+                self._size[0] += len(value)
+                self._size[1] += 1
+            if self._size[0] > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Other workers write here too: rescan for the real total before removing anything
+        files = sorted(self._scan())
+        total = sum(size for _, size, _ in files)
+        target = self.max_bytes * 0.9  # headroom, so a full cache doesn't rescan on every write
+        removed = 0
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        self._size = [total, len(files) - removed]
+        self._count('evictions', removed)
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def invalidate_tag(self, tag):
+        # Entries are never stored with tags
+        return 0
+
+    def clear(self):
+        with self._lock:
+            for _, _, path in self._scan():
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            self._size = [0, 0]
+
+    def __len__(self):
+        with self._lock:
+            if self._size is None:
+                files = self._scan()
+                self._size = [sum(size for _, size, _ in files), len(files)]
+            return self._size[1]
+
+class _Transaction:
+    """Run a block in one IMMEDIATE transaction on an autocommit sqlite3 connection."""
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+def create_cache(backend='memory', path=None, max_entries=1000, ttl=600, namespace='cache'):
+    """Build the cache backend named in config ('memory' or 'sqlite')."""
+    if backend == 'sqlite':
+        return SQLiteCache(path, max_entries=max_entries, ttl=ttl, namespace=namespace)
+    if backend != 'memory':
+        logger.warning(f"Unknown cache backend '{backend}', using in-process memory cache")
+    return MemoryCache(max_entries=max_entries, ttl=ttl)
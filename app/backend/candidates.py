@@ -0,0 +1,96 @@
+import numpy as np
+from mood_tags import MOOD_TAGS
+
+TIME_BUCKETS = ('under_1h', '1_2h', '2plus')
+
+def time_bucket(duration):
+    """The filter_by_time bucket a duration (minutes) falls in."""
+    if duration <= 60:
+        return 'under_1h'
+    elif duration <= 125:
+        return '1_2h'
+    return '2plus'
+
+def _postings(size, rows_by_key):
+    masks = {}
+    for key, rows in rows_by_key.items():
+        mask = np.zeros(size, dtype=bool)
+        mask[rows] = True
+        masks[key] = mask
+    return masks
+
+class CandidateIndex:
+    """
+    Inverted index over a media list for candidate generation: genre
+    (lowercased), mood, type and duration bucket each map to a boolean row
+    mask, so filter_media's per-item checks become a few mask intersections.
+    Built once per catalog version; the media list must not change after.
+    """
+    def __init__(self, media):
+        self.items = media
+        self.size = len(media)
+        genre_rows = {}
+        type_rows = {}
+        bucket_rows = {bucket: [] for bucket in TIME_BUCKETS}
+        for row, item in enumerate(media):
+            for genre in set(g.lower() for g in item.get('genres', [])):
+                genre_rows.setdefault(genre, []).append(row)
+            type_rows.setdefault(item['type'], []).append(row)
+            bucket_rows[time_bucket(item['duration'])].append(row)
+        self.genres = _postings(self.size, genre_rows)
+        self.types = _postings(self.size, type_rows)
+        self.buckets = _postings(self.size, bucket_rows)
+        self.moods = {mood: self.any_genre(tags) for mood, tags in MOOD_TAGS.items()}
+
+    def none(self):
+        return np.zeros(self.size, dtype=bool)
+
+    def all(self):
+        return np.ones(self.size, dtype=bool)
+
+    def any_genre(self, genres):
+        """Items having at least one of `genres` (lowercased)."""
+        mask = self.none()
+        for genre in genres:
+            if genre in self.genres:
+                mask |= self.genres[genre]
+        return mask
+
+    def format_mask(self, fmt):
+        if fmt == 'any':
+            return self.all()
+        return self.types.get(fmt, self.none())
+
+    def time_mask(self, time_pref):
+        if time_pref in TIME_BUCKETS:
+            return self.buckets[time_pref]
+        return self.all()  # 'open', 'binge', 'any' and unknown values don't filter
+
+    def mood_mask(self, moods):
+        mask = self.none()
+        for mood in moods:
+            if mood in self.moods:
+                mask |= self.moods[mood]
+        return mask
+
+    def filter(self, user):
+        """
+        Rows passing filter_media's checks for `user`, in media order, plus
+        how many items each check rejected. Checks apply in the same order
+        as filter_media, so an item only counts against the first one it fails.
+        """
+        remaining = self.format_mask(user.get('format', 'any'))
+        counts = {'format': self.size - int(np.count_nonzero(remaining))}
+        for name, mask in self._checks(user):
+            passed = remaining & mask
+            counts[name] = int(np.count_nonzero(remaining)) - int(np.count_nonzero(passed))
+            remaining = passed
+        return np.flatnonzero(remaining), counts
+
+    def _checks(self, user):
+        user_genres = set(g.lower() for g in user.get('genres', []))
+        user_moods = [mood for mood in user.get('moods') or [] if MOOD_TAGS.get(mood)]
+        yield 'time', self.time_mask(user.get('time', '1_2h'))
+        yield 'genre', self.any_genre(user_genres) if user_genres else self.all()
+        # Moods only narrow the list when no genres were picked
+        yield 'mood', self.mood_mask(user_moods) if not user_genres and user_moods else self.all()
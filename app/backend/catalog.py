@@ -0,0 +1,221 @@
+import hashlib
+import threading
+import time
+import logging
+import numpy as np
+from datetime import datetime
+from sqlalchemy import func
+from database import get_session, catalog_media, Media
+from summary_index import SummaryIndex
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+def split_tags(value):
+    """Split a comma-separated column into a list of non-empty, stripped tags."""
+    return [t.strip() for t in (value or '').split(',') if t.strip()]
+
+def to_datetime(value):
+    """plexapi returns datetimes, older code paths hand us epoch seconds."""
+    if value is None or isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromtimestamp(value)
+    except Exception:
+        return None
+
+def plex_item_to_record(item):
+    """Map a plexapi Movie/Show object to Media column values."""
+    duration_ms = getattr(item, 'duration', 0) or 0
+    rating = getattr(item, 'rating', None)
+    return {
+        'plex_id': str(getattr(item, 'ratingKey', '')),
+        'title': getattr(item, 'title', ''),
+        'type': item.type,
+        'year': getattr(item, 'year', None),
+        'genres': ','.join(g.tag for g in getattr(item, 'genres', []) or []),
+        'summary': getattr(item, 'summary', '') or '',
+        'duration': int(round(duration_ms / 60000)),
+        'view_count': getattr(item, 'viewCount', 0) or 0,
+        'last_viewed_at': to_datetime(getattr(item, 'lastViewedAt', None)),
+        'directors': ','.join(d.tag for d in getattr(item, 'directors', []) or []),
+        'cast': ','.join(r.tag for r in getattr(item, 'roles', []) or []),
+        'poster_path': getattr(item, 'thumb', None),
+        'content_rating': getattr(item, 'contentRating', None),
+        'rating': float(rating) if rating is not None else None,
+    }
+
+def poster_url(poster_path, plex_base_url, token):
+    """Direct Plex URL (token included); only the live path, which has no Media ids, still uses it."""
+    if poster_path and plex_base_url:
+        return f"{plex_base_url}{poster_path}?X-Plex-Token={token}"
+    return None
+
+def poster_version(poster_path):
+    """Changes whenever Plex's thumb path does (it embeds the artwork's update time)."""
+    return hashlib.sha1(poster_path.encode()).hexdigest()[:12]
+
+def poster_proxy_url(media_id, poster_path, width=None):
+    """Versioned /api/v1/poster URL: safe to cache forever, and no token in the page."""
+    return f"/api/v1/poster/{media_id}?w={width or Config.POSTER_DEFAULT_WIDTH}&v={poster_version(poster_path)}"
+
+def media_to_dict(media):
+    """Build the recommendation-engine dict for a Media row."""
+    view_count = media.view_count or 0
+    return {
+        'id': media.id,
+        'title': media.title,
+        'type': media.type,
+        'genres': split_tags(media.genres),
+        'duration': media.duration or 0,
+        'viewCount': view_count,
+        'lastViewedAt': media.last_viewed_at,
+        'rating': media.rating,
+        'summary': media.summary or '',
+        'posterUrl': None,  # the poster proxy URL, filled in by load_catalog()
+        'year': media.year,
+        'contentRating': media.content_rating,
+        'directors': split_tags(media.directors),
+        'cast': split_tags(media.cast),
+        'unwatched': view_count == 0,
+    }
+
+class Catalog:
+    """Read-only, in-process snapshot of the synced Media table."""
+    def __init__(self, items, poster_paths, marker, version, summary_terms=None):
+        self.items = items
+        self.poster_paths = poster_paths  # Media.id -> Plex thumb path
+        self.summary_terms = summary_terms or {}  # Media.id -> mood tags in its summary
+        self.marker = marker  # (row count, newest last_updated) at load time
+        self.version = version
+        self.loaded_at = time.time()
+        self._features = None
+        self._candidates = None
+        self._features_lock = threading.Lock()
+        self._by_type = {}
+        self._row_by_id = {}
+        self._ids_by_title = {}
+        for row, item in enumerate(items):
+            self._by_type.setdefault(item['type'], []).append(item)
+            self._row_by_id[item['id']] = row
+            self._ids_by_title.setdefault(item['title'], []).append(item['id'])
+
+    def __len__(self):
+        return len(self.items)
+
+    @property
+    def watermark(self):
+        """Time of the most recent sync that touched the catalog."""
+        return self.marker[1]
+
+    def media_for_format(self, fmt):
+        """Mirror the live path, which only pulls the matching library section."""
+        if fmt in ('movie', 'show'):
+            return self._by_type.get(fmt, [])
+        return self.items
+
+    def rows_for(self, items):
+        """Row numbers (positions in self.items) of catalog items."""
+        return np.fromiter((self._row_by_id[item['id']] for item in items), dtype=np.int64, count=len(items))
+
+    def row_for_id(self, media_id):
+        """Row number of a Media id, or -1 when it isn't in this catalog version."""
+        return self._row_by_id.get(media_id, -1)
+
+    def item(self, media_id):
+        row = self._row_by_id.get(media_id)
+        return self.items[row] if row is not None else None
+
+    def ids_for_titles(self, titles):
+        """Media ids of every item with one of `titles`, in the order given."""
+        return [media_id for title in titles for media_id in self._ids_by_title.get(title, ())]
+
+    def features(self):
+        """Scoring FeatureMatrix for this catalog version, built on first use."""
+        if self._features is None:
+            with self._features_lock:
+                if self._features is None:
+                    from scoring import FeatureMatrix
+                    self._features = FeatureMatrix(self.items, self.summary_terms)
+        return self._features
+
+    def candidates(self):
+        """CandidateIndex for filter_media over this catalog version, built on first use."""
+        if self._candidates is None:
+            with self._features_lock:
+                if self._candidates is None:
+                    from candidates import CandidateIndex
+                    self._candidates = CandidateIndex(self.items)
+        return self._candidates
+
+    def staleness(self):
+        watermark = self.watermark
+        return {
+            'source': 'catalog',
+            'version': self.version,
+            'items': len(self.items),
+            'syncedAt': watermark.isoformat() if watermark else None,
+            'ageSeconds': int((datetime.utcnow() - watermark).total_seconds()) if watermark else None,
+        }
+
+def read_catalog_marker(session):
+    """Cheap change detector: any sync insert/update/delete moves one of these."""
+    count, newest = session.query(func.count(Media.id), func.max(Media.last_updated)).filter(catalog_media()).one()
+    return (count, newest)
+
+def load_catalog(session, marker, version, summary_index=None):
+    items = []
+    poster_paths = {}
+    summary_rows = []
+    for media in session.query(Media).filter(catalog_media()).order_by(Media.id):
+        item = media_to_dict(media)
+        if media.poster_path:
+            poster_paths[media.id] = media.poster_path
+            item['posterUrl'] = poster_proxy_url(media.id, media.poster_path)
+        items.append(item)
+        # Rows without a content hash (synced before hashes existed) are keyed on the summary itself
+        summary_rows.append((media.id, media.content_hash or media.summary, media.summary))
+    summary_index = summary_index if summary_index is not None else SummaryIndex()
+    summary_terms, scanned = summary_index.refresh(summary_rows)
+    logger.info(f"Loaded catalog version {version} with {len(items)} items (watermark {marker[1]}, {scanned} summaries indexed)")
+    return Catalog(items, poster_paths, marker, version, summary_terms)
+
+class CatalogStore:
+    """
+    Holds the current Catalog for this process and reloads it when a sync has
+    changed the Media table. The marker query runs at most once per
+    refresh_interval, so steady-state requests never touch the database.
+    """
+    def __init__(self, refresh_interval=30):
+        self.refresh_interval = refresh_interval
+        self._catalog = None
+        self._checked_at = 0
+        self._version = 0
+        self._summary_index = SummaryIndex()
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._catalog is not None and time.time() - self._checked_at < self.refresh_interval:
+            return self._catalog
+        with self._lock:
+            if self._catalog is not None and time.time() - self._checked_at < self.refresh_interval:
+                return self._catalog
+            session = get_session()
+            try:
+                marker = read_catalog_marker(session)
+                if self._catalog is None or marker != self._catalog.marker:
+                    self._version += 1
+                    self._catalog = load_catalog(session, marker, self._version, self._summary_index)
+            finally:
+                session.close()
+            self._checked_at = time.time()
+            return self._catalog
+
+    def invalidate(self):
+        """Force the next get() to re-check the marker (called after a sync)."""
+        self._checked_at = 0
+
+CATALOG_STORE = CatalogStore(refresh_interval=Config.CATALOG_REFRESH_SECONDS)
+
+def get_catalog():
+    return CATALOG_STORE.get()
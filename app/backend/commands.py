@@ -0,0 +1,163 @@
+import click
+
+def register_commands(app):
+    @app.cli.command('sync-plex')
+    @click.option('--full', is_flag=True, help='Re-fetch every item and prune media removed from Plex.')
+    @click.option('--token', envvar='PLEX_TOKEN', help='Plex token (defaults to PLEX_TOKEN).')
+    def sync_plex(full, token):
+        """Run one Plex metadata sync and exit."""
+        from plex_background import PlexBackgroundSync
+        sync = PlexBackgroundSync(token=token)
+        stats = sync.full_sync() if full else sync.incremental_sync()
+        click.echo(f"Synced sections: {stats} ({sum(sync.requests.values())} Plex requests: {sync.requests})")
+
+    @app.cli.command('check-scoring')
+    @click.option('--samples', default=50, help='Number of random user inputs to compare.')
+    @click.option('--seed', default=0, help='Seed for the random inputs.')
+    def check_scoring(samples, seed):
+        """Verify the vectorized scorer and candidate index match the per-item code on the synced catalog."""
+        import random
+        from catalog import get_catalog
+        from mood_tags import MOOD_TAGS
+        from scoring import score_batch
+        from routes.recommend import score_item, filter_media
+        items = get_catalog().items
+        if not items:
+            raise click.ClickException('Catalog is empty; run sync-plex first.')
+        features = get_catalog().features()
+        index = get_catalog().candidates()
+        rng = random.Random(seed)
+        genres = sorted(set(g for item in items for g in item['genres']))
+        genres += [g.lower() for g in genres]
+        for n in range(samples):
+            sample = rng.sample(items, min(len(items), 20))
+            user = {
+                'time': rng.choice(['under_1h', '1_2h', '2plus', 'open', 'any']),
+                'moods': rng.sample(sorted(MOOD_TAGS), rng.randint(0, 2)),
+                'genres': rng.sample(genres, min(len(genres), rng.randint(0, 2))),
+                'format': rng.choice(['any', 'movie', 'show']),
+                'comfortMode': rng.random() < 0.3,
+                'surprise': rng.random() < 0.3,
+            }
+            feedback_map = {item['title']: rng.choice(['up', 'down']) for item in sample[:5]}
+            liked = {
+                'genres': set(g for item in sample[5:8] for g in item['genres']),
+                'directors': set(d for item in sample[5:8] for d in item['directors']),
+                'cast': set(c for item in sample[5:8] for c in item['cast']),
+            }
+            disliked = {
+                'genres': set(g for item in sample[8:10] for g in item['genres']),
+                'directors': set(d for item in sample[8:10] for d in item['directors']),
+                'cast': set(c for item in sample[8:10] for c in item['cast']),
+            }
+            random.seed(n)
+            expected = [score_item(item, user, feedback_map, liked, disliked, user['surprise']) for item in items]
+            random.seed(n)
+            actual = score_batch(features, user, feedback_map, liked, disliked, user['surprise']).tolist()
+            if expected != actual:
+                bad = next(i for i, (e, a) in enumerate(zip(expected, actual)) if e != a)
+                raise click.ClickException(
+                    f"Mismatch for {user} on '{items[bad]['title']}': score_item={expected[bad]} score_batch={actual[bad]}"
+                )
+            expected = [item['id'] for item in filter_media(items, user)]
+            actual = [item['id'] for item in filter_media(items, user, index=index)]
+            if expected != actual:
+                raise click.ClickException(f"Candidate index disagrees with filter_media for {user}")
+        click.echo(f"Vectorized scores and candidates match the per-item code for {samples} inputs over {len(items)} items.")
+
+    @app.cli.command('rebuild-profiles')
+    @click.option('--session-id', default=None, help='Only rebuild this session\'s profile.')
+    def rebuild_profiles_command(session_id):
+        """Recompute preference profiles from the feedback history."""
+        from database import get_session
+        from profiles import rebuild_profiles
+        session = get_session()
+        try:
+            count = rebuild_profiles(session, session_id)
+        finally:
+            session.close()
+        click.echo(f"Rebuilt {count} preference profiles.")
+
+    @app.cli.command('train-model')
+    def train_model_command():
+        """Refit the recommendation model from feedback and publish it (same as POST /api/train)."""
+        from trainer import train
+        try:
+            meta = train()
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        click.echo(f"Published model {meta['version']} trained on {meta['samples']} events: {meta['metrics']}")
+
+    @app.cli.command('build-similar')
+    def build_similar_command():
+        """Rebuild the item-item neighbor table from the catalog and feedback (also runs after syncs and training)."""
+        from similarity import rebuild_similarity
+        meta = rebuild_similarity()
+        click.echo(f"Published similarity table {meta['version']}: {meta['items']} items, {meta['neighbors']} neighbors each, built in {meta['seconds']}s")
+
+    @app.cli.command('compress-frontend')
+    @click.option('--path', default=None, help='Frontend build directory (defaults to FRONTEND_PATH).')
+    def compress_frontend_command(path):
+        """Write .br/.gz variants next to the text files of the frontend build (run after `next build`)."""
+        import os
+        from static_files import precompress
+        root = path or app.config.get('FRONTEND_PATH')
+        if not os.path.isdir(root):
+            raise click.ClickException(f"No frontend build at {root}")
+        click.echo(f"Wrote {precompress(root)} precompressed files under {root}")
+
+    @app.cli.command('migrate')
+    def migrate_command():
+        """Apply pending schema migrations (also runs at app startup and in init-db)."""
+        from database import get_engine
+        from migrations import migrate, applied_versions
+        done = migrate(get_engine())
+        click.echo(f"Applied migrations {done}; schema at version {max(applied_versions(get_engine()), default=0)}.")
+
+    @app.cli.command('explain-queries')
+    @click.option('--verbose', is_flag=True, help='Print every plan, not just the ones that scan.')
+    def explain_queries_command(verbose):
+        """Fail if a hot feedback/recommendation query's plan reads a whole table."""
+        from database import get_session
+        from query_plans import hot_queries, explain
+        session = get_session()
+        failed = []
+        try:
+            for name, statement in hot_queries(session):
+                lines, scans = explain(session, statement)
+                if scans:
+                    failed.append(name)
+                if scans or verbose:
+                    click.echo(f"{name}:" + ''.join(f"\n    {line}" for line in lines))
+        finally:
+            session.rollback()
+            session.close()
+        if failed:
+            raise click.ClickException(f"Full table scans in: {', '.join(failed)}")
+        click.echo('All hot queries use indexes.')
+
+    @app.cli.command('init-db')
+    def init_db_command():
+        """Create tables and apply migrations once, for deployments that run with DB_INIT_ON_STARTUP=false."""
+        from database import get_engine, init_db
+        from migrations import applied_versions
+        init_db()
+        click.echo(f"Database initialized; schema at version {max(applied_versions(get_engine()), default=0)}.")
+
+    @app.cli.command('import-profile')
+    @click.option('--top', default=25, help='How many modules (and packages) to list.')
+    @click.option('--statement', default=None, help='Code to profile (defaults to a worker boot: create_app()).')
+    def import_profile_command(top, statement):
+        """Import cost per module and per package of a fresh worker boot (python -X importtime)."""
+        from import_profile import WORKER_BOOT, import_times, by_package
+        try:
+            rows = import_times(statement or WORKER_BOOT)
+        except RuntimeError as e:
+            raise click.ClickException(str(e))
+        click.echo(f"{len(rows)} modules, {sum(self_us for _, self_us, _ in rows) / 1000:.1f} ms of imports")
+        click.echo(f"\n{'cumulative ms':>14} {'self ms':>8}  module")
+        for module, self_us, cumulative_us in sorted(rows, key=lambda row: row[2], reverse=True)[:top]:
+            click.echo(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>8.1f}  {module}")
+        click.echo(f"\n{'self ms':>14}  package")
+        for package, self_us in by_package(rows)[:top]:
+            click.echo(f"{self_us / 1000:>14.1f}  {package}")
@@ -12,9 +12,97 @@ class Config:
     # Use absolute path for SQLite default
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', f"sqlite:///{os.path.abspath(os.path.join(os.path.dirname(__file__), '../data/app.db'))}")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Connection pool per process: steady connections, extra ones allowed under bursts, how long to wait for
+    # one, max connection age in seconds (-1 keeps them forever) and a liveness check on checkout
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '5'))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', '10'))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', '30'))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', '-1'))
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'false').lower() in ('1', 'true', 'yes')
+    # SQLite only: bytes of the database file memory-mapped for reads, and how long a writer waits for the lock
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+    # Create tables and apply migrations in create_app(); turn off when `flask init-db` runs once per deployment
+    DB_INIT_ON_STARTUP = os.environ.get('DB_INIT_ON_STARTUP', 'true').lower() in ('1', 'true', 'yes')
     LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+    # Fraction of per-item recommendation log lines to emit (DEBUG level only); 0 turns them off
+    LOG_ITEM_SAMPLE_RATE = float(os.environ.get('LOG_ITEM_SAMPLE_RATE', '0'))
     # Optional credential store path
     CREDENTIAL_STORE_PATH = os.environ.get('CREDENTIAL_STORE_PATH', 'credentials.enc')
+    # Where /api/v1/recommend reads media from: 'catalog' (synced Media table) or 'live' (Plex on every request)
+    RECOMMEND_SOURCE = os.environ.get('RECOMMEND_SOURCE', 'catalog')
+    # How often (seconds) a worker checks the Media table for a newer sync
+    CATALOG_REFRESH_SECONDS = int(os.environ.get('CATALOG_REFRESH_SECONDS', '30'))
+    # Recommendation scoring: 'rules' (score_item per item) or 'vector' (NumPy batch, same weights)
+    SCORING_ENGINE = os.environ.get('SCORING_ENGINE', 'rules')
+    # Learned model: artifact directory, how far it can move a score (0 disables it), reload and training limits
+    MODEL_DIR = os.environ.get('MODEL_DIR', os.path.abspath(os.path.join(os.path.dirname(__file__), '../data/models')))
+    MODEL_SCORE_WEIGHT = int(os.environ.get('MODEL_SCORE_WEIGHT', '10'))
+    MODEL_RELOAD_SECONDS = int(os.environ.get('MODEL_RELOAD_SECONDS', '10'))
+    MODEL_MIN_SAMPLES = int(os.environ.get('MODEL_MIN_SAMPLES', '20'))
+    MODEL_KEEP_VERSIONS = int(os.environ.get('MODEL_KEEP_VERSIONS', '3'))
+    # Item-item similarity: artifact directory, neighbors kept per item, how far neighbors of liked/disliked
+    # titles move a score (0 disables it), tags too common to find candidates through, weight of co-likes
+    SIMILAR_DIR = os.environ.get('SIMILAR_DIR', os.path.abspath(os.path.join(os.path.dirname(__file__), '../data/similar')))
+    SIMILAR_NEIGHBORS = int(os.environ.get('SIMILAR_NEIGHBORS', '20'))
+    SIMILAR_BOOST = int(os.environ.get('SIMILAR_BOOST', '8'))
+    SIMILAR_MAX_TAG_ITEMS = int(os.environ.get('SIMILAR_MAX_TAG_ITEMS', '1000'))
+    SIMILAR_CO_LIKE_WEIGHT = float(os.environ.get('SIMILAR_CO_LIKE_WEIGHT', '0.5'))
+    # How liked/disliked titles move scores: 'attributes' (genre/director/cast overlap with every item) or
+    # 'neighbors' (SIMILAR_BOOST for their neighbors in the similarity table, attributes until one is built)
+    PERSONAL_BOOST = os.environ.get('PERSONAL_BOOST', 'attributes')
+    # Poster proxy: resized widths Plex is asked for (requests snap up to one), the width recommendations
+    # link to, and the on-disk thumbnail cache shared by the workers
+    POSTER_WIDTHS = [int(w) for w in os.environ.get('POSTER_WIDTHS', '120,240,480').split(',')]
+    POSTER_DEFAULT_WIDTH = int(os.environ.get('POSTER_DEFAULT_WIDTH', '240'))
+    POSTER_CACHE_DIR = os.environ.get('POSTER_CACHE_DIR', os.path.abspath(os.path.join(os.path.dirname(__file__), '../data/posters')))
+    POSTER_CACHE_MAX_BYTES = int(os.environ.get('POSTER_CACHE_MAX_BYTES', str(200 * 1024 * 1024)))
+    # API responses: bodies below this many bytes go out uncompressed; brotli/gzip effort for the rest
+    API_COMPRESS_MIN_BYTES = int(os.environ.get('API_COMPRESS_MIN_BYTES', '1024'))
+    API_BROTLI_QUALITY = int(os.environ.get('API_BROTLI_QUALITY', '4'))
+    API_GZIP_LEVEL = int(os.environ.get('API_GZIP_LEVEL', '6'))
+    # Static frontend: the exported Next.js build served at / and how long unhashed files (not _next/static) are cached
+    FRONTEND_PATH = os.environ.get('FRONTEND_PATH', os.path.abspath(os.path.join(os.path.dirname(__file__), '../../moodie-next/out')))
+    FRONTEND_MAX_AGE = int(os.environ.get('FRONTEND_MAX_AGE', '3600'))
+    # Feedback writes: 'queue' (acknowledge, then group-commit in a background thread) or 'sync' (in the request)
+    FEEDBACK_WRITE_MODE = os.environ.get('FEEDBACK_WRITE_MODE', 'queue')
+    # Write-behind queue: events held per worker, events per transaction, how long a batch waits to fill,
+    # how long a request waits for room before getting a 503, and how long shutdown waits to drain
+    FEEDBACK_QUEUE_SIZE = int(os.environ.get('FEEDBACK_QUEUE_SIZE', '10000'))
+    FEEDBACK_BATCH_SIZE = int(os.environ.get('FEEDBACK_BATCH_SIZE', '200'))
+    FEEDBACK_FLUSH_MS = int(os.environ.get('FEEDBACK_FLUSH_MS', '50'))
+    FEEDBACK_ENQUEUE_TIMEOUT_MS = int(os.environ.get('FEEDBACK_ENQUEUE_TIMEOUT_MS', '100'))
+    FEEDBACK_SHUTDOWN_TIMEOUT = int(os.environ.get('FEEDBACK_SHUTDOWN_TIMEOUT', '10'))
+    # Recommendation cache: 'memory' (per worker) or 'sqlite' (one file shared by all workers on the host);
+    # ranking snapshots always use the SQLite file, so a cursor works on every worker
+    RECOMMEND_CACHE_BACKEND = os.environ.get('RECOMMEND_CACHE_BACKEND', 'memory')
+    RECOMMEND_CACHE_PATH = os.environ.get('RECOMMEND_CACHE_PATH', os.path.abspath(os.path.join(os.path.dirname(__file__), '../data/cache.db')))
+    RECOMMEND_CACHE_MAX_ENTRIES = int(os.environ.get('RECOMMEND_CACHE_MAX_ENTRIES', '1000'))
+    RECOMMEND_CACHE_TTL = int(os.environ.get('RECOMMEND_CACHE_TTL', '600'))
+    # Ranking: how many suggestions page 1 ranks up front, and how long/many snapshots are kept for paging
+    RANK_TOP_K = int(os.environ.get('RANK_TOP_K', '100'))
+    RANK_SNAPSHOT_TTL = int(os.environ.get('RANK_SNAPSHOT_TTL', '600'))
+    RANK_SNAPSHOT_MAX_ENTRIES = int(os.environ.get('RANK_SNAPSHOT_MAX_ENTRIES', '1000'))
+    # Background Plex sync: the one account whose library the catalog mirrors (no sync without it),
+    # cadence and page size
+    PLEX_TOKEN = os.environ.get('PLEX_TOKEN')
+    PLEX_SYNC_INTERVAL = int(os.environ.get('PLEX_SYNC_INTERVAL', '3600'))
+    PLEX_FULL_SYNC_INTERVAL = int(os.environ.get('PLEX_FULL_SYNC_INTERVAL', '86400'))
+    PLEX_SYNC_PAGE_SIZE = int(os.environ.get('PLEX_SYNC_PAGE_SIZE', '200'))
+    # Lock file that keeps syncs to one at a time, and the background schedule to one worker, per host
+    PLEX_SYNC_LOCK_PATH = os.environ.get('PLEX_SYNC_LOCK_PATH', os.path.abspath(os.path.join(os.path.dirname(__file__), '../data/plex_sync.lock')))
+    # Metadata hydration: rating keys per /library/metadata request (Plex pages above 100) and concurrent requests
+    PLEX_HYDRATE_BATCH_SIZE = int(os.environ.get('PLEX_HYDRATE_BATCH_SIZE', '50'))
+    PLEX_HYDRATE_WORKERS = int(os.environ.get('PLEX_HYDRATE_WORKERS', '4'))
+    # Start the background sync (with PLEX_TOKEN, never the user's token) after /api/v1/plex/connect
+    PLEX_SYNC_ON_CONNECT = os.environ.get('PLEX_SYNC_ON_CONNECT', 'true').lower() in ('1', 'true', 'yes')
+    # Plex connection reuse: how long a resolved server is trusted, health-check cadence, HTTP pool size
+    PLEX_RESOURCE_TTL = int(os.environ.get('PLEX_RESOURCE_TTL', '300'))
+    PLEX_HEALTH_INTERVAL = int(os.environ.get('PLEX_HEALTH_INTERVAL', '60'))
+    PLEX_POOL_MAXSIZE = int(os.environ.get('PLEX_POOL_MAXSIZE', '10'))
+    # ASGI mode (asgi.py): threads per worker running the Flask routes, and concurrent async Plex connections
+    ASGI_WSGI_THREADS = int(os.environ.get('ASGI_WSGI_THREADS', '64'))
+    ASGI_PLEX_POOL_MAXSIZE = int(os.environ.get('ASGI_PLEX_POOL_MAXSIZE', '100'))
 
 class DevelopmentConfig(Config):
     DEBUG = True
@@ -1,5 +1,4 @@
 import os
-from cryptography.fernet import Fernet, InvalidToken
 from config import Config
 
 class CredentialStore:
@@ -12,11 +11,14 @@ class CredentialStore:
         self.key = os.environ.get(key_env_var)
         if not self.key:
             raise ValueError(f"Encryption key not found in environment variable: {key_env_var}")
+        # cryptography is only loaded once a store is actually used
+        from cryptography.fernet import Fernet
         self.fernet = Fernet(self.key.encode())
 
     @staticmethod
     def generate_key():
         """Generate a new Fernet key (base64-encoded). Store this securely!"""
+        from cryptography.fernet import Fernet
         return Fernet.generate_key().decode()
 
     def save(self, data: dict):
@@ -30,6 +32,7 @@ class CredentialStore:
     def load(self) -> dict:
         """Load and decrypt credentials from file."""
         import json
+        from cryptography.fernet import InvalidToken
         if not os.path.exists(self.filepath):
             return {}
         with open(self.filepath, 'rb') as f:
@@ -1,11 +1,21 @@
 from sqlalchemy import (
-    create_engine, Column, Integer, String, Text, DateTime, Float, Boolean, ForeignKey
+    create_engine, event, inspect, text, select, insert, update, delete, exists, and_,
+    MetaData, Table, Column, Index, Integer, String, Text, DateTime, Float, Boolean, ForeignKey
 )
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import declarative_base, relationship, sessionmaker, scoped_session
 from datetime import datetime
 from sqlalchemy.exc import SQLAlchemyError
+import hashlib
+import json
 import logging
+import os
+import threading
+import time
 from config import Config
+from metrics import SYNC_ITEMS
+from migrations import migrate
 
 Base = declarative_base()
 
@@ -14,23 +24,44 @@ class Media(Base):
     __tablename__ = 'media'
     id = Column(Integer, primary_key=True)
     plex_id = Column(String, unique=True, nullable=False)
-    title = Column(String, nullable=False)
+    title = Column(String, nullable=False, index=True)
     type = Column(String)  # movie or show
     year = Column(Integer)
     genres = Column(String)  # comma-separated
     summary = Column(Text)
     duration = Column(Integer)  # in minutes
-    last_updated = Column(DateTime, default=datetime.utcnow)
+    view_count = Column(Integer, default=0)
+    last_viewed_at = Column(DateTime)
+    directors = Column(Text)  # comma-separated
+    cast = Column(Text)  # comma-separated
+    poster_path = Column(String)  # Plex thumb path, e.g. /library/metadata/1/thumb/123
+    content_rating = Column(String)
+    rating = Column(Float)
+    content_hash = Column(String)  # see media_content_hash(); lets sync skip unchanged rows
+    last_updated = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     # Relationship: one-to-many with Recommendation
     recommendations = relationship(
         'Recommendation', back_populates='media', cascade='all, delete-orphan'
     )
 
+# Feedback on a title the library has not synced creates a placeholder Media row with this plex_id
+# prefix; placeholders carry no metadata and are never catalog items
+PLACEHOLDER_PLEX_ID_PREFIX = 'feedback:'
+
+def placeholder_plex_id(title):
+    return f'{PLACEHOLDER_PLEX_ID_PREFIX}{title}'
+
+def catalog_media():
+    """Filter for the Media rows recommendations draw from: synced movies and shows, no placeholders."""
+    return and_(Media.type.in_(('movie', 'show')), ~Media.plex_id.startswith(PLACEHOLDER_PLEX_ID_PREFIX))
+
 class Recommendation(Base):
     """Stores recommendation history."""
     __tablename__ = 'recommendations'
+    # group_size holds the session id: a session's history and the feedback POST's (media, session) lookup
+    __table_args__ = (Index('ix_recommendations_group_size_media_id', 'group_size', 'media_id'),)
     id = Column(Integer, primary_key=True)
-    media_id = Column(Integer, ForeignKey('media.id'))
+    media_id = Column(Integer, ForeignKey('media.id'), index=True)
     timestamp = Column(DateTime, default=datetime.utcnow)
     mood = Column(String)  # JSON string of mood inputs
     group_size = Column(String)  # solo, couple, group
@@ -46,7 +77,7 @@ class Feedback(Base):
     """Stores user feedback on recommendations."""
     __tablename__ = 'feedback'
     id = Column(Integer, primary_key=True)
-    recommendation_id = Column(Integer, ForeignKey('recommendations.id'))
+    recommendation_id = Column(Integer, ForeignKey('recommendations.id'), index=True)
     watched_completion = Column(Boolean)
     would_watch_again = Column(Boolean)
     rating = Column(Integer)  # 1-5 stars
@@ -54,16 +85,47 @@ class Feedback(Base):
     # Relationship: many-to-one with Recommendation
     recommendation = relationship('Recommendation', back_populates='feedback')
 
-# Session factory
-SessionLocal = scoped_session(sessionmaker(autocommit=False, autoflush=False, bind=None))
+class SyncState(Base):
+    """Per-library-section Plex sync watermark."""
+    __tablename__ = 'sync_state'
+    id = Column(Integer, primary_key=True)
+    section_key = Column(String, unique=True, nullable=False)
+    section_title = Column(String)
+    media_type = Column(String)  # movie or show
+    watermark = Column(Integer, default=0)  # highest Plex updatedAt (epoch seconds) stored
+    last_synced_at = Column(DateTime)
+    last_full_sync_at = Column(DateTime)
+
+class PreferenceProfile(Base):
+    """Per-session feedback profile, updated incrementally as feedback arrives."""
+    __tablename__ = 'preference_profiles'
+    id = Column(Integer, primary_key=True)
+    session_id = Column(String, unique=True, nullable=False)
+    profile = Column(Text)  # JSON: liked/disliked genre, director and cast counts plus title -> up/down
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+# Session factory, bound to the process-wide engine on first use (see get_engine)
+SessionFactory = sessionmaker(autocommit=False, autoflush=False)
+# One session per request, removed at app-context teardown (see init_app)
+SessionLocal = scoped_session(SessionFactory)
 
 def get_session(engine=None):
-    """Get a new SQLAlchemy session bound to the provided or default engine."""
+    """New session on the provided or default engine; the caller closes it (background jobs, CLI)."""
     if engine is None:
-        engine = get_engine()
-    SessionLocal.configure(bind=engine)
+        get_engine()
+        return SessionFactory()
+    return SessionFactory(bind=engine)
+
+def request_session():
+    """The current request's session: shared by everything the request does and closed on teardown."""
+    get_engine()
     return SessionLocal()
 
+def init_app(app):
+    @app.teardown_appcontext
+    def remove_session(exc=None):
+        SessionLocal.remove()
+
 # CRUD utility functions
 
 def add_record(session, record):
@@ -116,16 +178,85 @@ def check_integrity(session):
     """Stub for checking database integrity (to be implemented)."""
     logging.info("Integrity check not implemented.")
 
+_engines = {}  # database URL -> Engine, one per process
+_engines_lock = threading.Lock()
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets readers run alongside the single writer; NORMAL only fsyncs at checkpoints, which is
+    # still safe against corruption in WAL mode; mmap serves reads from the page cache
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA mmap_size={Config.SQLITE_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA busy_timeout={Config.SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+def _create_engine(database_url):
+    options = {'echo': False, 'future': True, 'pool_pre_ping': Config.DB_POOL_PRE_PING}
+    is_sqlite = database_url.startswith('sqlite')
+    in_memory = is_sqlite and (database_url in ('sqlite://', 'sqlite:///:memory:') or 'mode=memory' in database_url)
+    if not in_memory:  # in-memory SQLite uses a single-connection pool that takes no sizing
+        options.update(
+            pool_size=Config.DB_POOL_SIZE,
+            max_overflow=Config.DB_MAX_OVERFLOW,
+            pool_timeout=Config.DB_POOL_TIMEOUT,
+            pool_recycle=Config.DB_POOL_RECYCLE,
+        )
+    engine = create_engine(database_url, **options)
+    if is_sqlite and not in_memory:
+        event.listen(engine, 'connect', _set_sqlite_pragmas)
+    return engine
+
 def get_engine(database_url=None):
-    """Create a SQLAlchemy engine using the provided or default database URL."""
+    """
+    The process-wide engine (and connection pool) for the provided or default
+    database URL, created on first use. The default one is also what
+    get_session() and request_session() bind to.
+    """
     if database_url is None:
         database_url = Config.SQLALCHEMY_DATABASE_URI
-    try:
-        engine = create_engine(database_url, echo=False, future=True)
+    engine = _engines.get(database_url)
+    if engine is not None:
         return engine
-    except SQLAlchemyError as e:
-        print(f"Error creating engine: {e}")
-        raise
+    with _engines_lock:
+        engine = _engines.get(database_url)
+        if engine is None:
+            try:
+                engine = _engines[database_url] = _create_engine(database_url)
+            except SQLAlchemyError as e:
+                logging.error(f"Error creating engine: {e}")
+                raise
+            if database_url == Config.SQLALCHEMY_DATABASE_URI:
+                SessionFactory.configure(bind=engine)
+    return engine
+
+def _dispose_engines_after_fork():
+    # Pooled connections inherited from the parent (e.g. gunicorn --preload) belong to its sockets and
+    # file handles; drop them without closing so each worker opens its own
+    for engine in _engines.values():
+        engine.dispose(close=False)
+
+os.register_at_fork(after_in_child=_dispose_engines_after_fork)
+
+def add_missing_columns(engine):
+    """
+    Add model columns that are missing from existing tables.
+    create_all() only creates new tables, so databases created before a column
+    was added to a model need an ALTER TABLE to catch up.
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing = set(c['name'] for c in inspector.get_columns(table.name))
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                col_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {col_type}'))
+                logging.info(f"Added column {table.name}.{column.name}")
 
 def init_db(engine=None):
     """Initialize the database and create all tables."""
@@ -133,6 +264,8 @@ def init_db(engine=None):
         engine = get_engine()
     try:
         Base.metadata.create_all(engine)
+        add_missing_columns(engine)
+        migrate(engine)
         logging.info("Database tables created successfully.")
     except SQLAlchemyError as e:
         logging.error(f"Error initializing database: {e}")
@@ -150,43 +283,160 @@ def reset_db(engine=None):
         logging.error(f"Error resetting database: {e}")
         raise
 
-def sync_plex_metadata(session, media_list, media_type='movie'):
+SYNC_CHUNK_SIZE = 500
+# Columns that are not part of a record's content (bookkeeping only)
+_UNHASHED_COLUMNS = ('id', 'last_updated', 'content_hash')
+
+def media_content_hash(item):
+    """Stable hash of a media record's content, used to skip unchanged rows on sync."""
+    content = {k: v for k, v in item.items() if k not in _UNHASHED_COLUMNS}
+    return hashlib.sha1(json.dumps(content, sort_keys=True, default=str).encode()).hexdigest()
+
+def _chunks(rows, size):
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+def _upsert_media(session, rows, existing_ids):
+    """
+    Write new/changed rows. SQLite and Postgres get a single
+    INSERT ... ON CONFLICT (plex_id) DO UPDATE per batch; other dialects fall
+    back to a bulk INSERT plus a bulk UPDATE by primary key.
+    """
+    # executemany needs one parameter shape per statement
+    by_shape = {}
+    for row in rows:
+        by_shape.setdefault(tuple(sorted(row)), []).append(row)
+    dialect = session.get_bind().dialect.name
+    for columns, batch in by_shape.items():
+        if dialect in ('sqlite', 'postgresql'):
+            dialect_insert = sqlite_insert if dialect == 'sqlite' else pg_insert
+            stmt = dialect_insert(Media)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[Media.plex_id],
+                set_={c: stmt.excluded[c] for c in columns if c != 'plex_id'},
+                where=Media.content_hash.is_distinct_from(stmt.excluded.content_hash),
+            )
+            session.execute(stmt, batch)
+        else:
+            new_rows = [r for r in batch if r['plex_id'] not in existing_ids]
+            changed_rows = [dict(r, id=existing_ids[r['plex_id']]) for r in batch if r['plex_id'] in existing_ids]
+            if new_rows:
+                session.execute(insert(Media), new_rows)
+            if changed_rows:
+                session.execute(update(Media), changed_rows)
+
+def sync_plex_metadata(session, media_list, media_type='movie', prune=True, chunk_size=SYNC_CHUNK_SIZE):
     """
     Synchronize Plex metadata (movies or shows) with the database.
-    - Upsert (insert or update) each media item.
-    - Remove DB records not present in the latest Plex data.
+    - Upsert new and changed items in chunks; rows whose content hash is
+      unchanged are skipped entirely.
+    - Remove DB records not present in the latest Plex data (only when prune=True;
+      incremental syncs pass a partial list and must not prune).
     - Maintain relationship integrity.
+    Returns counts of inserted/updated/unchanged/deleted rows and the elapsed seconds.
     """
     logger = logging.getLogger(__name__)
+    started = time.perf_counter()
+    stats = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'deleted': 0}
     try:
-        with session.begin():
-            # Build a set of current Plex IDs
-            plex_ids = set(item['plex_id'] for item in media_list if item.get('plex_id'))
-            # Query all existing media of this type
-            db_media = session.query(Media).filter_by(type=media_type).all()
-            db_ids = set(m.plex_id for m in db_media)
-            # Upsert each item
-            for item in media_list:
-                if not item.get('plex_id'):
-                    continue
-                media = session.query(Media).filter_by(plex_id=item['plex_id']).first()
-                if media:
-                    # Update existing
-                    for k, v in item.items():
-                        setattr(media, k, v)
-                    logger.info(f"Updated {media_type}: {item['title']}")
+        # Last occurrence wins for duplicate Plex IDs, as with the old row-by-row upsert
+        rows = {}
+        for item in media_list:
+            if item.get('plex_id'):
+                rows[item['plex_id']] = item
+        rows = list(rows.values())
+        now = datetime.utcnow()
+        for chunk in _chunks(rows, chunk_size):
+            existing = {
+                plex_id: (media_id, content_hash)
+                for media_id, plex_id, content_hash in session.execute(
+                    select(Media.id, Media.plex_id, Media.content_hash).where(
+                        Media.plex_id.in_([r['plex_id'] for r in chunk])
+                    )
+                )
+            }
+            changed = []
+            for row in chunk:
+                content_hash = media_content_hash(row)
+                if row['plex_id'] not in existing:
+                    stats['inserted'] += 1
+                elif existing[row['plex_id']][1] != content_hash:
+                    stats['updated'] += 1
                 else:
-                    # Insert new
-                    media = Media(**item)
-                    session.add(media)
-                    logger.info(f"Inserted {media_type}: {item['title']}")
-            # Remove DB records not in Plex
-            for media in db_media:
-                if media.plex_id not in plex_ids:
-                    logger.info(f"Deleting {media_type} not found in Plex: {media.title}")
-                    session.delete(media)
-        logger.info(f"Sync complete for {media_type}s. {len(media_list)} items processed.")
+                    stats['unchanged'] += 1
+                    continue
+                changed.append(dict(row, content_hash=content_hash, last_updated=now))
+            if changed:
+                _upsert_media(session, changed, {k: v[0] for k, v in existing.items()})
+        if prune:
+            stats['deleted'] = _delete_media_not_in(session, media_type, [r['plex_id'] for r in rows])
+        session.commit()
+        stats['seconds'] = round(time.perf_counter() - started, 3)
+        for result in ('inserted', 'updated', 'unchanged', 'deleted'):
+            SYNC_ITEMS.inc(stats[result], result=result)
+        logger.info(f"Sync complete for {media_type}s. {len(media_list)} items processed: {stats}")
+        return stats
     except Exception as e:
         session.rollback()
         logger.error(f"Error during {media_type} sync: {e}")
-        raise 
\ No newline at end of file
+        raise
+
+_sync_metadata = MetaData()
+_sync_seen = Table(
+    'sync_seen_plex_ids', _sync_metadata,
+    Column('plex_id', String, primary_key=True),
+    prefixes=['TEMPORARY'],
+)
+
+def _delete_media_not_in(session, media_type, plex_ids):
+    """
+    Set-based prune: load the seen Plex IDs into a temp table and anti-join
+    against Media, deleting dependent feedback/recommendations first (the ORM
+    cascade does not apply to bulk DELETEs). Returns the number of media removed.
+    """
+    conn = session.connection()
+    _sync_seen.create(conn)
+    try:
+        for chunk in _chunks(sorted(set(plex_ids)), SYNC_CHUNK_SIZE):
+            conn.execute(_sync_seen.insert(), [{'plex_id': p} for p in chunk])
+        missing = select(Media.id).where(
+            Media.type == media_type,
+            ~exists().where(_sync_seen.c.plex_id == Media.plex_id),
+        )
+        doomed_recs = select(Recommendation.id).where(Recommendation.media_id.in_(missing))
+        session.execute(delete(Feedback).where(Feedback.recommendation_id.in_(doomed_recs)))
+        session.execute(delete(Recommendation).where(Recommendation.media_id.in_(missing)))
+        deleted = session.execute(delete(Media).where(Media.id.in_(missing))).rowcount
+    finally:
+        _sync_seen.drop(conn)
+    if deleted:
+        logging.getLogger(__name__).info(f"Deleted {deleted} {media_type}s not found in Plex")
+    return deleted
+
+def prune_media(session, media_type, plex_ids):
+    """Remove media of a type whose Plex IDs were not seen by a full sync."""
+    try:
+        deleted = _delete_media_not_in(session, media_type, plex_ids)
+        session.commit()
+        SYNC_ITEMS.inc(deleted, result='deleted')
+        return deleted
+    except Exception as e:
+        session.rollback()
+        logging.error(f"Error pruning {media_type}s: {e}")
+        raise
+
+def get_sync_state(session, section_key, section_title=None, media_type=None):
+    """Get (or create) the sync watermark row for a Plex library section."""
+    state = session.query(SyncState).filter_by(section_key=str(section_key)).first()
+    if not state:
+        state = SyncState(section_key=str(section_key), section_title=section_title, media_type=media_type, watermark=0)
+        add_record(session, state)
+    return state
+
+def save_sync_watermark(session, state, watermark, full=False):
+    """Advance a section's watermark after a page has been committed."""
+    state.watermark = max(state.watermark or 0, watermark)
+    state.last_synced_at = datetime.utcnow()
+    if full:
+        state.last_full_sync_at = state.last_synced_at
+    return update_record(session, state)
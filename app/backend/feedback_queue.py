@@ -0,0 +1,224 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from collections import namedtuple
+from sqlalchemy import or_
+from database import get_session, placeholder_plex_id, Media, Recommendation, Feedback
+from profiles import update_profile
+from config import Config
+from metrics import REGISTRY, FEEDBACK_EVENTS, FEEDBACK_BATCH_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# One thumbs-up/down click; timestamp is when the request arrived, not when the row is written
+FeedbackEvent = namedtuple('FeedbackEvent', 'session_id title rating would_watch_again timestamp')
+
+def feedback_event(session_id, title, feedback_type, timestamp):
+    if feedback_type == 'up':
+        rating, would_watch_again = 5, True
+    elif feedback_type == 'down':
+        rating, would_watch_again = 1, False
+    else:
+        rating, would_watch_again = None, None
+    return FeedbackEvent(session_id, title, rating, would_watch_again, timestamp)
+
+def _resolve_media(session, titles):
+    """Media row per title (the lowest id when titles repeat), creating placeholders for unknown ones."""
+    found = {}
+    for media in session.query(Media).filter(Media.title.in_(titles)).order_by(Media.id):
+        found.setdefault(media.title, media)
+    for title in titles:
+        if title not in found:
+            found[title] = Media(title=title, plex_id=placeholder_plex_id(title), type='movie')
+            session.add(found[title])
+    session.flush()
+    return found
+
+def _resolve_recommendations(session, pairs, timestamps):
+    """Recommendation row per (media_id, session_id), created for pairs that have none."""
+    found = {}
+    session_ids = {session_id for _, session_id in pairs}
+    # IN never matches NULL: cookieless clients' rows (session id None) need their own IS NULL branch
+    in_sessions = Recommendation.group_size.in_(session_ids - {None})
+    if None in session_ids:
+        in_sessions = or_(in_sessions, Recommendation.group_size.is_(None))
+    rows = session.query(Recommendation).filter(
+        in_sessions,
+        Recommendation.media_id.in_({media_id for media_id, _ in pairs}),
+    )
+    for rec in rows.order_by(Recommendation.id):
+        found.setdefault((rec.media_id, rec.group_size), rec)
+    for pair in pairs:
+        if pair not in found:
+            found[pair] = Recommendation(media_id=pair[0], group_size=pair[1], timestamp=timestamps[pair])
+            session.add(found[pair])
+    session.flush()
+    return found
+
+def write_feedback(events):
+    """
+    Write a batch of feedback events in one transaction: Media and
+    Recommendation rows are looked up (or created) for the whole batch in a
+    couple of queries, then each event updates its session's profile and adds
+    its Feedback row in arrival order. Recommendation caches of the affected
+    sessions are invalidated once the commit has succeeded.
+    """
+    session = get_session()
+    try:
+        media = _resolve_media(session, {e.title for e in events})
+        timestamps = {}
+        for e in events:
+            timestamps.setdefault((media[e.title].id, e.session_id), e.timestamp)
+        recs = _resolve_recommendations(session, list(timestamps), timestamps)
+        for e in events:
+            item = media[e.title]
+            # The profile update goes first, so a profile built from history here doesn't count this event twice
+            update_profile(session, e.session_id, item, e.rating, e.would_watch_again)
+            session.add(Feedback(recommendation_id=recs[(item.id, e.session_id)].id, rating=e.rating,
+                                 would_watch_again=e.would_watch_again, timestamp=e.timestamp))
+            session.flush()
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+    # The events are committed: a failure from here on must not make the caller write them again
+    try:
+        from routes.recommend import invalidate_cache_for_session
+        for session_id in {str(e.session_id) for e in events}:
+            invalidate_cache_for_session(session_id)
+    except Exception:
+        logger.exception("Feedback saved, but invalidating cached recommendations failed")
+
+class FeedbackWriter:
+    """
+    Write-behind feedback ingestion. Requests enqueue an event and return;
+    one thread per process takes whatever has queued up (up to batch_size,
+    waiting flush_interval for stragglers) and group-commits it with
+    write_feedback(), so concurrent clicks share a transaction and an fsync
+    instead of queueing on SQLite's write lock. The queue is bounded: when it
+    is full, submit() waits up to enqueue_timeout and then reports failure so
+    the request can be refused. Pending events are written at exit.
+    """
+    _STOP = object()
+
+    def __init__(self, max_size=10000, batch_size=200, flush_interval=0.05, enqueue_timeout=0.1):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        # Started lazily, and again in a forked worker: threads don't survive fork and the parent's queue
+        # may have been copied mid-operation
+        if self._pid == os.getpid() and self._thread is not None:
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None:
+                return
+            self._queue = queue.Queue(maxsize=self.max_size)
+            self._thread = threading.Thread(target=self._run, name='feedback-writer', daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def submit(self, event):
+        """Queue an event; False when the queue stayed full for enqueue_timeout (the caller should back off)."""
+        self._ensure_started()
+        try:
+            self._queue.put(event, timeout=self.enqueue_timeout)
+        except queue.Full:
+            FEEDBACK_EVENTS.inc(result='rejected')
+            return False
+        return True
+
+    def depth(self):
+        return self._queue.qsize() if self._queue is not None and self._pid == os.getpid() else 0
+
+    def _next_batch(self):
+        first = self._queue.get()
+        batch = [first]
+        if first is self._STOP:
+            return batch
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                event = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(event)
+            if event is self._STOP:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            stop = batch[-1] is self._STOP
+            events = batch[:-1] if stop else batch
+            if events:
+                self._write(events)
+            for _ in batch:
+                self._queue.task_done()
+            if stop:
+                return
+
+    def _write(self, events):
+        started = time.perf_counter()
+        try:
+            write_feedback(events)
+            FEEDBACK_EVENTS.inc(len(events), result='written')
+        except Exception as e:
+            # One bad event shouldn't lose the rest of its batch: fall back to a transaction each
+            logger.warning(f"Feedback batch of {len(events)} failed ({e}); writing events one at a time")
+            for event in events:
+                try:
+                    write_feedback([event])
+                    FEEDBACK_EVENTS.inc(result='written')
+                except Exception:
+                    logger.exception(f"Dropping feedback for '{event.title}' from session {event.session_id}")
+                    FEEDBACK_EVENTS.inc(result='failed')
+        FEEDBACK_BATCH_SECONDS.observe(time.perf_counter() - started)
+
+    def flush(self, timeout=None):
+        """Block until every event queued so far has been written (or failed). Returns False on timeout."""
+        if self._queue is None or self._pid != os.getpid():
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def close(self, timeout=None):
+        """Write what is queued and stop the thread (registered to run at interpreter exit)."""
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            return
+        pending = self.depth()
+        self._queue.put(self._STOP)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.error(f"Feedback writer did not finish within {timeout}s; {self.depth()} events lost")
+        elif pending:
+            logger.info(f"Flushed {pending} queued feedback events on shutdown")
+
+FEEDBACK_WRITER = FeedbackWriter(
+    max_size=Config.FEEDBACK_QUEUE_SIZE,
+    batch_size=Config.FEEDBACK_BATCH_SIZE,
+    flush_interval=Config.FEEDBACK_FLUSH_MS / 1000,
+    enqueue_timeout=Config.FEEDBACK_ENQUEUE_TIMEOUT_MS / 1000,
+)
+atexit.register(FEEDBACK_WRITER.close, Config.FEEDBACK_SHUTDOWN_TIMEOUT)
+REGISTRY.collected('moodie_feedback_queue_depth', 'Feedback events waiting to be written in this process.',
+                   callback=lambda: {(): FEEDBACK_WRITER.depth()})
@@ -0,0 +1,37 @@
+"""
+Gunicorn settings, read from the working directory (run gunicorn from
+app/backend, as the Dockerfile does).
+
+The app is built once in the master (preload_app) and workers are forked
+from it, so imports, the static file index and the state warmed in
+when_ready() are shared copy-on-write instead of rebuilt by every worker,
+and a restarted worker is serving as soon as it forks. Whatever holds
+sockets or threads is already per process: engines drop inherited pool
+connections in the child (database.py), and the Plex HTTP session and
+health thread, the feedback writer and the SQLite cache connections are
+created lazily per pid.
+"""
+import gc
+import os
+
+wsgi_app = 'app:create_app()'
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', '4'))
+preload_app = True
+
+def when_ready(server):
+    # Imported lazily by the app, but every worker needs them: load them here once
+    import plexapi.server  # noqa: F401
+    try:
+        from catalog import get_catalog
+        catalog = get_catalog()
+        catalog.features()
+        catalog.candidates()
+    except Exception as e:
+        server.log.warning(f"Catalog not preloaded ({e}); workers will load it on first request")
+    # The master serves no requests: don't keep a pooled connection open for the life of the deployment
+    from database import get_engine
+    get_engine().dispose()
+    # Move everything loaded so far out of the collector's reach, so collections in the workers don't
+    # write to (and so copy) the shared pages
+    gc.freeze()
@@ -0,0 +1,34 @@
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+# What a gunicorn worker does when it boots without preload
+WORKER_BOOT = 'from app import create_app; create_app()'
+
+def import_times(statement=WORKER_BOOT, env=None):
+    """
+    (module, self_us, cumulative_us) for every module imported while running
+    statement in a fresh interpreter under `python -X importtime`, in import
+    order. Cumulative time includes the module's own imports.
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement], cwd=BACKEND_DIR,
+                            env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"`{statement}` failed:\n{result.stderr[-2000:]}")
+    rows = []
+    for line in result.stderr.splitlines():
+        # 'import time: self [us] | cumulative | imported package'; other stderr lines are the app's logging
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, module = line[len('import time:'):].split('|')
+        rows.append((module.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+def by_package(rows):
+    """Summed self time per top-level package, most expensive first."""
+    totals = {}
+    for module, self_us, _ in rows:
+        package = module.split('.')[0]
+        totals[package] = totals.get(package, 0) + self_us
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
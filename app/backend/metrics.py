@@ -0,0 +1,209 @@
+import random
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def render(self):
+        with self._lock:
+            values = dict(self._values)
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in sorted(values.items())
+        ]
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * len(self.buckets), 0.0)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall time of the `with` block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        with self._lock:
+            values = {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+        lines = self.header()
+        for key, (counts, total) in sorted(values.items()):
+            for bound, count in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', _format_value(float(bound)))])} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {counts[-1]}")
+        return lines
+
+class CollectedMetric(Metric):
+    """Values read at scrape time from a callback returning {label values tuple: value}."""
+    def __init__(self, name, documentation, labelnames=(), callback=None, kind='gauge'):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+        self.kind = kind
+
+    def render(self):
+        try:
+            values = self.callback() if self.callback else {}
+        except Exception as e:
+            logger.warning(f"Metric {self.name} could not be collected: {e}")
+            values = {}
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in sorted(values.items())
+        ]
+
+class Registry:
+    """
+    Process-local metrics in the Prometheus text format. Each gunicorn worker
+    keeps its own numbers, so scrapes see whichever worker answered.
+    """
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def collected(self, name, documentation, labelnames=(), callback=None, kind='gauge'):
+        return self._register(CollectedMetric(name, documentation, labelnames, callback, kind))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = Registry()
+
+RECOMMEND_STAGE_SECONDS = REGISTRY.histogram(
+    'moodie_recommend_stage_seconds',
+    'Time spent in each stage of a recommendation request.',
+    ('stage',),
+)
+RECOMMEND_REQUESTS = REGISTRY.counter(
+    'moodie_recommend_requests_total',
+    'Recommendation requests by how they were answered.',
+    ('result',),
+)
+SYNC_RUNS = REGISTRY.counter(
+    'moodie_sync_runs_total',
+    'Plex metadata sync runs.',
+    ('mode', 'outcome'),
+)
+SYNC_ITEMS = REGISTRY.counter(
+    'moodie_sync_items_total',
+    'Media rows written by Plex metadata syncs.',
+    ('result',),
+)
+PLEX_REQUESTS = REGISTRY.counter(
+    'moodie_plex_requests_total',
+    'Plex library requests made by syncs and live recommendation fetches.',
+    ('source', 'kind'),
+)
+SYNC_SECONDS = REGISTRY.histogram(
+    'moodie_sync_seconds',
+    'Duration of Plex metadata sync runs.',
+    ('mode',),
+    buckets=(0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0),
+)
+FEEDBACK_EVENTS = REGISTRY.counter(
+    'moodie_feedback_events_total',
+    'Feedback events by outcome: written, failed (dropped after retry) or rejected (queue full).',
+    ('result',),
+)
+FEEDBACK_BATCH_SECONDS = REGISTRY.histogram(
+    'moodie_feedback_batch_seconds',
+    'Time to write one group-committed batch of feedback events.',
+)
+
+_CACHES = {}
+
+def register_cache(name, cache):
+    """Export a cache backend's stats() as moodie_cache_* metrics labelled cache=`name`."""
+    _CACHES[name] = cache
+
+def _cache_stat(stat):
+    return lambda: {(name,): cache.stats()[stat] for name, cache in list(_CACHES.items())}
+
+for _stat in ('hits', 'misses', 'evictions', 'expirations', 'invalidations'):
+    REGISTRY.collected(f'moodie_cache_{_stat}_total', f'Cache {_stat} in this process.', ('cache',), _cache_stat(_stat), kind='counter')
+REGISTRY.collected('moodie_cache_entries', 'Entries currently stored in the cache.', ('cache',), _cache_stat('entries'))
+
+# Per-item logging is opt-in: LOG_ITEM_SAMPLE_RATE of items are logged at DEBUG level.
+# A private generator keeps sampling from consuming the seeded global `random` used by surprise mode.
+_item_sampler = random.Random()
+
+def sample_item_log():
+    rate = Config.LOG_ITEM_SAMPLE_RATE
+    return rate > 0 and logging.getLogger().isEnabledFor(logging.DEBUG) and _item_sampler.random() < rate
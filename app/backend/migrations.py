@@ -0,0 +1,63 @@
+import logging
+from datetime import datetime
+from sqlalchemy import text, MetaData, Table, Column, Integer, String, DateTime
+from sqlalchemy.exc import IntegrityError
+
+logger = logging.getLogger(__name__)
+
+_metadata = MetaData()
+schema_migrations = Table(
+    'schema_migrations', _metadata,
+    Column('version', Integer, primary_key=True),
+    Column('name', String, nullable=False),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+# Each migration's DDL is frozen here rather than derived from the models, so replaying it on an old
+# database always does the same thing. Statements must be idempotent: every worker runs migrate() at
+# startup, and a fresh database already has what create_all() built from the current models.
+MIGRATIONS = [
+    (1, 'query indexes for feedback history and the feedback POST', [
+        # Feedback history of a session, and the feedback POST's (media, session) lookup
+        'CREATE INDEX IF NOT EXISTS ix_recommendations_group_size_media_id ON recommendations (group_size, media_id)',
+        # Joins and prune deletes from media to its recommendations, and from those to their feedback
+        'CREATE INDEX IF NOT EXISTS ix_recommendations_media_id ON recommendations (media_id)',
+        'CREATE INDEX IF NOT EXISTS ix_feedback_recommendation_id ON feedback (recommendation_id)',
+        # The feedback POST finds media by title
+        'CREATE INDEX IF NOT EXISTS ix_media_title ON media (title)',
+    ]),
+    (2, 'mark placeholder media created by feedback', [
+        # Feedback on an unknown title used to store the title as the plex_id; synced rows hold a Plex
+        # ratingKey there and have a content hash or poster. A marked row no longer matches, so reruns are no-ops.
+        "UPDATE media SET plex_id = 'feedback:' || plex_id "
+        "WHERE plex_id = title AND content_hash IS NULL AND poster_path IS NULL",
+    ]),
+]
+
+def applied_versions(engine):
+    _metadata.create_all(engine)
+    with engine.connect() as conn:
+        return set(conn.execute(schema_migrations.select().with_only_columns(schema_migrations.c.version)).scalars())
+
+def pending_migrations(engine):
+    applied = applied_versions(engine)
+    return [(version, name) for version, name, _ in MIGRATIONS if version not in applied]
+
+def migrate(engine):
+    """Apply pending migrations in version order, each in its own transaction. Returns the versions applied."""
+    applied = applied_versions(engine)
+    done = []
+    for version, name, statements in MIGRATIONS:
+        if version in applied:
+            continue
+        try:
+            with engine.begin() as conn:
+                for statement in statements:
+                    conn.execute(text(statement))
+                conn.execute(schema_migrations.insert().values(version=version, name=name, applied_at=datetime.utcnow()))
+        except IntegrityError:
+            # Another worker recorded it first; the DDL is idempotent, so there is nothing left to do
+            continue
+        logger.info(f"Applied migration {version}: {name}")
+        done.append(version)
+    return done
@@ -0,0 +1,99 @@
+import logging
+import numpy as np
+from artifacts import ArtifactStore, load_artifact
+from config import Config
+from mood_tags import ALL_MOOD_TAGS
+from summary_index import summary_mood_terms
+
+logger = logging.getLogger(__name__)
+
+def feature_vocab(media):
+    """Column layout for item features, fixed at training time and stored with the model."""
+    genres = sorted(set(g.lower() for item in media for g in item['genres']))
+    return {'genres': genres, 'types': ['movie', 'show'], 'mood_terms': list(ALL_MOOD_TAGS)}
+
+def item_features(media, vocab, summary_terms=None):
+    """
+    Float32 feature matrix for media dicts (catalog format): genre and type
+    one-hots, summary mood terms, duration buckets, log view count, rating
+    and recency. Unknown genres are ignored, so a model keeps working as the
+    library changes.
+    """
+    genre_col = {g: i for i, g in enumerate(vocab['genres'])}
+    type_col = {t: i for i, t in enumerate(vocab['types'])}
+    term_col = {t: i for i, t in enumerate(vocab['mood_terms'])}
+    n_genres, n_types, n_terms = len(genre_col), len(type_col), len(term_col)
+    base = n_genres + n_types + n_terms
+    X = np.zeros((len(media), base + 6), dtype=np.float32)
+    for row, item in enumerate(media):
+        for genre in item['genres']:
+            col = genre_col.get(genre.lower())
+            if col is not None:
+                X[row, col] = 1
+        col = type_col.get(item['type'])
+        if col is not None:
+            X[row, n_genres + col] = 1
+        terms = summary_terms.get(item.get('id')) if summary_terms else None
+        if terms is None:
+            terms = summary_mood_terms(item['summary'])
+        for term in terms:
+            col = term_col.get(term)
+            if col is not None:
+                X[row, n_genres + n_types + col] = 1
+        duration = item['duration'] or 0
+        X[row, base] = duration <= 60
+        X[row, base + 1] = 60 < duration <= 125
+        X[row, base + 2] = duration > 125
+        X[row, base + 3] = np.log1p(item['viewCount'] or 0)
+        X[row, base + 4] = (item.get('rating') or 0) / 10
+        X[row, base + 5] = ((item.get('year') or 2000) - 2000) / 25
+    return X
+
+class LearnedModel:
+    """A trained logistic model loaded from an artifact directory (weights memory-mapped)."""
+    def __init__(self, path):
+        self.path = path
+        self.meta, arrays = load_artifact(path, ['weights'])
+        self.version = self.meta['version']
+        self.vocab = self.meta['vocab']
+        self.weights = arrays['weights']
+        self.bias = float(self.meta['bias'])
+
+    def predict(self, X):
+        """P(liked) for each feature row, in one matrix-vector product."""
+        return 1 / (1 + np.exp(-(X @ self.weights + self.bias)))
+
+    def bonus(self, X, weight):
+        """Integer score adjustment in [-weight, weight], centred on p = 0.5."""
+        return np.rint(weight * (2 * self.predict(X) - 1)).astype(np.int64)
+
+class ModelStore(ArtifactStore):
+    """
+    The current model for this process. Trainers publish a version with
+    artifacts.publish_artifact(); each worker swaps it in on its next reload
+    check. Catalog-wide bonuses are cached per (catalog version, model version).
+    """
+    def __init__(self, model_dir, reload_interval=10):
+        super().__init__(model_dir, LearnedModel, reload_interval)
+        self._catalog_bonus = (None, None, None)  # (catalog version, model version, bonuses)
+
+    def catalog_bonus(self, catalog, weight):
+        """Model score adjustment for every catalog item (row order), or None without a model."""
+        model = self.current()
+        if model is None or not weight:
+            return None
+        catalog_version, model_version, bonus = self._catalog_bonus
+        if catalog_version != catalog.version or model_version != model.version:
+            X = item_features(catalog.items, model.vocab, catalog.summary_terms)
+            bonus = model.bonus(X, weight)
+            self._catalog_bonus = (catalog.version, model.version, bonus)
+        return bonus
+
+    def media_bonus(self, media, weight):
+        """Model score adjustment for an arbitrary media list (the live Plex path)."""
+        model = self.current()
+        if model is None or not weight or not media:
+            return None
+        return model.bonus(item_features(media, model.vocab), weight)
+
+MODEL_STORE = ModelStore(Config.MODEL_DIR, Config.MODEL_RELOAD_SECONDS)
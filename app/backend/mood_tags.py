@@ -0,0 +1,10 @@
+# Genre tags that satisfy each mood. Also matched as substrings of summaries.
+MOOD_TAGS = {
+    'light_funny': ['comedy', 'family', 'animation'],
+    'intense': ['action', 'thriller', 'crime'],
+    'emotional': ['drama', 'romance', 'biography'],
+    'dramatic': ['musical', 'mystery', 'historical'],
+}
+
+# Every distinct tag, in a fixed order (used for precomputed summary matches)
+ALL_MOOD_TAGS = sorted(set(tag for tags in MOOD_TAGS.values() for tag in tags))
@@ -0,0 +1,92 @@
+import asyncio
+import logging
+import time
+import xml.etree.ElementTree as ET
+import httpx
+from plex_client import PLEX_CONNECTIONS, get_plex_url
+from config import Config
+from singleflight import AsyncSingleFlight
+
+logger = logging.getLogger(__name__)
+
+class AsyncPlexClient:
+    """
+    Plex I/O for the ASGI app (asgi.py) on one shared httpx.AsyncClient, so a
+    request waiting on a slow Plex holds a coroutine rather than a thread.
+    Cached state from PLEX_CONNECTIONS (the sync manager's health checks and
+    resolved servers) is used first; what it can't answer is asked of Plex
+    directly and remembered for a health interval.
+    """
+    def __init__(self, pool_maxsize=100, timeout=30, health_interval=60):
+        self.pool_maxsize = pool_maxsize
+        self.timeout = timeout
+        self.health_interval = health_interval
+        self._client = None
+        self._loop = None
+        self._status = {}  # (url, token, server name) -> (checked_at, status)
+        self._status_flight = AsyncSingleFlight('plex_status_asgi')
+
+    @property
+    def client(self):
+        # Connections belong to the event loop that opened them
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            limits = httpx.Limits(max_connections=self.pool_maxsize, max_keepalive_connections=self.pool_maxsize)
+            self._client = httpx.AsyncClient(timeout=self.timeout, limits=limits, headers={'Accept': 'application/xml'})
+            self._loop = loop
+        return self._client
+
+    async def get(self, url, token, path, params=None, timeout=None):
+        response = await self.client.get(f'{url.rstrip("/")}{path}', params=dict(params or {}, **{'X-Plex-Token': token}),
+                                         timeout=timeout or self.timeout)
+        response.raise_for_status()
+        return response
+
+    async def server_info(self, token, url=None):
+        """Attributes of the server's root MediaContainer (friendlyName, machineIdentifier, version...)."""
+        response = await self.get(url or get_plex_url(), token, '/', timeout=10)
+        return ET.fromstring(response.content).attrib
+
+    async def status(self, token, server_name=None):
+        status = PLEX_CONNECTIONS.cached_status(token, server_name)
+        if status is not None:
+            return status
+        # The named server's address when the sync manager has resolved it (as for posters), else PLEX_URL
+        key = (PLEX_CONNECTIONS.base_url(token, server_name), token, server_name)
+        cached = self._status.get(key)
+        if cached is not None and time.time() - cached[0] < self.health_interval:
+            return cached[1]
+        # Polls arriving while a check is out wait for it rather than each asking Plex
+        status, _ = await self._status_flight.do(key, lambda: self._check_status(key, token, server_name))
+        return status
+
+    async def _check_status(self, key, token, server_name):
+        if server_name:
+            # A named server may not be the one at PLEX_URL: resolve it as the WSGI route does (which also
+            # caches it for the next poll), on a thread since plexapi blocks
+            status = await asyncio.get_running_loop().run_in_executor(None, PLEX_CONNECTIONS.status, token, server_name)
+        else:
+            try:
+                info = await self.server_info(token, key[0])
+                status = {'connected': True, 'server': info.get('friendlyName')}
+            except Exception as e:
+                logger.warning(f"Plex status check failed for {key[0]}: {e}")
+                status = {'connected': False, 'server': None}
+        self._status[key] = (time.time(), status)
+        return status
+
+    async def fetch_poster(self, token, server_name, thumb, width, height):
+        """JPEG bytes of a thumb resized by Plex's photo transcoder (same request as PlexClient.fetch_poster)."""
+        params = {'url': thumb, 'height': height, 'width': width, 'minSize': 1, 'upscale': 0, 'format': 'jpeg'}
+        response = await self.get(PLEX_CONNECTIONS.base_url(token, server_name), token, '/photo/:/transcode', params)
+        return response.content
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+ASYNC_PLEX = AsyncPlexClient(
+    pool_maxsize=Config.ASGI_PLEX_POOL_MAXSIZE,
+    health_interval=Config.PLEX_HEALTH_INTERVAL,
+)
@@ -1,20 +1,77 @@
+import fcntl
+import os
 import threading
-import time
 import logging
+from datetime import datetime
 from plex_client import PlexClient
-from database import get_session, sync_plex_metadata
+from database import SyncState, get_session, sync_plex_metadata, prune_media, get_sync_state, save_sync_watermark
+from catalog import plex_item_to_record, CATALOG_STORE
 from config import Config
+from metrics import SYNC_RUNS, SYNC_SECONDS, PLEX_REQUESTS
+import time
 
 logging.basicConfig(level=getattr(logging, Config.LOG_LEVEL, logging.INFO))
 logger = logging.getLogger(__name__)
 
+class HostLock:
+    """
+    An exclusive flock on a file: one holder per host at a time, across
+    processes and threads alike. The kernel releases it when the holder's
+    process exits, so a crashed worker never leaves it stuck.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def acquire(self, blocking=True):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        lock_file = open(self.path, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        self._file = lock_file
+        return True
+
+    def release(self):
+        lock_file, self._file = self._file, None
+        if lock_file is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+# Held for the length of each sync pass, so passes (background or `flask sync-plex`) never overlap
+SYNC_LOCK = HostLock(Config.PLEX_SYNC_LOCK_PATH)
+# Held by the one sync thread per host that runs the schedule
+SCHEDULE_LOCK = HostLock(f'{Config.PLEX_SYNC_LOCK_PATH}.schedule')
+SCHEDULE_LOCK_RETRY = 60
+
+def updated_at_epoch(item):
+    updated = getattr(item, 'updatedAt', None)
+    if isinstance(updated, datetime):
+        return int(updated.timestamp())
+    return int(updated or 0)
+
 class PlexBackgroundSync:
     """Background processor for incremental Plex metadata updates."""
-    def __init__(self, interval=3600):
+    def __init__(self, interval=3600, token=None, server_name=None, page_size=None):
         self.interval = interval  # seconds between syncs
+        self.full_sync_interval = Config.PLEX_FULL_SYNC_INTERVAL
+        self.token = token or Config.PLEX_TOKEN
+        self.server_name = server_name
+        self.page_size = page_size or Config.PLEX_SYNC_PAGE_SIZE
         self.thread = None
         self.stop_event = threading.Event()
-        self.last_update = 0
+        self.requests = {}  # Plex requests made by the last sync, by kind
+        self.changes = {}  # Media rows the last sync inserted, updated or deleted
 
     def start(self):
         if self.thread and self.thread.is_alive():
@@ -32,33 +89,156 @@ class PlexBackgroundSync:
         logger.info("Stopped Plex background sync thread.")
 
     def run(self):
-        while not self.stop_event.is_set():
-            try:
-                self.incremental_sync()
-            except Exception as e:
-                logger.error(f"Background sync error: {e}")
-            time.sleep(self.interval)
+        # Each gunicorn worker that handles a connect starts this thread; only one per host runs the schedule,
+        # the others wait to take over if its process exits
+        while not SCHEDULE_LOCK.acquire(blocking=False):
+            if self.stop_event.wait(SCHEDULE_LOCK_RETRY):
+                return
+        try:
+            while not self.stop_event.is_set():
+                try:
+                    if self.full_sync_due():
+                        self.full_sync()
+                    else:
+                        self.incremental_sync()
+                except Exception as e:
+                    logger.error(f"Background sync error: {e}")
+                self.stop_event.wait(self.interval)
+        finally:
+            SCHEDULE_LOCK.release()
 
     def incremental_sync(self):
-        """Detect and process only new/changed content since last update."""
+        """Detect and process only new/changed content since each section's watermark."""
+        return self._sync(full=False)
+
+    def full_sync(self):
+        """Page through every section and remove media that no longer exists in Plex."""
+        return self._sync(full=True)
+
+    def full_sync_due(self):
+        """True when any section has not had a full sync within full_sync_interval."""
+        session = get_session()
+        try:
+            states = session.query(SyncState).all()
+        finally:
+            session.close()
+        if not states:
+            return False  # nothing synced yet: the first incremental pass fetches everything
+        oldest = min(s.last_full_sync_at or datetime.min for s in states)
+        return (datetime.utcnow() - oldest).total_seconds() >= self.full_sync_interval
+
+    def _sync(self, full):
+        if not self.token:
+            logger.warning("No Plex token configured (PLEX_TOKEN); skipping sync.")
+            return {}
+        mode = 'full' if full else 'incremental'
+        started = time.perf_counter()
+        try:
+            with SYNC_LOCK:
+                stats = self._sync_sections(full)
+        except Exception:
+            SYNC_RUNS.inc(mode=mode, outcome='error')
+            raise
+        finally:
+            SYNC_SECONDS.observe(time.perf_counter() - started, mode=mode)
+        SYNC_RUNS.inc(mode=mode, outcome='stopped' if self.stop_event.is_set() else 'ok')
+        # Fetched items include those re-read at the watermark; only rows that actually changed need new neighbors
+        if any(self.changes.values()):
+            from trainer import submit_similarity
+            submit_similarity()
+        return stats
+
+    def _sync_sections(self, full):
         client = PlexClient()
+        server = client.connect_via_token(self.token, self.server_name)
         session = get_session()
-        # Example: fetch all movies and shows, filter by updatedAt
-        movies = client.get_all_movies()
-        shows = client.get_all_shows()
-        # Filter by updatedAt if available
-        if self.last_update:
-            movies = [m for m in movies if getattr(m, 'updatedAt', 0) > self.last_update]
-            shows = [s for s in shows if getattr(s, 'updatedAt', 0) > self.last_update]
-        sync_plex_metadata(session, movies, media_type='movie')
-        sync_plex_metadata(session, shows, media_type='show')
-        self.last_update = int(time.time())
-        logger.info("Incremental sync complete.")
+        stats = {}
+        seen_by_type = {}
+        self.requests = {'listing': 0, 'metadata': 0}
+        self.changes = {'inserted': 0, 'updated': 0, 'deleted': 0}
+        try:
+            for section in client.library_sections(server):
+                seen = seen_by_type.setdefault(section.type, set()) if full else None
+                stats[section.title] = self.sync_section(session, client, server, section, seen)
+            # An interrupted full pass has only seen part of the library; never prune from it
+            if not self.stop_event.is_set():
+                for media_type, seen in seen_by_type.items():
+                    self.changes['deleted'] += prune_media(session, media_type, seen)
+        finally:
+            session.close()
+        CATALOG_STORE.invalidate()
+        for kind, count in self.requests.items():
+            PLEX_REQUESTS.inc(count, source='sync', kind=kind)
+        logger.info(f"{'Full' if full else 'Incremental'} sync complete: {stats}, rows {self.changes}, {sum(self.requests.values())} Plex requests {self.requests}")
+        return stats
+
+    def sync_section(self, session, client, server, section, seen=None):
+        """
+        Stream one section into the DB page by page. The watermark is saved
+        after every committed page, so an interrupted sync resumes where it
+        stopped. Passing a `seen` set makes this a full pass that records
+        every Plex ID instead of filtering on the watermark.
+
+        Pages are keyed on updatedAt rather than an offset: each request asks
+        for changes since the newest one already fetched, so an item edited
+        mid-sync moves to the end of the list without shifting anything
+        still unfetched past the window. The inclusive filter returns the
+        items at that timestamp again; they are skipped by rating key.
+        """
+        state = get_sync_state(session, section.key, section.title, section.type)
+        since = initial = 0 if seen is not None else (state.watermark or 0)
+        watermark = since
+        start = 0
+        at_since = set()  # rating keys already fetched whose updatedAt equals `since`
+        fetched = 0
+        while not self.stop_event.is_set():
+            page = client.fetch_section_page(server, section.key, updated_since=since, start=start, size=self.page_size)
+            self.requests['listing'] += 1
+            items = [item for item in page if item.ratingKey not in at_since]
+            if items:
+                # Full metadata in a few batched requests rather than a reload per item
+                hydrated, calls = client.hydrate(server, items)
+                self.requests['metadata'] += calls
+                records = [plex_item_to_record(item) for item in hydrated if getattr(item, 'type', None) in ('movie', 'show')]
+                result = sync_plex_metadata(session, records, media_type=section.type, prune=False)
+                for change in self.changes:
+                    self.changes[change] += result[change]
+                if seen is not None:
+                    seen.update(r['plex_id'] for r in records)
+                watermark = max([watermark] + [updated_at_epoch(item) for item in items])
+                save_sync_watermark(session, state, watermark)
+                fetched += len(items)
+            if len(page) < self.page_size:
+                break
+            newest = max(updated_at_epoch(item) for item in page)
+            if newest > since:
+                since, start = newest, 0
+                at_since = {item.ratingKey for item in page if updated_at_epoch(item) == newest}
+            else:
+                # A whole page changed in the same second: step through that second by offset
+                at_since.update(item.ratingKey for item in page)
+                start += len(page)
+        if seen is not None and not self.stop_event.is_set():
+            save_sync_watermark(session, state, watermark, full=True)
+        logger.info(f"Section '{section.title}': {fetched} items fetched since watermark {initial}, now {watermark}")
+        return fetched
 
     def schedule_full_sync(self, interval=86400):
-        """Stub for scheduling a full sync (e.g., daily)."""
-        logger.info(f"Scheduled full sync every {interval} seconds (stub).")
+        """Run a full (pruning) sync every `interval` seconds from the sync thread."""
+        self.full_sync_interval = interval
+        logger.info(f"Scheduled full sync every {interval} seconds.")
 
     def monitor_jobs(self):
         """Stub for monitoring and alerting on background jobs."""
-        logger.info("Monitoring not implemented.") 
\ No newline at end of file
+        logger.info("Monitoring not implemented.")
+
+_background_sync = None
+_background_sync_lock = threading.Lock()
+
+def get_background_sync():
+    """Process-wide sync runner, shared by the connect route and CLI."""
+    global _background_sync
+    with _background_sync_lock:
+        if _background_sync is None:
+            _background_sync = PlexBackgroundSync(interval=Config.PLEX_SYNC_INTERVAL)
+        return _background_sync
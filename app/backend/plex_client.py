@@ -1,14 +1,233 @@
-from plexapi.server import PlexServer
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
 import os
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+def get_plex_url():
+    # Make PLEX_URL configurable via environment variable, default to your actual Plex server
+    return os.environ.get("PLEX_URL", "http://172.16.1.5:32400")
+
+class PlexConnection:
+    """A live PlexServer plus what the manager knows about its health."""
+    def __init__(self, server):
+        self.server = server
+        self.resolved_at = time.time()
+        self.last_used = self.resolved_at
+        self.last_checked = self.resolved_at
+        self.healthy = True
+        self.lock = threading.Lock()
+
+class PlexConnectionManager:
+    """
+    Reuses PlexServer objects keyed by (URL, token, server name) instead of
+    doing a fresh handshake per request. All servers share one requests
+    session so HTTP connections stay alive; a resolved server is reused for
+    resource_ttl seconds; a background thread pings /identity on every
+    cached connection so status checks are answered from cached state.
+    """
+    def __init__(self, resource_ttl=300, health_interval=60, idle_ttl=1800, pool_maxsize=10):
+        self.resource_ttl = resource_ttl
+        self.health_interval = health_interval
+        self.idle_ttl = idle_ttl
+        self.pool_maxsize = pool_maxsize
+        self._connections = {}
+        self._lock = threading.Lock()
+        self._http = None
+        self._pid = None
+        self._health_thread = None
+
+    @property
+    def http(self):
+        # Sockets can't be shared with a forked worker, so each process builds its own session
+        if self._http is None or self._pid != os.getpid():
+            # plexapi and requests are imported on first use: they are a good part of a worker's import time
+            import requests
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_maxsize)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self._http = session
+            self._pid = os.getpid()
+            self._connections = {}
+            self._health_thread = None
+        return self._http
+
+    def _entry(self, key):
+        with self._lock:
+            self.http  # reset per-process state after a fork
+            entry = self._connections.get(key)
+            if entry is None:
+                entry = self._connections[key] = PlexConnection(None)
+            return entry
+
+    def connect(self, token, server_name=None, url=None):
+        key = (url or get_plex_url(), token, server_name)
+        entry = self._entry(key)
+        # Per-key lock: concurrent requests for the same server share one handshake
+        with entry.lock:
+            now = time.time()
+            if entry.server is None or not entry.healthy or now - entry.resolved_at >= self.resource_ttl:
+                try:
+                    entry.server = self._resolve(*key)
+                except Exception:
+                    with self._lock:
+                        self._connections.pop(key, None)
+                    raise
+                entry.resolved_at = entry.last_checked = now
+                entry.healthy = True
+            entry.last_used = now
+        self._ensure_health_thread()
+        return entry.server
+
+    def _resolve(self, url, token, server_name):
+        from plexapi.server import PlexServer
+        plex = PlexServer(url, token, session=self.http)
+        if server_name and plex.friendlyName != server_name:
+            # Optionally select a specific server by name from the account's resources
+            try:
+                for resource in plex.myPlexAccount().resources():
+                    if getattr(resource, 'name', None) == server_name:
+                        return resource.connect()
+            except Exception as e:
+                logger.warning(f"Could not resolve Plex server '{server_name}', using {url}: {e}")
+        return plex
+
+    def _cached(self, key):
+        """The connection entry for a key when it has a server and a recent health check, else None."""
+        with self._lock:
+            entry = self._connections.get(key) if self._pid == os.getpid() else None
+        if entry is not None and entry.server is not None and time.time() - entry.last_checked < 2 * self.health_interval:
+            entry.last_used = time.time()
+            return entry
+        return None
+
+    def cached_status(self, token, server_name=None, url=None):
+        """Status from cached health state only (never blocks on Plex); None when nothing recent is cached."""
+        entry = self._cached((url or get_plex_url(), token, server_name))
+        if entry is None:
+            return None
+        return {'connected': entry.healthy, 'server': entry.server.friendlyName if entry.healthy else None}
+
+    def base_url(self, token, server_name=None, url=None):
+        """Base URL of the resolved server (which may differ from PLEX_URL when a server name was picked)."""
+        entry = self._cached((url or get_plex_url(), token, server_name))
+        return entry.server._baseurl if entry is not None and entry.healthy else (url or get_plex_url())
+
+    def status(self, token, server_name=None, url=None):
+        """Connection status from cached health state; handshakes only when nothing is cached."""
+        status = self.cached_status(token, server_name, url)
+        if status is not None:
+            return status
+        try:
+            server = self.connect(token, server_name, url)
+            return {'connected': True, 'server': server.friendlyName}
+        except Exception:
+            return {'connected': False, 'server': None}
+
+    def _ensure_health_thread(self):
+        with self._lock:
+            if self._health_thread is None or not self._health_thread.is_alive():
+                self._health_thread = threading.Thread(target=self._health_loop, daemon=True)
+                self._health_thread.start()
+
+    def _health_loop(self):
+        while True:
+            time.sleep(self.health_interval)
+            self.check_health()
+
+    def check_health(self):
+        """Ping every cached server; drop connections nobody has used for idle_ttl."""
+        now = time.time()
+        with self._lock:
+            entries = list(self._connections.items())
+        for key, entry in entries:
+            if now - entry.last_used >= self.idle_ttl:
+                with self._lock:
+                    self._connections.pop(key, None)
+                continue
+            server = entry.server
+            if server is None:
+                continue
+            try:
+                server.query('/identity', timeout=10)
+                entry.healthy = True
+            except Exception as e:
+                logger.warning(f"Plex health check failed for {key[0]}: {e}")
+                entry.healthy = False
+            entry.last_checked = time.time()
+
+PLEX_CONNECTIONS = PlexConnectionManager(
+    resource_ttl=Config.PLEX_RESOURCE_TTL,
+    health_interval=Config.PLEX_HEALTH_INTERVAL,
+    pool_maxsize=Config.PLEX_POOL_MAXSIZE,
+)
 
 class PlexClient:
     def connect_via_token(self, token, server_name=None):
-        # Make PLEX_URL configurable via environment variable, default to your actual Plex server
-        PLEX_URL = os.environ.get("PLEX_URL", "http://172.16.1.5:32400")
-        plex = PlexServer(PLEX_URL, token)
-        if server_name:
-            # Optionally select a specific server by name, safely handle missing 'name' attribute
-            for resource in plex.resources():
-                if getattr(resource, 'name', None) == server_name:
-                    return resource.connect()
-        return plex 
\ No newline at end of file
+        return PLEX_CONNECTIONS.connect(token, server_name)
+
+    def status(self, token, server_name=None):
+        return PLEX_CONNECTIONS.status(token, server_name)
+
+    def library_sections(self, server):
+        """Movie and TV library sections on the server."""
+        return [s for s in server.library.sections() if s.type in ('movie', 'show')]
+
+    def fetch_section_page(self, server, section_key, updated_since=0, start=0, size=200):
+        """
+        Fetch one page of a library section, oldest change first.
+        Filtering on updatedAt happens on the Plex server, so an incremental
+        sync only transfers items changed since the watermark. Plex's '>>='
+        operator is strictly greater-than, hence the -1 to make it inclusive.
+        """
+        ekey = f'/library/sections/{section_key}/all?sort=updatedAt'
+        if updated_since:
+            ekey += f'&updatedAt>>={int(updated_since) - 1}'
+        return server.fetchItems(ekey, container_start=start, container_size=size, maxresults=size)
+
+    def fetch_poster(self, token, server_name, thumb, width, height):
+        """JPEG bytes of a thumb resized by Plex's photo transcoder."""
+        server = self.connect_via_token(token, server_name)
+        url = server.transcodeImage(thumb, height, width, minSize=True, upscale=False, imageFormat='jpeg')
+        response = PLEX_CONNECTIONS.http.get(url, timeout=30)
+        response.raise_for_status()
+        return response.content
+
+    def hydrate(self, server, items, batch_size=None, workers=None):
+        """
+        Full metadata for library listing items. plexapi's listing objects are
+        partial: reading an attribute Plex left empty (directors, roles, a
+        missing viewCount) reloads that one item, one request per item. Here
+        autoreload is switched off and the movies and shows are re-fetched
+        in batches of rating keys (/library/metadata/k1,k2,...) on a bounded
+        thread pool. Items from a failed batch stay as listed.
+        Returns (items in the same order, requests made).
+        """
+        batch_size = min(batch_size or Config.PLEX_HYDRATE_BATCH_SIZE, 100)
+        workers = workers or Config.PLEX_HYDRATE_WORKERS
+        for item in items:
+            item._autoReload = False
+        keys = [item.ratingKey for item in items if getattr(item, 'type', None) in ('movie', 'show')]
+        batches = [keys[i:i + batch_size] for i in range(0, len(keys), batch_size)]
+        if not batches:
+            return items, 0
+
+        def fetch(batch):
+            try:
+                return server.fetchItems([int(key) for key in batch])
+            except Exception as e:
+                logger.warning(f"Metadata batch of {len(batch)} items failed, keeping listing data: {e}")
+                return []
+
+        full = {}
+        with ThreadPoolExecutor(max_workers=min(workers, len(batches))) as pool:
+            for fetched in pool.map(fetch, batches):
+                for item in fetched:
+                    item._autoReload = False
+                    full[item.ratingKey] = item
+        return [full.get(getattr(item, 'ratingKey', None), item) for item in items], len(batches)
@@ -0,0 +1,115 @@
+import json
+import logging
+from datetime import datetime
+from sqlalchemy.exc import IntegrityError
+from database import request_session, PreferenceProfile, Feedback, Recommendation, Media
+
+logger = logging.getLogger(__name__)
+
+ATTRIBUTES = ('genres', 'directors', 'cast')
+
+def empty_profile():
+    return {
+        'liked': {attr: {} for attr in ATTRIBUTES},
+        'disliked': {attr: {} for attr in ATTRIBUTES},
+        'titles': {},
+    }
+
+def apply_feedback(profile, media, rating, would_watch_again):
+    """Fold one feedback event for `media` into a profile (mutates and returns it)."""
+    if rating == 5 or would_watch_again is True:
+        counts = profile['liked']
+    elif rating == 1 or would_watch_again is False:
+        counts = profile['disliked']
+    else:
+        counts = None
+    if counts is not None:
+        for attr in ATTRIBUTES:
+            for tag in set(t.strip() for t in (getattr(media, attr, None) or '').split(',')):
+                if tag:
+                    counts[attr][tag] = counts[attr].get(tag, 0) + 1
+    # Latest vote on a title wins; a thumbs-down outranks the rating
+    if rating == 1 or would_watch_again is False:
+        profile['titles'][media.title] = 'down'
+    elif rating == 5 or would_watch_again is True:
+        profile['titles'][media.title] = 'up'
+    return profile
+
+def profile_preferences(profile):
+    """Turn a stored profile into the (feedback_map, liked, disliked) the scorers take."""
+    liked = {attr: set(t for t, n in profile['liked'][attr].items() if n > 0) for attr in ATTRIBUTES}
+    disliked = {attr: set(t for t, n in profile['disliked'][attr].items() if n > 0) for attr in ATTRIBUTES}
+    return dict(profile['titles']), liked, disliked
+
+def _history(session, session_id=None):
+    """Feedback rows with the media columns a profile needs, oldest first."""
+    query = (
+        session.query(Recommendation.group_size, Feedback.rating, Feedback.would_watch_again,
+                      Media.title, Media.genres, Media.directors, Media.cast)
+        .select_from(Feedback).join(Recommendation).join(Media)
+        .order_by(Feedback.id)
+    )
+    if session_id is not None:
+        query = query.filter(Recommendation.group_size == session_id)
+    return query
+
+def profile_from_history(session, session_id):
+    profile = empty_profile()
+    for row in _history(session, session_id):
+        apply_feedback(profile, row, row.rating, row.would_watch_again)
+    return profile
+
+def get_preferences(session_id):
+    """(feedback_map, liked, disliked) for a session: one keyed lookup of its profile."""
+    session = request_session()
+    row = session.query(PreferenceProfile).filter_by(session_id=str(session_id)).first()
+    if row is not None:
+        profile = json.loads(row.profile)
+    else:
+        # Sessions with feedback from before profiles existed get one built on first use
+        profile = profile_from_history(session, session_id)
+        if profile['titles']:
+            session.add(PreferenceProfile(session_id=str(session_id), profile=json.dumps(profile)))
+            try:
+                session.commit()
+            except IntegrityError:
+                # A concurrent first request for this session stored its profile first
+                session.rollback()
+                row = session.query(PreferenceProfile).filter_by(session_id=str(session_id)).first()
+                if row is not None:
+                    profile = json.loads(row.profile)
+    return profile_preferences(profile)
+
+def update_profile(session, session_id, media, rating, would_watch_again):
+    """
+    Apply a new feedback event to the session's profile inside the caller's
+    transaction. Call before the Feedback row is added, so a profile built
+    from history for the first time doesn't count it twice.
+    """
+    row = session.query(PreferenceProfile).filter_by(session_id=str(session_id)).with_for_update().first()
+    if row is None:
+        row = PreferenceProfile(session_id=str(session_id), profile=json.dumps(profile_from_history(session, session_id)))
+        session.add(row)
+    profile = apply_feedback(json.loads(row.profile), media, rating, would_watch_again)
+    row.profile = json.dumps(profile)
+    row.updated_at = datetime.utcnow()
+    return row
+
+def rebuild_profiles(session, session_id=None):
+    """Recompute profiles from the full feedback history (all sessions, or one)."""
+    profiles = {}
+    for row in _history(session, session_id):
+        apply_feedback(profiles.setdefault(str(row.group_size), empty_profile()), row, row.rating, row.would_watch_again)
+    try:
+        existing = session.query(PreferenceProfile)
+        if session_id is not None:
+            existing = existing.filter_by(session_id=str(session_id))
+        existing.delete(synchronize_session=False)
+        session.add_all(PreferenceProfile(session_id=sid, profile=json.dumps(p)) for sid, p in profiles.items())
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        logger.error(f"Error rebuilding preference profiles: {e}")
+        raise
+    logger.info(f"Rebuilt {len(profiles)} preference profiles")
+    return len(profiles)
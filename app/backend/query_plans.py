@@ -0,0 +1,54 @@
+from sqlalchemy import select, delete, or_
+from database import Media, Recommendation, Feedback, PreferenceProfile
+from profiles import _history
+
+# Placeholder values: plans don't depend on them, only on which columns are compared
+SESSION_ID = 'explain-session'
+SESSION_IDS = [SESSION_ID, 'explain-session-2']
+MEDIA_IDS = [1, 2, 3]
+
+def hot_queries(session):
+    """
+    (name, statement) for the per-request and per-sync queries on the
+    feedback and recommendation tables, built the way their call sites build
+    them. None of them may read a whole table.
+    """
+    return [
+        ('preference history', _history(session, SESSION_ID).statement),
+        ('preference profile', select(PreferenceProfile).filter_by(session_id=SESSION_ID).limit(1)),
+        # feedback_queue.write_feedback(): a batch's media by title, then its sessions' recommendations of them
+        ('feedback media lookup', select(Media).where(Media.title.in_(['Explain', 'Explain 2'])).order_by(Media.id)),
+        ('feedback recommendation lookup', select(Recommendation).where(
+            Recommendation.group_size.in_(SESSION_IDS), Recommendation.media_id.in_(MEDIA_IDS)).order_by(Recommendation.id)),
+        ('feedback recommendation lookup with cookieless events', select(Recommendation).where(
+            or_(Recommendation.group_size.in_(SESSION_IDS), Recommendation.group_size.is_(None)),
+            Recommendation.media_id.in_(MEDIA_IDS)).order_by(Recommendation.id)),
+        # database._delete_media_not_in(): dependents of pruned media
+        ('prune feedback', delete(Feedback).where(Feedback.recommendation_id.in_(
+            select(Recommendation.id).where(Recommendation.media_id.in_(MEDIA_IDS))))),
+        ('prune recommendations', delete(Recommendation).where(Recommendation.media_id.in_(MEDIA_IDS))),
+    ]
+
+def explain(session, statement):
+    """
+    Plan lines for a statement and the full table scans among them. On
+    Postgres sequential scans are disabled for the EXPLAIN, so a small test
+    table still shows whether an index could be used.
+    """
+    dialect = session.get_bind().dialect
+    sql = str(statement.compile(dialect=dialect, compile_kwargs={'literal_binds': True}))
+    conn = session.connection()
+    if dialect.name == 'sqlite':
+        # EXPLAIN never checks the schema version, so a pooled connection would plan against the schema it
+        # cached before e.g. a migration; a real read makes it reload
+        conn.exec_driver_sql('SELECT count(*) FROM sqlite_master').scalar()
+        lines = [row[3] for row in conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}')]
+        # 'SCAN t' and 'SCAN t USING COVERING INDEX i' both visit every row; 'SEARCH' uses an index
+        scans = [line for line in lines if line.startswith('SCAN ') and not line.startswith('SCAN CONSTANT')]
+    elif dialect.name == 'postgresql':
+        conn.exec_driver_sql('SET LOCAL enable_seqscan = off')
+        lines = [row[0] for row in conn.exec_driver_sql(f'EXPLAIN {sql}')]
+        scans = [line.strip() for line in lines if 'Seq Scan on' in line]
+    else:
+        raise ValueError(f"No EXPLAIN support for {dialect.name}")
+    return lines, scans
@@ -0,0 +1,59 @@
+import base64
+import json
+import uuid
+from cache import create_cache
+from errors import AppError
+from config import Config
+from metrics import register_cache
+
+def encode_cursor(snapshot_id, offset):
+    """Opaque pagination cursor: a position inside a ranking snapshot."""
+    raw = json.dumps({'s': snapshot_id, 'o': offset}, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        data = json.loads(raw)
+        return str(data['s']), int(data['o'])
+    except Exception:
+        raise AppError('Invalid cursor', status_code=400)
+
+class RankingSnapshots:
+    """
+    Ranked recommendation lists kept for paging. Page 1 ranks once and stores
+    the ordered top-K here; later pages are slices of the same snapshot, so
+    they stay consistent with page 1's shuffle and cost O(page size). Each
+    snapshot is also registered as the latest one for its query so clients
+    paging with ?page= (no cursor) land on it too. Snapshots are always kept
+    in the SQLite cache file, whatever RECOMMEND_CACHE_BACKEND says, so any
+    worker can serve any cursor.
+    """
+    def __init__(self, cache):
+        self.cache = cache
+
+    def create(self, snapshot, query_key=None, tags=()):
+        """Store a snapshot; with query_key it becomes that query's latest, dropped with any of `tags`."""
+        snapshot_id = uuid.uuid4().hex
+        self.put(snapshot_id, snapshot)
+        if query_key:
+            self.cache.set(f'latest:{query_key}', snapshot_id, tags=tags)
+        return snapshot_id
+
+    def put(self, snapshot_id, snapshot):
+        self.cache.set(f'snapshot:{snapshot_id}', snapshot)
+
+    def get(self, snapshot_id):
+        return self.cache.get(f'snapshot:{snapshot_id}')
+
+    def latest(self, query_key):
+        return self.cache.get(f'latest:{query_key}')
+
+RANKING_SNAPSHOTS = RankingSnapshots(create_cache(
+    'sqlite',
+    path=Config.RECOMMEND_CACHE_PATH,
+    max_entries=Config.RANK_SNAPSHOT_MAX_ENTRIES,
+    ttl=Config.RANK_SNAPSHOT_TTL,
+    namespace='ranking',
+))
+register_cache('ranking', RANKING_SNAPSHOTS.cache)
@@ -0,0 +1,132 @@
+import gzip
+import hashlib
+from datetime import date
+import orjson
+from flask import request, Response
+from werkzeug.http import http_date
+from config import Config
+
+try:
+    import brotli
+except ImportError:  # optional: without it responses are gzip-only
+    brotli = None
+
+JSON_MIMETYPE = 'application/json'
+ENCODINGS = ('br', 'gzip')
+
+def _default(value):
+    # Datetimes keep jsonify's wire format (RFC 822), so clients see the same lastViewedAt strings
+    if isinstance(value, date):
+        return http_date(value)
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(data):
+    """JSON bytes via orjson (NumPy scalars and arrays included)."""
+    return orjson.dumps(data, default=_default, option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_SERIALIZE_NUMPY)
+
+def loads(body):
+    return orjson.loads(body)
+
+def body_etag(body):
+    return hashlib.sha1(body).hexdigest()
+
+def requested_fields():
+    """Sorted field names from ?fields=a,b,c, or None to send whole items."""
+    value = request.args.get('fields')
+    if not value:
+        return None
+    return tuple(sorted(set(f.strip() for f in value.split(',') if f.strip()))) or None
+
+def select_fields(data, key, fields):
+    """Copy of `data` keeping only `fields` in each item of the list under `key`."""
+    if not fields:
+        return data
+    return dict(data, **{key: [{f: item[f] for f in fields if f in item} for item in data.get(key) or []]})
+
+def fields_etag(etag, fields):
+    """ETag of a field-selected variant, derived without serializing it."""
+    if not fields:
+        return etag
+    return hashlib.sha1(f"{etag}:{','.join(fields)}".encode()).hexdigest()
+
+def etag_matches(if_none_match, etag):
+    """Whether a parsed If-None-Match header names `etag` or one of its compressed variants."""
+    # Compressed variants carry an encoding suffix (see compress_response); they are the same resource
+    return any(if_none_match.contains(tag) for tag in (etag,) + tuple(f'{etag}-{e}' for e in ENCODINGS))
+
+def not_modified(etag):
+    return etag_matches(request.if_none_match, etag)
+
+def negotiated_encoding():
+    """The content-coding compress_response uses for this request (br over gzip), or None."""
+    accepted = request.accept_encodings
+    if brotli is not None and accepted.quality('br') > 0:
+        return 'br'
+    if accepted.quality('gzip') > 0:
+        return 'gzip'
+    return None
+
+def not_modified_etag(etag):
+    """
+    ETag for a 304: the variant the 200 would carry. The encoded one when
+    Accept-Encoding picks an encoding and the client holds that variant;
+    a client holding the plain one got a body below the compression size.
+    """
+    encoding = negotiated_encoding()
+    if encoding and request.if_none_match.contains(f'{etag}-{encoding}'):
+        return f'{etag}-{encoding}'
+    return etag
+
+def api_response(data=None, status=200, etag=None, body=None):
+    """
+    JSON response serialized with orjson and carrying a strong ETag: the
+    given one (e.g. stored with a cache entry, so a revalidation needs no
+    serialization) or a hash of the body. A matching If-None-Match gets an
+    empty 304. Compression happens later, in compress_response.
+    """
+    if body is None and (etag is None or status != 200 or not not_modified(etag)):
+        body = dumps(data)
+    if status != 200:
+        return Response(body, status=status, mimetype=JSON_MIMETYPE)
+    if etag is None:
+        etag = body_etag(body)
+    if not_modified(etag):
+        response = Response(status=304)
+        response.set_etag(not_modified_etag(etag))
+        response.vary.add('Accept-Encoding')
+        return response
+    response = Response(body, status=200, mimetype=JSON_MIMETYPE)
+    response.set_etag(etag)
+    return response
+
+def compress_response(response):
+    """
+    after_request hook: brotli- or gzip-encode API JSON bodies above
+    API_COMPRESS_MIN_BYTES when the client accepts it. The encoding is
+    appended to the ETag so each variant stays a distinct strong validator.
+    """
+    if (response.status_code != 200 or response.direct_passthrough or 'Content-Encoding' in response.headers
+            or response.mimetype != JSON_MIMETYPE or not request.path.startswith('/api/')):
+        return response
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    if len(data) < Config.API_COMPRESS_MIN_BYTES:
+        return response
+    encoding = negotiated_encoding()
+    if encoding == 'br':
+        data = brotli.compress(data, quality=Config.API_BROTLI_QUALITY)
+    elif encoding == 'gzip':
+        data = gzip.compress(data, compresslevel=Config.API_GZIP_LEVEL)
+    else:
+        return response
+    response.set_data(data)
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f'{etag}-{encoding}', weak)
+    return response
+
+def init_app(app):
+    app.after_request(compress_response)
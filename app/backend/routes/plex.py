@@ -1,6 +1,7 @@
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, request, jsonify, session, current_app
 from plex_client import PlexClient
 from errors import AppError
+from responses import api_response
 
 plex_bp = Blueprint('plex', __name__)
 
@@ -17,6 +18,13 @@ def plex_connect():
         # Store token and server name in session (or use secure credential store)
         session['plex_token'] = token
         session['plex_server_name'] = server.friendlyName if server else None
+        if current_app.config.get('PLEX_SYNC_ON_CONNECT'):
+            # Keep the local catalog fresh so recommendations don't hit Plex. The catalog is one library,
+            # synced with the configured PLEX_TOKEN for everyone: a visitor's token never drives the sync
+            from plex_background import get_background_sync
+            sync = get_background_sync()
+            if sync.token:
+                sync.start()
         return jsonify({'status': 'connected', 'server': server.friendlyName}), 200
     except AppError as e:
         return jsonify({'error': str(e)}), e.status_code
@@ -28,10 +36,11 @@ def plex_status():
     token = session.get('plex_token')
     server_name = session.get('plex_server_name')
     if not token:
-        return jsonify({'connected': False}), 200
-    client = PlexClient()
-    try:
-        server = client.connect_via_token(token, server_name)
-        return jsonify({'connected': True, 'server': server.friendlyName}), 200
-    except Exception:
-        return jsonify({'connected': False}), 200 
\ No newline at end of file
+        return api_response({'connected': False})
+    # Answered from the connection manager's health checks, no Plex round trip per poll;
+    # pollers revalidate with If-None-Match and get a 304 while nothing changed
+    status = PlexClient().status(token, server_name)
+    if not status['connected']:
+        return api_response({'connected': False})
+    return api_response(status)
+ 
\ No newline at end of file
@@ -0,0 +1,66 @@
+import hashlib
+import logging
+from flask import Blueprint, request, jsonify, session, Response
+from catalog import get_catalog, poster_version
+from plex_client import PlexClient
+from cache import DiskLRUCache
+from config import Config
+from metrics import register_cache
+from singleflight import SingleFlight
+
+poster_bp = Blueprint('poster', __name__)
+
+POSTER_CACHE = DiskLRUCache(Config.POSTER_CACHE_DIR, max_bytes=Config.POSTER_CACHE_MAX_BYTES)
+register_cache('poster', POSTER_CACHE)
+
+# Concurrent misses for the same poster wait for one Plex fetch instead of each making their own
+POSTER_FLIGHT = SingleFlight('poster')
+
+def poster_width(value):
+    """Snap a requested width up to a configured size, so the cache holds a few variants per poster."""
+    widths = sorted(Config.POSTER_WIDTHS)
+    try:
+        wanted = int(value)
+    except (TypeError, ValueError):
+        wanted = Config.POSTER_DEFAULT_WIDTH
+    return next((w for w in widths if w >= wanted), widths[-1])
+
+def poster_key(poster_path, width):
+    return hashlib.sha1(f'{poster_path}@{width}'.encode()).hexdigest()
+
+def poster_cache_control(poster_path, version):
+    # Versioned URLs (as the catalog hands out) never change content; unversioned ones may
+    if version == poster_version(poster_path):
+        return 'private, max-age=31536000, immutable'
+    return 'private, max-age=3600'
+
+@poster_bp.route('/api/v1/poster/<int:media_id>', methods=['GET'])
+def poster(media_id):
+    """A catalog item's poster, resized by Plex and cached on disk; the Plex token never reaches the browser."""
+    token = session.get('plex_token')
+    if not token:
+        return jsonify({'error': 'Not connected to Plex'}), 401
+    poster_path = get_catalog().poster_paths.get(media_id)
+    if not poster_path:
+        return jsonify({'error': 'No poster for this item'}), 404
+    width = poster_width(request.args.get('w'))
+    key = poster_key(poster_path, width)
+    cache_control = poster_cache_control(poster_path, request.args.get('v'))
+    if key in request.if_none_match:
+        response = Response(status=304)
+    else:
+        data = POSTER_CACHE.get(key)
+        if data is None:
+            def fetch():
+                fetched = PlexClient().fetch_poster(token, session.get('plex_server_name'), poster_path, width, width * 3 // 2)
+                POSTER_CACHE.set(key, fetched)
+                return fetched
+            try:
+                data, _ = POSTER_FLIGHT.do(key, fetch)
+            except Exception as e:
+                logging.warning(f"Poster fetch for media {media_id} failed: {e}")
+                return jsonify({'error': 'Poster unavailable'}), 502
+        response = Response(data, mimetype='image/jpeg')
+    response.set_etag(key)
+    response.headers['Cache-Control'] = cache_control
+    return response
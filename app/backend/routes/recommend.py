@@ -1,53 +1,71 @@
 from flask import Blueprint, request, jsonify, session, current_app, url_for
-from plex_client import PlexClient
+from plex_client import PlexClient, get_plex_url
+from catalog import get_catalog, poster_url, to_datetime
 from errors import AppError
+from mood_tags import MOOD_TAGS
+from scoring import FeatureMatrix, score_batch
+from cache import create_cache
+from config import Config
+from profiles import get_preferences
+from feedback_queue import FEEDBACK_WRITER, feedback_event, write_feedback
+from model import MODEL_STORE
+from similarity import NEIGHBOR_STORE
+from ranking import RANKING_SNAPSHOTS, encode_cursor, decode_cursor
+from singleflight import SingleFlight
+from responses import api_response, body_etag, dumps, loads, fields_etag, not_modified, requested_fields, select_fields
+from metrics import RECOMMEND_STAGE_SECONDS, RECOMMEND_REQUESTS, PLEX_REQUESTS, register_cache, sample_item_log
 import random
 from datetime import datetime
 import logging
-from database import get_session, Media, Recommendation, Feedback, add_record
-from sqlalchemy.orm.exc import NoResultFound
-import threading
-import time
 import hashlib
+import heapq
+import time
 
 recommend_bp = Blueprint('recommend', __name__)
 
-MOOD_TAGS = {
-    'light_funny': ['comedy', 'family', 'animation'],
-    'intense': ['action', 'thriller', 'crime'],
-    'emotional': ['drama', 'romance', 'biography'],
-    'dramatic': ['musical', 'mystery', 'historical'],
-}
-
-# In-memory cache for recommendations
-RECOMMEND_CACHE = {}
-RECOMMEND_CACHE_LOCK = threading.Lock()
-CACHE_TTL = 600  # 10 minutes
+# Recommendation cache: pages are tagged with the session id so feedback can invalidate them
+RECOMMEND_CACHE = create_cache(
+    Config.RECOMMEND_CACHE_BACKEND,
+    path=Config.RECOMMEND_CACHE_PATH,
+    max_entries=Config.RECOMMEND_CACHE_MAX_ENTRIES,
+    ttl=Config.RECOMMEND_CACHE_TTL,
+)
+register_cache('recommend', RECOMMEND_CACHE)
+# Concurrent identical page computations and live library fetches run once per process
+RECOMMEND_FLIGHT = SingleFlight('recommend')
+LIBRARY_FLIGHT = SingleFlight('library')
 
 def make_cache_key(session_id, user, page, size):
     key_str = f"{session_id}:{user['time']}:{user['moods']}:{user['genres']}:{user['format']}:{user['comfortMode']}:{user['surprise']}:{page}:{size}"
     return hashlib.sha256(key_str.encode()).hexdigest()
 
 def get_cached_recommendations(session_id, user, page, size):
-    key = make_cache_key(session_id, user, page, size)
-    with RECOMMEND_CACHE_LOCK:
-        entry = RECOMMEND_CACHE.get(key)
-        if entry and (time.time() - entry['ts'] < CACHE_TTL):
-            return entry['data']
-        elif entry:
-            del RECOMMEND_CACHE[key]
-    return None
+    """(etag, serialized body) of a cached page, or None."""
+    return RECOMMEND_CACHE.get(make_cache_key(session_id, user, page, size))
 
-def set_cached_recommendations(session_id, user, page, size, data):
-    key = make_cache_key(session_id, user, page, size)
-    with RECOMMEND_CACHE_LOCK:
-        RECOMMEND_CACHE[key] = {'data': data, 'ts': time.time()}
+def set_cached_recommendations(session_id, user, page, size, etag, body):
+    RECOMMEND_CACHE.set(make_cache_key(session_id, user, page, size), (etag, body), tags=(session_id,))
+
+def recommendations_response(etag, body, result=None):
+    """
+    Response for a serialized page: revalidations are answered from the ETag
+    alone, and ?fields= trims each recommendation to the named fields.
+    """
+    fields = requested_fields()
+    if not fields:
+        return api_response(etag=etag, body=body)
+    etag = fields_etag(etag, fields)
+    if not_modified(etag):
+        return api_response(etag=etag)
+    with RECOMMEND_STAGE_SECONDS.time(stage='serialize'):
+        body = dumps(select_fields(result if result is not None else loads(body), 'recommendations', fields))
+    return api_response(etag=etag, body=body)
 
 def invalidate_cache_for_session(session_id):
-    with RECOMMEND_CACHE_LOCK:
-        keys = [k for k in RECOMMEND_CACHE if k.startswith(session_id)]
-        for k in keys:
-            del RECOMMEND_CACHE[k]
+    # Cached pages, and the pointers that send ?page= requests to the session's latest snapshot; cursors
+    # keep paging through the snapshot they started on
+    RANKING_SNAPSHOTS.cache.invalidate_tag(session_id)
+    return RECOMMEND_CACHE.invalidate_tag(session_id)
 
 def filter_by_time(item, time_pref):
     d = item['duration']
@@ -64,30 +82,7 @@ def filter_by_time(item, time_pref):
 def filter_by_format(item, fmt):
     return fmt == 'any' or item['type'] == fmt
 
-def get_liked_disliked_attributes(session_id):
-    session = get_session()
-    feedbacks = session.query(Feedback).join(Recommendation).join(Media).filter(Recommendation.group_size == session_id).all()
-    liked = {'genres': set(), 'directors': set(), 'cast': set()}
-    disliked = {'genres': set(), 'directors': set(), 'cast': set()}
-    for fb in feedbacks:
-        rec = fb.recommendation
-        media = rec.media
-        if fb.rating == 5 or fb.would_watch_again is True:
-            liked['genres'].update((media.genres or '').split(','))
-            liked['directors'].update(getattr(media, 'directors', '').split(','))
-            liked['cast'].update(getattr(media, 'cast', '').split(','))
-        elif fb.rating == 1 or fb.would_watch_again is False:
-            disliked['genres'].update((media.genres or '').split(','))
-            disliked['directors'].update(getattr(media, 'directors', '').split(','))
-            disliked['cast'].update(getattr(media, 'cast', '').split(','))
-    session.close()
-    # Remove empty strings
-    for k in liked:
-        liked[k] = set(x.strip() for x in liked[k] if x.strip())
-        disliked[k] = set(x.strip() for x in disliked[k] if x.strip())
-    return liked, disliked
-
-def score_item(item, user, feedback_map=None, liked=None, disliked=None, surprise=False):
+def score_item(item, user, feedback_map=None, liked=None, disliked=None, surprise=False, summary_terms=None, content_boost=True):
     score = 0
     genres = [g.lower() for g in item['genres']]
     directors = set(item.get('directors', []))
@@ -108,9 +103,13 @@ def score_item(item, user, feedback_map=None, liked=None, disliked=None, surpris
     mood_tags = []
     for mood in user_moods:
         mood_tags.extend(MOOD_TAGS.get(mood, []))
+    # Summary mood terms come precomputed from the catalog's SummaryIndex when available
+    terms = summary_terms.get(item.get('id')) if summary_terms else None
     if any(tag in genres for tag in mood_tags):
         score += 10
-    elif any(tag in item['summary'].lower() for tag in mood_tags):
+    elif terms is not None and any(tag in terms for tag in mood_tags):
+        score += 5
+    elif terms is None and any(tag in item['summary'].lower() for tag in mood_tags):
         score += 5
     # Genre match (multi-select support)
     user_genres = user.get('genres') or []
@@ -127,15 +126,16 @@ def score_item(item, user, feedback_map=None, liked=None, disliked=None, surpris
             score += 15
         elif fb == 'down':
             score -= 20
-    # Content-based filtering: boost for similarity to liked, demote for similarity to disliked
-    if liked:
+    # Content-based filtering: boost for similarity to liked, demote for similarity to disliked (unless
+    # neighbor lookups stand in for it, see PERSONAL_BOOST)
+    if liked and content_boost:
         if liked['genres'] and any(g in liked['genres'] for g in genres):
             score += 6
         if liked['directors'] and directors & liked['directors']:
             score += 4
         if liked['cast'] and cast & liked['cast']:
             score += 2
-    if disliked:
+    if disliked and content_boost:
         if disliked['genres'] and any(g in disliked['genres'] for g in genres):
             score -= 8
         if disliked['directors'] and directors & disliked['directors']:
@@ -149,65 +149,108 @@ def score_item(item, user, feedback_map=None, liked=None, disliked=None, surpris
             score += random.randint(0, 8)
     return score
 
-def get_feedback_map(session_id):
-    session = get_session()
-    feedbacks = session.query(Feedback).join(Recommendation).join(Media).filter(Recommendation.group_size == session_id).all()
-    feedback_map = {}
-    for fb in feedbacks:
-        rec = fb.recommendation
-        media = rec.media
-        if fb.rating == 1 or fb.would_watch_again is False:
-            feedback_map[media.title] = 'down'
-        elif fb.rating == 5 or fb.would_watch_again is True:
-            feedback_map[media.title] = 'up'
-    session.close()
-    return feedback_map
+SHUFFLE_TOP_N = 10
+# Most-watched titles put ahead of everything in comfort mode
+COMFORT_ITEMS = 3
+
+def get_suggestions(media, user, feedback_map=None, liked=None, disliked=None, surprise=False, page=1, features=None, rows=None, summary_terms=None):
+    return rank_suggestions(media, user, feedback_map, liked, disliked, surprise, page, features, rows, summary_terms=summary_terms)[0]
 
-def get_suggestions(media, user, feedback_map=None, liked=None, disliked=None, surprise=False, page=1):
-    scored = [
-        {'item': item, 'score': score_item(item, user, feedback_map, liked, disliked, surprise)}
-        for item in media
-    ]
+def rank_suggestions(media, user, feedback_map=None, liked=None, disliked=None, surprise=False, page=1, features=None, rows=None, limit=None, exclude_titles=None, summary_terms=None, adjustments=None, content_boost=True):
+    """
+    Rank media for the user. With `limit`, only the first `limit` suggestions
+    are produced: candidates are picked with a heap (or a random sample in
+    surprise mode) instead of sorting the whole list. Titles in
+    `exclude_titles` (already served) are skipped. Returns
+    (suggestions, complete) where complete means nothing ranks after them.
+    `adjustments` is an optional per-item score change (learned model,
+    neighbors of liked and disliked titles) added to the rule-based score;
+    content_boost=False leaves the liked/disliked attribute terms out of it.
+    """
+    with RECOMMEND_STAGE_SECONDS.time(stage='scoring'):
+        if features is not None:
+            # Vectorized engine: same weights as score_item, one pass over the feature matrix
+            scores = score_batch(features, user, feedback_map, liked, disliked, surprise, rows=rows, content_boost=content_boost)
+            if adjustments is not None:
+                scores = scores + adjustments
+            scored = [{'item': item, 'score': int(score)} for item, score in zip(media, scores)]
+        else:
+            scored = [
+                {'item': item, 'score': score_item(item, user, feedback_map, liked, disliked, surprise, summary_terms, content_boost)}
+                for item in media
+            ]
+            if adjustments is not None:
+                for entry, bonus in zip(scored, adjustments.tolist()):
+                    entry['score'] += bonus
+    sort_started = time.perf_counter()
     logging.info(f"Scored {len(scored)} items")
-    scored = [entry for entry in scored if entry['score'] > 0]
+    exclude_titles = exclude_titles or set()
+    scored = [entry for entry in scored if entry['score'] > 0 and entry['item']['title'] not in exclude_titles]
     logging.info(f"{len(scored)} items passed score > 0 filter")
-    # Always sort by score DESC, then by title ASC for stability
-    scored.sort(key=lambda x: (-x['score'], x['item']['title']))
-    N = 10
-    # Only shuffle for first page and if surprise is on
-    if page == 1 and surprise:
-        random.shuffle(scored)
-    elif page == 1 and not surprise:
-        top_n = scored[:N]
-        random.shuffle(top_n)
-        scored = top_n + scored[N:]
-    # For page > 1, do not shuffle at all
-    recommendations = [entry['item'] for entry in scored]
     # Hybrid comfort mode: prepend top comfort items if comfortMode is on
-    if user.get('comfortMode'):
+    comfort_items = []
+    if user.get('comfortMode') and not exclude_titles:  # a continuation already has them at its head
         # Find top 3 most-watched items (viewCount >= 3), sorted by viewCount DESC
-        comfort_items = sorted(
+        comfort_items = heapq.nlargest(
+            COMFORT_ITEMS,
             [item for item in media if item.get('viewCount', 0) >= 3],
-            key=lambda x: -x.get('viewCount', 0)
-        )[:3]
-        # Remove any duplicates from recommendations
-        comfort_titles = set(item['title'] for item in comfort_items)
-        recommendations = comfort_items + [item for item in recommendations if item['title'] not in comfort_titles]
-    if not recommendations:
-        fallback = sorted(media, key=lambda x: x.get('viewCount', 0), reverse=True)[:3]
-        logging.info("No recommendations passed filter, using fallback by viewCount")
-        recommendations = fallback
-    # Deduplicate by title, preserving order
-    seen_titles = set()
-    deduped = []
-    for item in recommendations:
-        if item['title'] not in seen_titles:
-            deduped.append(item)
-            seen_titles.add(item['title'])
-    logging.info(f"Returning {len(deduped)} recommendations: {[item.get('title', '') for item in deduped]}")
-    return deduped
+            key=lambda x: x.get('viewCount', 0)
+        )
+    comfort_titles = set(item['title'] for item in comfort_items)
+    # Always order by score DESC, then by title ASC for stability
+    sort_key = lambda x: (-x['score'], x['item']['title'])
+    k = None if limit is None else max(limit, SHUFFLE_TOP_N) + len(comfort_items) + SHUFFLE_TOP_N
+    while True:
+        complete = k is None or k >= len(scored)
+        # Only shuffle for first page and if surprise is on
+        if page == 1 and surprise:
+            # A uniform sample in random order is the prefix of a full shuffle
+            ordered = list(scored) if complete else random.sample(scored, k)
+            if complete:
+                random.shuffle(ordered)
+        else:
+            ordered = sorted(scored, key=sort_key) if complete else heapq.nsmallest(k, scored, key=sort_key)
+            if page == 1:
+                top_n = ordered[:SHUFFLE_TOP_N]
+                random.shuffle(top_n)
+                ordered = top_n + ordered[SHUFFLE_TOP_N:]
+        # For page > 1, do not shuffle at all
+        recommendations = comfort_items + [entry['item'] for entry in ordered if entry['item']['title'] not in comfort_titles]
+        if not recommendations and not exclude_titles:
+            fallback = sorted(media, key=lambda x: x.get('viewCount', 0), reverse=True)[:3]
+            logging.info("No recommendations passed filter, using fallback by viewCount")
+            recommendations = fallback
+        # Deduplicate by title, preserving order
+        seen_titles = set()
+        deduped = []
+        for item in recommendations:
+            if item['title'] not in seen_titles:
+                deduped.append(item)
+                seen_titles.add(item['title'])
+        if limit is None or complete or len(deduped) >= limit:
+            break
+        # Duplicate titles ate into the candidates; select a larger prefix
+        k *= 2
+    if limit is not None and len(deduped) > limit:
+        deduped = deduped[:limit]
+        complete = False
+    RECOMMEND_STAGE_SECONDS.observe(time.perf_counter() - sort_started, stage='sort')
+    logging.info(f"Returning {len(deduped)} recommendations")
+    for rank, item in enumerate(deduped):
+        if sample_item_log():
+            logging.debug(f"Recommendation #{rank + 1}: {item.get('title', '')}")
+    return deduped, complete
 
-def filter_media(media, user):
+def filter_media(media, user, index=None):
+    """
+    Drop items failing the user's format/time/genre/mood choices. With a
+    CandidateIndex built over `media`, the checks run as index lookups.
+    """
+    if index is not None:
+        rows, counts = index.filter(user)
+        filtered = [media[row] for row in rows]
+        logging.info(f"Filtered out {counts['format']} by format, {counts['time']} by time, {counts['genre']} by genre, {counts['mood']} by mood. {len(filtered)} items remain after filtering.")
+        return filtered
     filtered = []
     user_format = user.get('format', 'any')
     user_time = user.get('time', '1_2h')
@@ -242,6 +285,59 @@ def filter_media(media, user):
     logging.info(f"Filtered out {count_format} by format, {count_time} by time, {count_genre} by genre, {count_mood} by mood. {len(filtered)} items remain after filtering.")
     return filtered
 
+def fetch_live_media(token, server_name, user_format):
+    """Pull media straight from Plex; used when the synced catalog is unavailable."""
+    client = PlexClient()
+    with RECOMMEND_STAGE_SECONDS.time(stage='plex_fetch'):
+        server = client.connect_via_token(token, server_name)
+        # Optimize media loading
+        if user_format == 'movie':
+            items = server.library.section('Movies').all()
+        elif user_format == 'show':
+            items = server.library.section('TV Shows').all()
+        else:
+            items = server.library.all()
+    with RECOMMEND_STAGE_SECONDS.time(stage='hydrate'):
+        items, calls = client.hydrate(server, items)
+    PLEX_REQUESTS.inc(calls, source='live', kind='metadata')
+    logging.info(f"Fetched {len(items)} items from Plex library ({calls} metadata requests)")
+    build_started = time.perf_counter()
+    for item in items:
+        if sample_item_log():
+            logging.debug(f"Item: {getattr(item, 'title', 'N/A')}, type: {getattr(item, 'type', 'N/A')}, genres: {getattr(item, 'genres', [])}, duration: {getattr(item, 'duration', 0)}, viewCount: {getattr(item, 'viewCount', 0)}")
+    media = []
+    plex_base_url = server._baseurl if hasattr(server, '_baseurl') else None
+    for item in items:
+        if hasattr(item, 'type') and item.type in ('movie', 'show'):
+            genres = [g.tag for g in getattr(item, 'genres', [])]
+            duration_min = getattr(item, 'duration', 0) / 60000
+            view_count = getattr(item, 'viewCount', 0)
+            last_viewed = to_datetime(getattr(item, 'lastViewedAt', None))
+            year = getattr(item, 'year', None)
+            content_rating = getattr(item, 'contentRating', None)
+            directors = [d.tag for d in getattr(item, 'directors', [])] if hasattr(item, 'directors') else []
+            cast = [r.tag for r in getattr(item, 'roles', [])] if hasattr(item, 'roles') else []
+            unwatched = view_count == 0
+            media.append({
+                'title': getattr(item, 'title', ''),
+                'type': item.type,
+                'genres': genres,
+                'duration': duration_min,
+                'viewCount': view_count,
+                'lastViewedAt': last_viewed,
+                'rating': getattr(item, 'rating', None),
+                'summary': getattr(item, 'summary', ''),
+                'posterUrl': poster_url(getattr(item, 'thumb', None), plex_base_url, token),
+                'year': year,
+                'contentRating': content_rating,
+                'directors': directors,
+                'cast': cast,
+                'unwatched': unwatched,
+            })
+    RECOMMEND_STAGE_SECONDS.observe(time.perf_counter() - build_started, stage='media_build')
+    logging.info(f"Prepared {len(media)} media items for recommendation scoring.")
+    return media
+
 @recommend_bp.route('/api/v1/recommend', methods=['POST'])
 def recommend():
     token = session.get('plex_token')
@@ -266,83 +362,152 @@ def recommend():
         'surprise': data.get('surprise', False),
     }
     session_id = session.get('user_id') or session.sid if hasattr(session, 'sid') else request.cookies.get('session')
+    cursor = request.args.get('cursor') or data.get('cursor')
     # Check cache
-    cached = get_cached_recommendations(str(session_id), user, page, size)
-    if cached:
-        logging.info(f"Returning cached recommendations for session {session_id}")
-        return jsonify(cached), 200
-    client = PlexClient()
+    if not cursor:
+        cached = get_cached_recommendations(str(session_id), user, page, size)
+        # A shared SQLite cache can still hold result dicts written before pages were stored serialized
+        if isinstance(cached, tuple):
+            logging.info(f"Returning cached recommendations for session {session_id}")
+            RECOMMEND_REQUESTS.inc(result='cache_hit')
+            return recommendations_response(*cached)
     try:
-        server = client.connect_via_token(token, server_name)
-        # Optimize media loading
-        if user['format'] == 'movie':
-            items = server.library.section('Movies').all()
-        elif user['format'] == 'show':
-            items = server.library.section('TV Shows').all()
-        else:
-            items = server.library.all()
-        logging.info(f"Fetched {len(items)} items from Plex library")
-        for item in items:
-            logging.info(f"Item: {getattr(item, 'title', 'N/A')}, type: {getattr(item, 'type', 'N/A')}, genres: {getattr(item, 'genres', [])}, duration: {getattr(item, 'duration', 0)}, viewCount: {getattr(item, 'viewCount', 0)}")
-        media = []
-        plex_base_url = server._baseurl if hasattr(server, '_baseurl') else None
-        for item in items:
-            if hasattr(item, 'type') and item.type in ('movie', 'show'):
-                genres = [g.tag for g in getattr(item, 'genres', [])]
-                duration_min = getattr(item, 'duration', 0) / 60000
-                view_count = getattr(item, 'viewCount', 0)
-                last_viewed = getattr(item, 'lastViewedAt', None)
-                if last_viewed:
-                    try:
-                        last_viewed = datetime.fromtimestamp(last_viewed)
-                    except Exception:
-                        last_viewed = None
-                poster_path = getattr(item, 'thumb', None)
-                poster_url = None
-                if poster_path and plex_base_url:
-                    poster_url = f"{plex_base_url}{poster_path}?X-Plex-Token={token}"
-                year = getattr(item, 'year', None)
-                content_rating = getattr(item, 'contentRating', None)
-                directors = [d.tag for d in getattr(item, 'directors', [])] if hasattr(item, 'directors') else []
-                cast = [r.tag for r in getattr(item, 'roles', [])] if hasattr(item, 'roles') else []
-                unwatched = view_count == 0
-                media.append({
-                    'title': getattr(item, 'title', ''),
-                    'type': item.type,
-                    'genres': genres,
-                    'duration': duration_min,
-                    'viewCount': view_count,
-                    'lastViewedAt': last_viewed,
-                    'rating': getattr(item, 'rating', None),
-                    'summary': getattr(item, 'summary', ''),
-                    'posterUrl': poster_url,
-                    'year': year,
-                    'contentRating': content_rating,
-                    'directors': directors,
-                    'cast': cast,
-                    'unwatched': unwatched,
-                })
-        logging.info(f"Prepared {len(media)} media items for recommendation scoring.")
-        filtered_media = filter_media(media, user)
-        if not filtered_media:
-            filtered_media = media
-        feedback_map = get_feedback_map(session_id)
-        liked, disliked = get_liked_disliked_attributes(session_id)
-        suggestions = get_suggestions(filtered_media, user, feedback_map, liked, disliked, user.get('surprise', False), page)
-        total = len(suggestions)
-        start = (page - 1) * size
-        end = start + size
-        paged = suggestions[start:end]
-        has_more = end < total
-        result = {'recommendations': paged, 'hasMore': has_more}
-        set_cached_recommendations(str(session_id), user, page, size, result)
-        return jsonify(result), 200
+        # Identical requests arriving together (tabs of one household, double submits) rank once;
+        # the others wait for that page and are counted as coalesced
+        def compute():
+            if not cursor:
+                # The page may have been cached by a flight that ended after the check above
+                cached = get_cached_recommendations(str(session_id), user, page, size)
+                if isinstance(cached, tuple):
+                    RECOMMEND_REQUESTS.inc(result='cache_hit')
+                    return cached[0], cached[1], None
+            return build_page(token, server_name, session_id, user, page, size, cursor)
+        (etag, body, result), shared = RECOMMEND_FLIGHT.do(make_cache_key(str(session_id), user, cursor or page, size), compute)
+        if shared:
+            RECOMMEND_REQUESTS.inc(result='coalesced')
+        return recommendations_response(etag, body, result)
     except AppError as e:
         return jsonify({'error': str(e)}), e.status_code
     except Exception as e:
         logging.exception("Error in /api/v1/recommend endpoint:")
         return jsonify({'error': str(e)}), 500
 
+def build_page(token, server_name, session_id, user, page, size, cursor):
+    """Rank (or read from a snapshot) one page and serialize it: (etag, body, result). Caches page-number pages."""
+    query_key = make_cache_key(str(session_id), user, 'ranking', size)
+    if cursor:
+        snapshot_id, start = decode_cursor(cursor)
+    else:
+        snapshot_id = RANKING_SNAPSHOTS.latest(query_key) if page > 1 else None
+        start = (page - 1) * size
+    end = start + size
+    snapshot = RANKING_SNAPSHOTS.get(snapshot_id) if snapshot_id else None
+    answered = 'snapshot'
+    if snapshot is None:
+        if start > 0 and (user.get('surprise') or start < SHUFFLE_TOP_N + COMFORT_ITEMS):
+            # What came before `start` was drawn at random and can't be ranked again: the client starts over,
+            # and mustn't be handed a cached first page pointing at the same expired snapshot
+            RECOMMEND_REQUESTS.inc(result='expired')
+            invalidate_cache_for_session(str(session_id))
+            raise AppError('These recommendations have expired, start again from the first page', status_code=410)
+        answered = 'ranked'
+        # Page 1, or the snapshot expired: rank the top-K once and keep it for later pages. A later page ranks
+        # without the shuffle, which past the shuffled head is the order page 1 served
+        ranked_page = 1 if start == 0 else 2
+        snapshot = build_ranking(token, server_name, session_id, user, ranked_page, max(current_app.config.get('RANK_TOP_K', 100), end + 1))
+        snapshot_id = RANKING_SNAPSHOTS.create(snapshot, query_key if start == 0 else None, tags=(str(session_id),))
+    elif end >= len(snapshot['items']) and not snapshot['complete']:
+        answered = 'extended'
+        # Paged past the ranked prefix: rank the next stretch, keeping what was already served
+        snapshot = build_ranking(token, server_name, session_id, user, 2, end + current_app.config.get('RANK_TOP_K', 100), base=snapshot)
+        RANKING_SNAPSHOTS.put(snapshot_id, snapshot)
+    RECOMMEND_REQUESTS.inc(result=answered)
+    paged = snapshot['items'][start:end]
+    has_more = end < len(snapshot['items']) or not snapshot['complete']
+    result = {
+        'recommendations': paged,
+        'hasMore': has_more,
+        'nextCursor': encode_cursor(snapshot_id, end) if has_more else None,
+        'catalog': snapshot['catalog'],
+    }
+    with RECOMMEND_STAGE_SECONDS.time(stage='serialize'):
+        body = dumps(result)
+    etag = body_etag(body)
+    if not cursor:
+        set_cached_recommendations(str(session_id), user, page, size, etag, body)
+    return etag, body, result
+
+def build_ranking(token, server_name, session_id, user, page, limit, base=None):
+    """
+    Score and rank media for a request, returning a snapshot dict with the
+    first `limit` suggestions. With `base`, the new suggestions continue an
+    existing snapshot instead of replacing it.
+    """
+    catalog = None
+    if current_app.config.get('RECOMMEND_SOURCE', 'catalog') == 'catalog':
+        try:
+            with RECOMMEND_STAGE_SECONDS.time(stage='catalog'):
+                catalog = get_catalog()
+        except Exception:
+            logging.exception("Failed to load media catalog, falling back to live Plex fetch")
+        if catalog is not None and not len(catalog):
+            logging.info("Media catalog is empty (no sync yet), falling back to live Plex fetch")
+            catalog = None
+    if catalog is not None:
+        media = catalog.media_for_format(user['format'])
+        with RECOMMEND_STAGE_SECONDS.time(stage='filter'):
+            filtered_media = filter_media(catalog.items, user, index=catalog.candidates())
+    else:
+        # Concurrent live requests for one library share a single Plex fetch
+        media, _ = LIBRARY_FLIGHT.do((get_plex_url(), token, server_name, user['format']),
+                                     lambda: fetch_live_media(token, server_name, user['format']))
+        with RECOMMEND_STAGE_SECONDS.time(stage='filter'):
+            filtered_media = filter_media(media, user)
+    if not filtered_media:
+        filtered_media = media
+    with RECOMMEND_STAGE_SECONDS.time(stage='feedback'):
+        feedback_map, liked, disliked = get_preferences(session_id)
+    features = rows = None
+    if current_app.config.get('SCORING_ENGINE') == 'vector':
+        if catalog is not None:
+            features = catalog.features()
+            rows = catalog.rows_for(filtered_media)
+        else:
+            features = FeatureMatrix(filtered_media)
+    # Learned model: one batched prediction per catalog version, then a row lookup per request
+    model_weight = current_app.config.get('MODEL_SCORE_WEIGHT', 0)
+    with RECOMMEND_STAGE_SECONDS.time(stage='model'):
+        if catalog is not None:
+            adjustments = MODEL_STORE.catalog_bonus(catalog, model_weight)
+        else:
+            adjustments = MODEL_STORE.media_bonus(filtered_media, model_weight)
+    # Neighbors of the session's liked/disliked titles, looked up in the precomputed similarity table, in
+    # place of scanning every item's attributes against theirs (PERSONAL_BOOST=neighbors)
+    content_boost = True
+    if current_app.config.get('PERSONAL_BOOST') == 'neighbors' and catalog is not None and feedback_map:
+        with RECOMMEND_STAGE_SECONDS.time(stage='similar'):
+            liked_ids = catalog.ids_for_titles([t for t, fb in feedback_map.items() if fb == 'up'])
+            disliked_ids = catalog.ids_for_titles([t for t, fb in feedback_map.items() if fb == 'down'])
+            similar = NEIGHBOR_STORE.catalog_bonus(catalog, liked_ids, disliked_ids, current_app.config.get('SIMILAR_BOOST', 0))
+        # Without a table yet (or with nothing to look up) the attribute terms stay
+        if similar is not None:
+            adjustments = similar if adjustments is None else adjustments + similar
+            content_boost = False
+    if catalog is not None and adjustments is not None:
+        adjustments = adjustments[rows if rows is not None else catalog.rows_for(filtered_media)]
+    served = base['items'] if base else []
+    suggestions, complete = rank_suggestions(
+        filtered_media, user, feedback_map, liked, disliked, user.get('surprise', False), page, features, rows,
+        limit=limit - len(served), exclude_titles=set(item['title'] for item in served),
+        summary_terms=catalog.summary_terms if catalog is not None else None, adjustments=adjustments,
+        content_boost=content_boost,
+    )
+    if catalog is not None:
+        source = catalog.staleness()
+    else:
+        source = {'source': 'live'}
+    return {'items': served + suggestions, 'complete': complete, 'catalog': source}
+
 # Optionally, keep the old endpoint for backward compatibility
 @recommend_bp.route('/api/recommend', methods=['POST'])
 def recommend_legacy():
@@ -355,38 +520,20 @@ def feedback():
     feedback_type = data.get('feedback')
     timestamp = data.get('timestamp')
     session_id = session.get('user_id') or session.sid if hasattr(session, 'sid') else request.cookies.get('session')
-    db = get_session()
-    try:
-        # Find or create Media
-        media = db.query(Media).filter_by(title=title).first()
-        if not media:
-            media = Media(title=title, plex_id=title, type='movie')  # fallback, ideally use plex_id
-            db.add(media)
-            db.commit()
-            db.refresh(media)
-        # Find or create Recommendation for this session/media
-        rec = db.query(Recommendation).filter_by(media_id=media.id, group_size=session_id).first()
-        if not rec:
-            rec = Recommendation(media_id=media.id, group_size=session_id, timestamp=datetime.utcnow())
-            db.add(rec)
-            db.commit()
-            db.refresh(rec)
-        # Add Feedback
-        fb = Feedback(recommendation_id=rec.id, timestamp=datetime.utcnow())
-        if feedback_type == 'up':
-            fb.rating = 5
-            fb.would_watch_again = True
-        elif feedback_type == 'down':
-            fb.rating = 1
-            fb.would_watch_again = False
-        db.add(fb)
-        db.commit()
-        # Invalidate cache for this session
-        invalidate_cache_for_session(str(session_id))
+    if not title:
+        return jsonify({'error': 'Missing title'}), 400
+    event = feedback_event(session_id, title, feedback_type, datetime.utcnow())
+    if current_app.config.get('FEEDBACK_WRITE_MODE', 'queue') == 'sync':
+        try:
+            write_feedback([event])
+        except Exception as e:
+            logging.exception("Error saving feedback:")
+            return jsonify({'error': str(e)}), 500
         return jsonify({'status': 'ok'}), 200
-    except Exception as e:
-        db.rollback()
-        logging.exception("Error saving feedback:")
-        return jsonify({'error': str(e)}), 500
-    finally:
-        db.close()
+    # Written (and this session's cached recommendations invalidated) by the background writer; the
+    # response stays the 200 clients always got
+    if not FEEDBACK_WRITER.submit(event):
+        response = jsonify({'error': 'Feedback queue is full, try again shortly'})
+        response.headers['Retry-After'] = '1'
+        return response, 503
+    return jsonify({'status': 'ok'}), 200
@@ -0,0 +1,31 @@
+from flask import Blueprint, request, jsonify, current_app
+from catalog import get_catalog
+from similarity import NEIGHBOR_STORE
+from responses import api_response, requested_fields, select_fields
+
+similar_bp = Blueprint('similar', __name__)
+
+@similar_bp.route('/api/v1/similar/<int:media_id>', methods=['GET'])
+def similar(media_id):
+    """Items most like a catalog item, read from the precomputed neighbor table."""
+    try:
+        limit = int(request.args.get('limit', 10))
+    except ValueError:
+        limit = 10
+    limit = max(1, min(limit, current_app.config.get('SIMILAR_NEIGHBORS', 20)))
+    table = NEIGHBOR_STORE.current()
+    if table is None:
+        return jsonify({'error': 'Similarity table has not been built yet'}), 503
+    catalog = get_catalog()
+    item = catalog.item(media_id)
+    if item is None:
+        return jsonify({'error': 'Unknown media id'}), 404
+    results = []
+    for neighbor_id, score in table.similar(media_id):
+        neighbor = catalog.item(neighbor_id)
+        if neighbor is not None:  # removed since the table was built
+            results.append(dict(neighbor, similarity=round(score, 4)))
+            if len(results) == limit:
+                break
+    data = {'id': media_id, 'title': item['title'], 'similar': results, 'version': table.version}
+    return api_response(select_fields(data, 'similar', requested_fields()))
@@ -1,7 +1,26 @@
 from flask import Blueprint, jsonify
+from model import MODEL_STORE
+from trainer import submit_training, job_status
 
 train_bp = Blueprint('train', __name__)
 
 @train_bp.route('/api/train', methods=['POST'])
 def train_model():
-    return jsonify({'error': 'Not implemented'}), 501
+    # Training runs in the trainer process; poll /api/train/<job_id> for the outcome
+    job = submit_training()
+    return jsonify(job), 202
+
+@train_bp.route('/api/train', methods=['GET'])
+def model_status():
+    model = MODEL_STORE.current()
+    if model is None:
+        return jsonify({'model': None}), 200
+    meta = {k: v for k, v in model.meta.items() if k != 'vocab'}
+    return jsonify({'model': meta}), 200
+
+@train_bp.route('/api/train/<job_id>', methods=['GET'])
+def training_job(job_id):
+    job = job_status(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown training job'}), 404
+    return jsonify(job), 200
@@ -0,0 +1,164 @@
+import random
+import numpy as np
+from mood_tags import MOOD_TAGS, ALL_MOOD_TAGS
+from summary_index import summary_mood_terms
+
+class TagSets:
+    """Per-item tag sets (directors, cast) stored as flat (row, tag id) arrays."""
+    def __init__(self, media, field):
+        self.vocab = {}
+        rows = []
+        tag_ids = []
+        for row, item in enumerate(media):
+            for tag in set(item.get(field, [])):
+                rows.append(row)
+                tag_ids.append(self.vocab.setdefault(tag, len(self.vocab)))
+        self.rows = np.array(rows, dtype=np.int32)
+        self.tag_ids = np.array(tag_ids, dtype=np.int32)
+        self.size = len(media)
+
+    def overlaps(self, tags):
+        """Boolean mask of items sharing at least one tag with `tags`."""
+        mask = np.zeros(self.size, dtype=bool)
+        wanted = [self.vocab[t] for t in tags if t in self.vocab]
+        if wanted:
+            mask[self.rows[np.isin(self.tag_ids, wanted)]] = True
+        return mask
+
+class FeatureMatrix:
+    """
+    Columnar scoring features for a list of media dicts. Building it does all
+    the per-item string work (lowercasing genres, set building, summary
+    scans) once, so it should be cached per catalog version. Summary mood
+    terms are taken from `summary_terms` (id -> tags) when available.
+    """
+    def __init__(self, media, summary_terms=None):
+        self.size = len(media)
+        self.genre_vocab = {}  # lowercased genre -> column
+        genre_rows = []
+        genre_cols = []
+        for row, item in enumerate(media):
+            for genre in item['genres']:
+                genre_rows.append(row)
+                genre_cols.append(self.genre_vocab.setdefault(genre.lower(), len(self.genre_vocab)))
+        self.genres = np.zeros((self.size, len(self.genre_vocab)), dtype=bool)
+        self.genres[genre_rows, genre_cols] = True
+        self.duration = np.array([item['duration'] for item in media], dtype=np.float64)
+        self.view_count = np.array([item['viewCount'] or 0 for item in media], dtype=np.int64)
+        self.type_vocab = {}
+        self.type_code = np.array(
+            [self.type_vocab.setdefault(item['type'], len(self.type_vocab)) for item in media], dtype=np.int8
+        )
+        self.directors = TagSets(media, 'directors')
+        self.cast = TagSets(media, 'cast')
+        self.summary_tag_vocab = {tag: col for col, tag in enumerate(ALL_MOOD_TAGS)}
+        self.summary_tags = np.zeros((self.size, len(ALL_MOOD_TAGS)), dtype=bool)
+        for row, item in enumerate(media):
+            terms = summary_terms.get(item.get('id')) if summary_terms else None
+            if terms is None:
+                terms = summary_mood_terms(item['summary'])
+            for tag in terms:
+                self.summary_tags[row, self.summary_tag_vocab[tag]] = True
+        self.rows_by_title = {}
+        self.row_by_id = {}
+        for row, item in enumerate(media):
+            self.rows_by_title.setdefault(item['title'], []).append(row)
+            if item.get('id') is not None:
+                self.row_by_id[item['id']] = row
+
+    def rows_for(self, media):
+        """Row numbers of a subset of the media this matrix was built from (matched on id)."""
+        return np.fromiter((self.row_by_id[item['id']] for item in media), dtype=np.int64, count=len(media))
+
+    def genre_match(self, genres, rows):
+        """Items (at `rows`) having any of `genres` (compared against lowercased item genres)."""
+        cols = [self.genre_vocab[g] for g in genres if g in self.genre_vocab]
+        if not cols:
+            return np.zeros(len(rows), dtype=bool)
+        return self.genres[rows][:, cols].any(axis=1)
+
+    def summary_match(self, tags, rows):
+        cols = [self.summary_tag_vocab[t] for t in tags if t in self.summary_tag_vocab]
+        if not cols:
+            return np.zeros(len(rows), dtype=bool)
+        return self.summary_tags[rows][:, cols].any(axis=1)
+
+def time_fit_mask(duration, time_pref):
+    """Vector form of routes.recommend.filter_by_time."""
+    if time_pref == 'under_1h':
+        return duration <= 60
+    elif time_pref == '1_2h':
+        return (duration > 60) & (duration <= 125)
+    elif time_pref == '2plus':
+        return duration > 125
+    return np.ones(len(duration), dtype=bool)
+
+def score_batch(features, user, feedback_map=None, liked=None, disliked=None, surprise=False, rows=None, content_boost=True):
+    """
+    Score many items in one pass. Produces exactly what score_item() returns
+    for each item at `rows` (all items when None), including the order in
+    which surprise mode draws from `random`.
+    """
+    if rows is None:
+        rows = np.arange(features.size)
+    n = len(rows)
+    score = np.zeros(n, dtype=np.int64)
+    # Comfort + Unwatched weighting
+    view_count = features.view_count[rows]
+    if user['comfortMode']:
+        score += 30 * (view_count >= 3)
+    else:
+        score += 10 * (view_count == 0)
+    # Time fit
+    score += np.where(time_fit_mask(features.duration[rows], user['time']), 10, 5)
+    # Mood match
+    user_moods = user.get('moods') or [user.get('mood')] or []
+    mood_tags = []
+    for mood in user_moods:
+        mood_tags.extend(MOOD_TAGS.get(mood, []))
+    mood_genre = features.genre_match(mood_tags, rows)
+    score += np.where(mood_genre, 10, np.where(features.summary_match(mood_tags, rows), 5, 0))
+    # Genre match
+    user_genres = user.get('genres') or []
+    if user_genres:
+        score += 8 * features.genre_match(user_genres, rows)
+    # Format match
+    if user['format'] == 'any':
+        score += 5
+    else:
+        fmt_code = features.type_vocab.get(user['format'], -1)
+        score += 5 * (features.type_code[rows] == fmt_code)
+    # Feedback adjustment
+    if feedback_map:
+        adjust = np.zeros(features.size, dtype=np.int64)
+        for title, fb in feedback_map.items():
+            for row in features.rows_by_title.get(title, ()):
+                if fb == 'up':
+                    adjust[row] = 15
+                elif fb == 'down':
+                    adjust[row] = -20
+        score += adjust[rows]
+    # Content-based filtering (liked genres also count as familiar in surprise mode)
+    liked_genre = features.genre_match(liked['genres'], rows) if liked else None
+    if liked and content_boost:
+        score += 6 * liked_genre
+        if liked['directors']:
+            score += 4 * features.directors.overlaps(liked['directors'])[rows]
+        if liked['cast']:
+            score += 2 * features.cast.overlaps(liked['cast'])[rows]
+    if disliked and content_boost:
+        score -= 8 * features.genre_match(disliked['genres'], rows)
+        if disliked['directors']:
+            score -= 5 * features.directors.overlaps(disliked['directors'])[rows]
+        if disliked['cast']:
+            score -= 3 * features.cast.overlaps(disliked['cast'])[rows]
+    # Surprise logic: draws stay per item, in order, to match score_item exactly
+    if surprise:
+        familiar = mood_genre | liked_genre
+        bonus = np.empty(n, dtype=np.int64)
+        for i in range(n):
+            bonus[i] = random.randint(0, 5)
+            if not familiar[i]:
+                bonus[i] += random.randint(0, 8)
+        score += bonus
+    return score
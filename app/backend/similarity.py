@@ -0,0 +1,283 @@
+import fcntl
+import os
+import time
+import uuid
+import logging
+from datetime import datetime
+from itertools import combinations
+import numpy as np
+from artifacts import ArtifactStore, load_artifact, publish_artifact
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Relative weight of each attribute in an item's similarity vector
+ATTRIBUTE_WEIGHTS = {'genres': 1.0, 'directors': 2.0, 'cast': 1.0}
+# Only top-billed roles say much about what a title is like
+MAX_CAST = 10
+# Co-liked pairs are counted over each session's most recent likes
+MAX_SESSION_LIKES = 50
+# Neighbor boosts are seeded from the session's most recent votes
+MAX_SEEDS = 50
+
+def _popularity_order(media):
+    """Row numbers, most watched (then best rated) first."""
+    views = np.array([item['viewCount'] or 0 for item in media], dtype=np.int64)
+    ratings = np.array([item.get('rating') or 0 for item in media], dtype=np.float64)
+    return np.lexsort((np.arange(len(media)), -ratings, -views))
+
+def _csr(keys, values, weights, size):
+    """Group (key, value, weight) triples by key: (offsets, values, weights) with key i at offsets[i]:offsets[i+1]."""
+    order = np.argsort(keys, kind='stable')
+    offsets = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=size), out=offsets[1:])
+    return offsets, values[order], weights[order]
+
+def co_like_pairs(likes_by_session):
+    """
+    Co-like cosine between items: for each pair liked in the same session,
+    sessions liking both / sqrt(sessions liking each). Returns {id: {id: value}}.
+    """
+    like_counts = {}
+    pair_counts = {}
+    for liked in likes_by_session:
+        liked = sorted(set(liked[-MAX_SESSION_LIKES:]))
+        for media_id in liked:
+            like_counts[media_id] = like_counts.get(media_id, 0) + 1
+        for pair in combinations(liked, 2):
+            pair_counts[pair] = pair_counts.get(pair, 0) + 1
+    co_liked = {}
+    for (a, b), count in pair_counts.items():
+        value = count / np.sqrt(like_counts[a] * like_counts[b])
+        co_liked.setdefault(a, {})[b] = value
+        co_liked.setdefault(b, {})[a] = value
+    return co_liked
+
+def build_neighbors(media, co_liked=None, k=20, max_tag_items=1000, co_like_weight=0.5):
+    """
+    Top-k most similar items for every item in `media` (catalog dicts).
+
+    Items are IDF-weighted, L2-normalised sparse vectors over genres,
+    directors and top-billed cast; similarity is their cosine plus
+    co_like_weight times the co-like cosine from `co_liked` (see
+    co_like_pairs). Tags on more than max_tag_items items (genres, mostly)
+    are too common to find candidates through, so candidates come from the
+    rarer tags, the co-likes and the most popular items sharing the item's
+    common tags; every candidate is then scored on its full vector.
+
+    Returns (ids, neighbors, scores): media ids in row order, an (n, k) int32
+    array of neighbor rows (-1 where an item has fewer than k) and their
+    float32 similarities, best first.
+    """
+    n = len(media)
+    ids = np.array([item['id'] for item in media], dtype=np.int64)
+    neighbors = np.full((n, k), -1, dtype=np.int32)
+    scores = np.zeros((n, k), dtype=np.float32)
+    if n < 2:
+        return ids, neighbors, scores
+    vocab = {}
+    rows, cols, attr_weights = [], [], []
+    for row, item in enumerate(media):
+        for attr, weight in ATTRIBUTE_WEIGHTS.items():
+            tags = item.get(attr) or []
+            if attr == 'genres':
+                tags = [t.lower() for t in tags]
+            elif attr == 'cast':
+                tags = tags[:MAX_CAST]
+            for tag in set(tags):
+                rows.append(row)
+                cols.append(vocab.setdefault((attr, tag), len(vocab)))
+                attr_weights.append(weight)
+    rows = np.array(rows, dtype=np.int64)
+    cols = np.array(cols, dtype=np.int64)
+    df = np.bincount(cols, minlength=len(vocab))
+    weights = np.array(attr_weights) * np.log1p(n / df[cols])
+    norms = np.sqrt(np.bincount(rows, weights=weights ** 2, minlength=n))
+    weights = (weights / np.where(norms > 0, norms, 1)[rows]).astype(np.float32)
+
+    # Common tags: a small dense block scored with a dot product
+    common = df > max_tag_items
+    common_col = np.cumsum(common) - 1
+    is_common = common[cols]
+    dense = np.zeros((n, int(common.sum())), dtype=np.float32)
+    dense[rows[is_common], common_col[cols[is_common]]] = weights[is_common]
+    # Rare tags: postings per tag, and the same entries grouped per row
+    rare_rows, rare_cols, rare_weights = rows[~is_common], cols[~is_common], weights[~is_common]
+    tag_offsets, tag_rows, tag_weights = _csr(rare_cols, rare_rows, rare_weights, len(vocab))
+    row_offsets, row_cols, row_weights = _csr(rare_rows, rare_cols, rare_weights, n)
+
+    # Popular items per common tag and per exact common-tag signature
+    popular = _popularity_order(media)
+    signatures = [tuple(np.flatnonzero(dense[row]).tolist()) for row in range(n)]
+    by_signature = {}
+    by_common_tag = {}
+    for row in popular.tolist():
+        group = by_signature.setdefault(signatures[row], [])
+        if len(group) <= 2 * k:
+            group.append(row)
+        for col in signatures[row]:
+            group = by_common_tag.setdefault(col, [])
+            if len(group) <= k:
+                group.append(row)
+    by_signature = {sig: np.array(group, dtype=np.int64) for sig, group in by_signature.items()}
+    by_common_tag = {col: np.array(group, dtype=np.int64) for col, group in by_common_tag.items()}
+
+    id_list = ids.tolist()
+    row_by_id = {media_id: row for row, media_id in enumerate(id_list)}
+    empty = np.zeros(0, dtype=np.int64)
+    for row in range(n):
+        own_cols = row_cols[row_offsets[row]:row_offsets[row + 1]]
+        own_weights = row_weights[row_offsets[row]:row_offsets[row + 1]]
+        postings = [tag_rows[tag_offsets[c]:tag_offsets[c + 1]] for c in own_cols]
+        rare_items = np.concatenate(postings) if postings else empty
+        rare_products = np.concatenate([
+            own_weights[i] * tag_weights[tag_offsets[c]:tag_offsets[c + 1]] for i, c in enumerate(own_cols)
+        ]) if postings else np.zeros(0, dtype=np.float32)
+        co_rows, co_values = empty, np.zeros(0)
+        liked_with = co_liked.get(id_list[row]) if co_liked else None
+        if liked_with:
+            pairs = [(row_by_id[m], v) for m, v in liked_with.items() if m in row_by_id]
+            if pairs:
+                co_rows = np.array([r for r, _ in pairs], dtype=np.int64)
+                co_values = np.array([v for _, v in pairs])
+        popular_items = [by_signature[signatures[row]]] + [by_common_tag[c] for c in signatures[row]]
+        candidates, inverse = np.unique(
+            np.concatenate([rare_items, co_rows] + popular_items), return_inverse=True
+        )
+        score = dense[candidates] @ dense[row]
+        score += np.bincount(inverse[:len(rare_items)], weights=rare_products, minlength=len(candidates))
+        if len(co_rows):
+            score += co_like_weight * np.bincount(
+                inverse[len(rare_items):len(rare_items) + len(co_rows)], weights=co_values, minlength=len(candidates)
+            )
+        score[candidates == row] = -1
+        top = min(k, len(candidates) - 1)
+        if top <= 0:
+            continue
+        best = np.argpartition(-score, top - 1)[:top]
+        best = best[np.lexsort((candidates[best], -score[best]))]
+        best = best[score[best] > 0]
+        neighbors[row, :len(best)] = candidates[best]
+        scores[row, :len(best)] = score[best]
+    return ids, neighbors, scores
+
+def likes_by_session(session):
+    """Media ids each session currently likes (latest vote per title wins), oldest first."""
+    from database import Feedback, Recommendation
+    from trainer import feedback_label
+    votes = {}
+    rows = (
+        session.query(Recommendation.group_size, Recommendation.media_id, Feedback.rating, Feedback.would_watch_again)
+        .select_from(Feedback).join(Recommendation)
+        .order_by(Feedback.id)
+    )
+    for session_id, media_id, rating, would_watch_again in rows:
+        label = feedback_label(rating, would_watch_again)
+        if label is not None:
+            session_votes = votes.setdefault(session_id, {})
+            session_votes.pop(media_id, None)
+            session_votes[media_id] = label
+    return [[m for m, label in session_votes.items() if label == 1] for session_votes in votes.values()]
+
+def rebuild_similarity():
+    """
+    Rebuild the neighbor table from the Media table and the feedback history
+    and publish it. Runs in the trainer process after syncs and training;
+    a lock file serialises builds started from different workers.
+    """
+    from catalog import media_to_dict
+    from database import get_session, catalog_media, Media
+    directory = Config.SIMILAR_DIR
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, '.build.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        session = get_session()
+        try:
+            media = [media_to_dict(m) for m in session.query(Media).filter(catalog_media()).order_by(Media.id)]
+            co_liked = co_like_pairs(likes_by_session(session))
+        finally:
+            session.close()
+        started = time.perf_counter()
+        ids, neighbors, scores = build_neighbors(
+            media, co_liked, k=Config.SIMILAR_NEIGHBORS, max_tag_items=Config.SIMILAR_MAX_TAG_ITEMS,
+            co_like_weight=Config.SIMILAR_CO_LIKE_WEIGHT,
+        )
+        version = f"v{datetime.utcnow():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:6]}"
+        meta = {
+            'version': version,
+            'built_at': datetime.utcnow().isoformat(),
+            'items': len(ids),
+            'neighbors': Config.SIMILAR_NEIGHBORS,
+            'co_liked_items': len(co_liked),
+            'seconds': round(time.perf_counter() - started, 3),
+        }
+        publish_artifact(directory, version, {'ids': ids, 'neighbors': neighbors, 'scores': scores}, meta, keep=2)
+    logger.info(f"Built similarity table {version}: {len(ids)} items in {meta['seconds']}s")
+    return meta
+
+class NeighborTable:
+    """A published neighbor table (arrays memory-mapped); lookups cost O(k)."""
+    def __init__(self, path):
+        self.path = path
+        self.meta, arrays = load_artifact(path, ['ids', 'neighbors', 'scores'])
+        self.version = self.meta['version']
+        self.ids = arrays['ids']
+        self.neighbors = arrays['neighbors']
+        self.scores = arrays['scores']
+        self.row_by_id = {media_id: row for row, media_id in enumerate(self.ids.tolist())}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def similar(self, media_id):
+        """[(media id, similarity)] for an item's neighbors, best first; [] for an unknown id."""
+        row = self.row_by_id.get(media_id)
+        if row is None:
+            return []
+        rows = self.neighbors[row]
+        found = rows >= 0
+        return list(zip(self.ids[rows[found]].tolist(), self.scores[row][found].tolist()))
+
+class NeighborStore(ArtifactStore):
+    """
+    The current neighbor table for this process, plus per-request boosts:
+    neighbors of the session's liked titles score higher, neighbors of its
+    disliked titles lower.
+    """
+    def __init__(self, directory, reload_interval=10):
+        super().__init__(directory, NeighborTable, reload_interval)
+        self._catalog_rows = (None, None, None)  # (catalog version, table version, table row -> catalog row)
+
+    def catalog_rows(self, table, catalog):
+        catalog_version, table_version, mapping = self._catalog_rows
+        if catalog_version != catalog.version or table_version != table.version:
+            mapping = np.fromiter(
+                (catalog.row_for_id(media_id) for media_id in table.ids.tolist()), dtype=np.int64, count=len(table)
+            )
+            self._catalog_rows = (catalog.version, table.version, mapping)
+        return mapping
+
+    def _seed_boost(self, table, mapping, seed_ids, weight, size):
+        boost = np.zeros(size, dtype=np.int64)
+        seeds = [table.row_by_id[m] for m in seed_ids[-MAX_SEEDS:] if m in table.row_by_id]
+        if not seeds:
+            return boost
+        neighbor_rows = table.neighbors[seeds].ravel()
+        values = np.rint(weight * table.scores[seeds].ravel()).astype(np.int64)
+        catalog_rows = np.where(neighbor_rows >= 0, mapping[neighbor_rows], -1)
+        found = catalog_rows >= 0
+        np.maximum.at(boost, catalog_rows[found], values[found])
+        return boost
+
+    def catalog_bonus(self, catalog, liked_ids, disliked_ids, weight):
+        """Score adjustment for every catalog item (row order), or None when there is nothing to add."""
+        table = self.current()
+        if table is None or not weight or not (liked_ids or disliked_ids):
+            return None
+        mapping = self.catalog_rows(table, catalog)
+        return (
+            self._seed_boost(table, mapping, liked_ids, weight, len(catalog))
+            - self._seed_boost(table, mapping, disliked_ids, weight, len(catalog))
+        )
+
+NEIGHBOR_STORE = NeighborStore(Config.SIMILAR_DIR, Config.MODEL_RELOAD_SECONDS)
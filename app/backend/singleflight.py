@@ -0,0 +1,91 @@
+import asyncio
+import threading
+from metrics import REGISTRY
+
+_GROUPS = {}
+
+class SingleFlight:
+    """
+    Per-key call coalescing: while fn() runs for a key, other callers of
+    do() with that key wait and get its result (or its exception) instead of
+    running it again. do() returns (value, shared), shared being True for
+    the callers that waited. Nothing is kept once the call finishes; this is for
+    identical concurrent work, caching is the caller's business. Process
+    local: gunicorn workers each coalesce their own requests.
+    """
+    def __init__(self, name):
+        self.name = name
+        self._calls = {}  # key -> {'done': Event, 'value': ..., 'error': Exception}
+        self._lock = threading.Lock()
+        self._stats = {'executed': 0, 'coalesced': 0, 'errors': 0}
+        _GROUPS[name] = self
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {'done': threading.Event(), 'value': None, 'error': None}
+                self._stats['executed'] += 1
+            else:
+                self._stats['coalesced'] += 1
+        if not leader:
+            call['done'].wait()
+            if call['error'] is not None:
+                raise call['error']
+            return call['value'], True
+        try:
+            call['value'] = fn()
+        except Exception as e:
+            call['error'] = e
+            with self._lock:
+                self._stats['errors'] += 1
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call['done'].set()
+        return call['value'], False
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, inflight=len(self._calls))
+
+class AsyncSingleFlight:
+    """
+    SingleFlight for coroutines on one event loop (the ASGI mode). The call
+    runs as its own task, so it finishes for the others even if the request
+    that started it is cancelled.
+    """
+    def __init__(self, name):
+        self.name = name
+        self._tasks = {}  # key -> Task
+        self._stats = {'executed': 0, 'coalesced': 0, 'errors': 0}
+        _GROUPS[name] = self
+
+    def _finished(self, key, task):
+        self._tasks.pop(key, None)
+        if not task.cancelled() and task.exception() is not None:
+            self._stats['errors'] += 1
+
+    async def do(self, key, coro_fn):
+        task = self._tasks.get(key)
+        shared = task is not None
+        if not shared:
+            task = self._tasks[key] = asyncio.ensure_future(coro_fn())
+            task.add_done_callback(lambda t: self._finished(key, t))
+            self._stats['executed'] += 1
+        else:
+            self._stats['coalesced'] += 1
+        return await asyncio.shield(task), shared
+
+    def stats(self):
+        return dict(self._stats, inflight=len(self._tasks))
+
+def _group_stat(stat):
+    return lambda: {(name,): group.stats()[stat] for name, group in list(_GROUPS.items())}
+
+REGISTRY.collected('moodie_singleflight_executed_total', 'Calls that ran, per single-flight group.', ('group',), _group_stat('executed'), kind='counter')
+REGISTRY.collected('moodie_singleflight_coalesced_total', 'Calls that waited for an identical call in flight instead of running.', ('group',), _group_stat('coalesced'), kind='counter')
+REGISTRY.collected('moodie_singleflight_errors_total', 'Coalesced calls that raised (every waiter got the error).', ('group',), _group_stat('errors'), kind='counter')
+REGISTRY.collected('moodie_singleflight_inflight', 'Keys with a call currently running.', ('group',), _group_stat('inflight'))
@@ -0,0 +1,135 @@
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+from flask import request, send_file, abort
+from config import Config
+
+try:
+    import brotli
+except ImportError:  # optional: without it only .gz variants are written
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Precompressed variants, in order of preference, and the file suffix each is stored under
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+# Only text formats are worth compressing; images and fonts already are
+COMPRESSIBLE = ('.html', '.js', '.css', '.json', '.txt', '.svg', '.xml', '.map', '.ico', '.webmanifest')
+
+def file_etag(path):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def cache_control(rel):
+    # Everything under _next/static has a content hash in its name, so a given URL never changes
+    if rel.startswith('_next/static/'):
+        return 'public, max-age=31536000, immutable'
+    if rel.endswith('.html'):
+        return 'no-cache'  # always revalidate, so a deploy shows up on the next load
+    return f'public, max-age={Config.FRONTEND_MAX_AGE}'
+
+class StaticAsset:
+    def __init__(self, path, rel, encodings):
+        self.path = path
+        self.cache_control = cache_control(rel)
+        self.encodings = encodings  # content-coding -> path of the precompressed file
+        self.mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.etag = file_etag(path)
+        self.mtime = os.path.getmtime(path)
+
+class StaticIndex:
+    """
+    The exported frontend (moodie-next/out), walked once at startup: every
+    file with its mimetype, content ETag and any .br/.gz sibling. Requests
+    are a dict lookup and a sendfile; nothing touches the directory tree.
+    Rebuild the frontend, then restart the workers to pick it up.
+    """
+    def __init__(self, root):
+        self.root = root
+        self.assets = {}
+        if not os.path.isdir(root):
+            logger.warning(f"Frontend build not found at {root}; static routes will 404")
+            return
+        suffixes = tuple(suffix for _, suffix in ENCODINGS)
+        for directory, _, files in os.walk(root):
+            names = set(files)
+            for name in files:
+                if name.endswith(suffixes):
+                    continue
+                path = os.path.join(directory, name)
+                encodings = {encoding: path + suffix for encoding, suffix in ENCODINGS if name + suffix in names}
+                rel = os.path.relpath(path, root).replace(os.sep, '/')
+                self.assets[rel] = StaticAsset(path, rel, encodings)
+        logger.info(f"Indexed {len(self.assets)} frontend files from {root}")
+
+    def lookup(self, path):
+        """Asset for a URL path; extensionless routes map to Next's exported <route>.html or <route>/index.html."""
+        path = path.strip('/')
+        if not path:
+            return self.assets.get('index.html')
+        for candidate in (path, f'{path}.html', f'{path}/index.html'):
+            asset = self.assets.get(candidate)
+            if asset is not None:
+                return asset
+        return None
+
+def serve(index, path):
+    asset = index.lookup(path)
+    if asset is None:
+        abort(404)
+    accepted = request.accept_encodings
+    encoding = next((e for e, _ in ENCODINGS if e in asset.encodings and accepted.quality(e) > 0), None)
+    if encoding:
+        response = send_file(asset.encodings[encoding], mimetype=asset.mimetype, etag=f'{asset.etag}-{encoding}',
+                             last_modified=asset.mtime, conditional=True)
+        response.headers['Content-Encoding'] = encoding
+    else:
+        response = send_file(asset.path, mimetype=asset.mimetype, etag=asset.etag,
+                             last_modified=asset.mtime, conditional=True)
+    if asset.encodings:
+        response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = asset.cache_control
+    return response
+
+def precompress(root, min_bytes=1024):
+    """Write .br (when Brotli is installed) and .gz siblings for the text files of a frontend build."""
+    written = 0
+    for directory, _, files in os.walk(root):
+        for name in files:
+            if not name.endswith(COMPRESSIBLE):
+                continue
+            path = os.path.join(directory, name)
+            with open(path, 'rb') as f:
+                data = f.read()
+            if len(data) < min_bytes:
+                continue
+            variants = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+            if brotli is not None:
+                variants.append(('.br', brotli.compress(data, quality=11)))
+            for suffix, compressed in variants:
+                if len(compressed) < len(data):
+                    with open(path + suffix, 'wb') as f:
+                        f.write(compressed)
+                    written += 1
+                elif os.path.exists(path + suffix):
+                    os.remove(path + suffix)  # left over from an earlier build
+    return written
+
+def init_app(app):
+    """Index the frontend build and route / and every unclaimed path to it."""
+    index = StaticIndex(app.config.get('FRONTEND_PATH', Config.FRONTEND_PATH))
+
+    @app.route('/')
+    def serve_index():
+        return serve(index, '')
+
+    @app.route('/<path:path>')
+    def serve_static(path):
+        return serve(index, path)
+
+    return index
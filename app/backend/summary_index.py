@@ -0,0 +1,40 @@
+import threading
+from mood_tags import ALL_MOOD_TAGS
+
+def summary_mood_terms(summary):
+    """Mood tags occurring in a summary, with score_item's substring semantics."""
+    text = (summary or '').lower()
+    return frozenset(tag for tag in ALL_MOOD_TAGS if tag in text)
+
+class SummaryIndex:
+    """
+    Mood terms found in each media summary, keyed by Media.id. Entries remember
+    the content hash they were computed from, so refreshing after a sync only
+    rescans summaries of rows that changed. Lives for the whole process and is
+    shared by successive catalog versions.
+    """
+    def __init__(self):
+        self._entries = {}  # Media.id -> (content key, terms)
+        self._interned = {}  # identical term sets share one frozenset
+        self._lock = threading.Lock()
+
+    def refresh(self, rows):
+        """
+        Bring the index in line with `rows` (id, content key, summary) and drop
+        ids no longer present. Returns (terms by id, number of rescanned rows).
+        """
+        with self._lock:
+            entries = {}
+            scanned = 0
+            for media_id, key, summary in rows:
+                entry = self._entries.get(media_id)
+                if entry is None or entry[0] != key:
+                    terms = summary_mood_terms(summary)
+                    entry = (key, self._interned.setdefault(terms, terms))
+                    scanned += 1
+                entries[media_id] = entry
+            self._entries = entries
+            return {media_id: terms for media_id, (_, terms) in entries.items()}, scanned
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,23 @@
+"""
+Tests run offline from app/backend (`python -m pytest`). The app reads its
+database URL and data directories at import time, so they are pointed at a
+scratch directory before any app module is imported.
+"""
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+_TMPDIR = tempfile.mkdtemp(prefix='moodie-tests-')
+atexit.register(shutil.rmtree, _TMPDIR, True)
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_TMPDIR, 'app.db')}"
+os.environ['RECOMMEND_CACHE_BACKEND'] = 'memory'
+os.environ['RECOMMEND_CACHE_PATH'] = os.path.join(_TMPDIR, 'cache.db')
+os.environ['MODEL_DIR'] = os.path.join(_TMPDIR, 'models')
+os.environ['SIMILAR_DIR'] = os.path.join(_TMPDIR, 'similar')
+os.environ['POSTER_CACHE_DIR'] = os.path.join(_TMPDIR, 'posters')
+os.environ['PLEX_SYNC_LOCK_PATH'] = os.path.join(_TMPDIR, 'plex_sync.lock')
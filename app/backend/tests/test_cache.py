@@ -0,0 +1,52 @@
+import sqlite3
+import time
+import pytest
+from cache import CacheBackend, DiskLRUCache, MemoryCache, SQLiteCache
+
+def test_reads_do_not_wait_for_writers(tmp_path):
+    cache = SQLiteCache(str(tmp_path / 'cache.db'), ttl=600)
+    cache.set('k', {'page': 1}, tags=('session',))
+    writer = sqlite3.connect(cache.path, isolation_level=None)
+    writer.execute('BEGIN IMMEDIATE')
+    try:
+        started = time.perf_counter()
+        assert cache.get('k') == {'page': 1}
+        assert cache.get('missing') is None
+        assert time.perf_counter() - started < 1
+    finally:
+        writer.execute('ROLLBACK')
+        writer.close()
+
+def test_access_time_is_touched_once_per_slice_of_ttl(tmp_path):
+    cache = SQLiteCache(str(tmp_path / 'cache.db'), ttl=600)
+    cache.set('k', 1)
+    accessed_at = lambda: cache._conn().execute('SELECT accessed_at FROM cache_entries').fetchone()[0]
+    stored = accessed_at()
+    cache.get('k')
+    assert accessed_at() == stored
+    cache._conn().execute('UPDATE cache_entries SET accessed_at = accessed_at - 120')
+    cache.get('k')
+    assert accessed_at() > stored - 120
+
+def test_expired_entries_are_misses(tmp_path):
+    cache = SQLiteCache(str(tmp_path / 'cache.db'), ttl=600)
+    cache.set('k', 1, ttl=-1)
+    assert cache.get('k') is None
+    cache.set('other', 2)
+    assert len(cache) == 1
+
+def test_invalidate_tag(tmp_path):
+    cache = SQLiteCache(str(tmp_path / 'cache.db'))
+    cache.set('a', 1, tags=('s1',))
+    cache.set('b', 2, tags=('s2',))
+    assert cache.invalidate_tag('s1') == 1
+    assert cache.get('a') is None and cache.get('b') == 2
+
+def test_backends_implement_the_interface(tmp_path):
+    MemoryCache(), SQLiteCache(str(tmp_path / 'cache.db')), DiskLRUCache(str(tmp_path / 'posters'))
+
+    class NoTags(CacheBackend):
+        get = set = delete = clear = __len__ = lambda self, *args, **kwargs: None
+
+    with pytest.raises(TypeError, match='invalidate_tag'):
+        NoTags()
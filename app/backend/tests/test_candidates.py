@@ -0,0 +1,23 @@
+import pytest
+from bench.synthetic import LibraryGenerator, media_dicts
+from candidates import CandidateIndex
+from routes.recommend import filter_media
+
+GENERATOR = LibraryGenerator(seed=5)
+MEDIA = media_dicts(GENERATOR.records(1000))
+INDEX = CandidateIndex(MEDIA)
+
+# Answers the questionnaire never generates but the API accepts
+EDGE_USERS = [
+    {'time': 'binge', 'moods': [], 'genres': [], 'format': 'any'},
+    {'time': 'any', 'moods': ['no-such-mood'], 'genres': ['No Such Genre'], 'format': 'movie'},
+    {'time': None, 'moods': [], 'genres': ['DRAMA', 'comedy'], 'format': 'show'},
+    {},
+]
+
+def ids(items):
+    return [item['id'] for item in items]
+
+@pytest.mark.parametrize('user', GENERATOR.users(50) + EDGE_USERS)
+def test_index_matches_per_item_filter(user):
+    assert ids(filter_media(MEDIA, user, index=INDEX)) == ids(filter_media(MEDIA, user))
@@ -0,0 +1,29 @@
+from datetime import datetime
+import pytest
+from catalog import load_catalog, read_catalog_marker
+from database import Media, get_session, init_db
+from feedback_queue import feedback_event, write_feedback
+
+@pytest.fixture
+def session():
+    init_db()
+    session = get_session()
+    session.query(Media).delete()
+    session.commit()
+    yield session
+    session.close()
+
+def catalog_titles(session):
+    marker = read_catalog_marker(session)
+    return [item['title'] for item in load_catalog(session, marker, 1).items], marker
+
+def test_feedback_placeholders_are_not_catalog_items(session):
+    write_feedback([feedback_event('s1', 'Not Synced Yet', 'up', datetime.utcnow())])
+    assert session.query(Media).filter_by(title='Not Synced Yet').one().plex_id == 'feedback:Not Synced Yet'
+    # Before the first sync the catalog stays empty, so recommendations fall back to live Plex
+    assert catalog_titles(session) == ([], (0, None))
+
+    session.add(Media(plex_id='101', title='Alien', type='movie', genres='Horror', duration=117))
+    session.commit()
+    titles, marker = catalog_titles(session)
+    assert titles == ['Alien'] and marker[0] == 1
@@ -0,0 +1,147 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+import pytest
+from flask import Flask
+import feedback_queue
+from database import Feedback, Media, Recommendation, get_session, init_db
+from feedback_queue import FeedbackWriter, feedback_event, write_feedback
+from routes import recommend
+from routes.recommend import RECOMMEND_CACHE, recommend_bp
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture
+def session():
+    init_db()
+    session = get_session()
+    for model in (Feedback, Recommendation, Media):
+        session.query(model).delete()
+    session.commit()
+    yield session
+    session.close()
+
+@pytest.fixture
+def stalled(monkeypatch):
+    """Holds the writer thread inside write_feedback() until released; records what it was given."""
+    release = threading.Event()
+    written = []
+
+    def write(events):
+        release.wait(10)
+        written.extend(events)
+
+    monkeypatch.setattr(feedback_queue, 'write_feedback', write)
+    yield release, written
+    release.set()
+
+def wait_until_taken(writer):
+    while writer.depth():
+        time.sleep(0.001)
+
+def event(title, session_id='s1'):
+    return feedback_event(session_id, title, 'up', datetime.utcnow())
+
+def test_full_queue_refuses_events(stalled):
+    release, written = stalled
+    writer = FeedbackWriter(max_size=1, batch_size=1, flush_interval=0, enqueue_timeout=0.01)
+    assert writer.submit(event('A'))  # taken by the writer thread, which stalls on it
+    wait_until_taken(writer)
+    assert writer.submit(event('B'))  # fills the queue
+    assert not writer.submit(event('C'))
+    release.set()
+    assert writer.flush(timeout=5)
+    assert [e.title for e in written] == ['A', 'B']
+    writer.close(timeout=5)
+
+def test_full_queue_answers_503_with_retry_after(stalled, monkeypatch):
+    writer = FeedbackWriter(max_size=1, batch_size=1, flush_interval=0, enqueue_timeout=0.01)
+    monkeypatch.setattr(recommend, 'FEEDBACK_WRITER', writer)
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.register_blueprint(recommend_bp)
+    client = app.test_client()
+    statuses = []
+    for title in ('A', 'B', 'C'):
+        response = client.post('/api/v1/feedback', json={'title': title, 'feedback': 'up'})
+        statuses.append(response.status_code)
+        if title == 'A':
+            wait_until_taken(writer)
+    assert statuses == [200, 200, 503]
+    assert response.headers['Retry-After'] == '1'
+    stalled[0].set()
+    writer.close(timeout=5)
+
+def test_close_writes_pending_events(stalled):
+    release, written = stalled
+    writer = FeedbackWriter(batch_size=2, flush_interval=0)
+    for title in 'ABCDE':
+        assert writer.submit(event(title))
+    release.set()
+    writer.close(timeout=5)
+    assert [e.title for e in written] == list('ABCDE')
+    assert not writer._thread.is_alive()
+
+def test_queued_events_are_written_at_exit(session):
+    # A worker exits right after queueing: the atexit hook must write them (once each)
+    script = (
+        "from datetime import datetime\n"
+        "import routes.recommend\n"
+        "from feedback_queue import FEEDBACK_WRITER, feedback_event\n"
+        "for i in range(20):\n"
+        "    assert FEEDBACK_WRITER.submit(feedback_event('at-exit', f'Title {i}', 'up', datetime.utcnow()))\n"
+    )
+    subprocess.run([sys.executable, '-c', script], cwd=BACKEND_DIR, env=os.environ, check=True, timeout=60)
+    assert session.query(Recommendation).filter_by(group_size='at-exit').join(Feedback).count() == 20
+
+def test_cached_pages_are_invalidated_after_commit(session, monkeypatch):
+    RECOMMEND_CACHE.set('page-s1', ('etag', b'{}'), tags=('s1',))
+    RECOMMEND_CACHE.set('page-s2', ('etag', b'{}'), tags=('s2',))
+    invalidate = recommend.invalidate_cache_for_session
+    committed = []
+
+    def check_committed(session_id):
+        # Another connection sees the feedback by the time its session's pages are dropped
+        other = get_session()
+        committed.append(other.query(Feedback).count())
+        other.close()
+        return invalidate(session_id)
+
+    monkeypatch.setattr(recommend, 'invalidate_cache_for_session', check_committed)
+    write_feedback([event('Heat')])
+    assert committed == [1]
+    assert RECOMMEND_CACHE.get('page-s1') is None
+    assert RECOMMEND_CACHE.get('page-s2') is not None
+
+def test_failed_invalidation_does_not_fail_the_write(session, monkeypatch):
+    def fail(session_id):
+        raise RuntimeError('cache file locked')
+
+    monkeypatch.setattr(recommend, 'invalidate_cache_for_session', fail)
+    write_feedback([event('Heat')])
+    assert session.query(Feedback).count() == 1
+
+def test_failed_write_keeps_cached_pages(session, monkeypatch):
+    RECOMMEND_CACHE.set('page-s1', ('etag', b'{}'), tags=('s1',))
+
+    def fail(*args, **kwargs):
+        raise RuntimeError('disk full')
+
+    monkeypatch.setattr(feedback_queue, 'update_profile', fail)
+    with pytest.raises(RuntimeError):
+        write_feedback([event('Heat')])
+    assert RECOMMEND_CACHE.get('page-s1') is not None
+    assert session.query(Feedback).count() == 0
+
+def test_cookieless_feedback_reuses_its_recommendation(session):
+    # Clients without a session cookie send feedback with session id None
+    write_feedback([feedback_event(None, 'Heat', 'up', datetime.utcnow())])
+    write_feedback([feedback_event(None, 'Heat', 'down', datetime.utcnow())])
+    write_feedback([feedback_event(None, 'Heat', 'up', datetime.utcnow()),
+                    feedback_event('s1', 'Heat', 'up', datetime.utcnow())])
+    assert session.query(Recommendation).filter(Recommendation.group_size.is_(None)).count() == 1
+    assert session.query(Recommendation).count() == 2
+    assert session.query(Feedback).count() == 4
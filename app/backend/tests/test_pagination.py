@@ -0,0 +1,94 @@
+import pytest
+from flask import Flask
+from bench.synthetic import LibraryGenerator, media_dicts
+from catalog import Catalog
+from routes import recommend
+from routes.recommend import COMFORT_ITEMS, RECOMMEND_CACHE, SHUFFLE_TOP_N, recommend_bp
+from ranking import RANKING_SNAPSHOTS, decode_cursor, encode_cursor
+from database import init_db
+
+GENERATOR = LibraryGenerator(seed=11)
+CATALOG = Catalog(media_dicts(GENERATOR.records(400)), {}, (400, None), 1)
+USER = dict(time='open', moods=[], genres=[], format='any', comfortMode=False, surprise=False)
+SIZE = 5
+HEAD = SHUFFLE_TOP_N + COMFORT_ITEMS
+
+@pytest.fixture
+def client(monkeypatch):
+    init_db()
+    monkeypatch.setattr(recommend, 'get_catalog', lambda: CATALOG)
+    RECOMMEND_CACHE.clear()
+    RANKING_SNAPSHOTS.cache.clear()
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.register_blueprint(recommend_bp)
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['plex_token'] = 'token'
+    return client
+
+def fetch(client, cursor=None, page=None, user=USER):
+    query = {'size': SIZE}
+    if cursor:
+        query['cursor'] = cursor
+    if page:
+        query['page'] = page
+    return client.post('/api/v1/recommend', json=user, query_string=query)
+
+def titles(response):
+    return [item['title'] for item in response.get_json()['recommendations']]
+
+def pages(client, count, user=USER):
+    """[(cursor used, titles)] for the first `count` pages, following nextCursor."""
+    served, cursor = [], None
+    for _ in range(count):
+        response = fetch(client, cursor, user=user)
+        assert response.status_code == 200
+        served.append((cursor, titles(response)))
+        cursor = response.get_json()['nextCursor']
+    return served
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor('abc123', 40)) == ('abc123', 40)
+
+def test_invalid_cursor(client):
+    assert fetch(client, cursor='not a cursor').status_code == 400
+
+def test_cursor_pages_continue_one_ranking(client):
+    served = [title for _, page_titles in pages(client, 6) for title in page_titles]
+    assert len(served) == 6 * SIZE and len(set(served)) == len(served)
+
+def test_expired_snapshot_inside_shuffled_head(client):
+    cursor = fetch(client).get_json()['nextCursor']
+    assert decode_cursor(cursor)[1] < HEAD
+    RANKING_SNAPSHOTS.cache.clear()
+    response = fetch(client, cursor)
+    assert response.status_code == 410
+    # The restart ranks afresh instead of replaying a cached first page that points at the lost snapshot
+    assert len(RECOMMEND_CACHE) == 0
+
+def test_expired_snapshot_in_surprise_mode(client):
+    surprise = dict(USER, surprise=True)
+    cursor = pages(client, 4, user=surprise)[-1][0]
+    assert decode_cursor(cursor)[1] >= HEAD
+    RANKING_SNAPSHOTS.cache.clear()
+    assert fetch(client, cursor, user=surprise).status_code == 410
+
+def test_expired_snapshot_past_the_head_reranks_the_same_page(client):
+    served = pages(client, 5)
+    cursor, expected = served[-1]
+    assert decode_cursor(cursor)[1] >= HEAD
+    RANKING_SNAPSHOTS.cache.clear()
+    response = fetch(client, cursor)
+    assert response.status_code == 200
+    assert titles(response) == expected
+
+def test_page_numbers_survive_a_page_cache_miss(client):
+    served = pages(client, 3)
+    # Another worker (or an evicted page cache) serves ?page=2 from the snapshot page 1 registered
+    RECOMMEND_CACHE.clear()
+    assert titles(fetch(client, page=2)) == served[1][1]
+    # Page 1 itself ranks afresh on a miss; page 2 then follows the new ranking
+    RECOMMEND_CACHE.clear()
+    first, second = titles(fetch(client, page=1)), titles(fetch(client, page=2))
+    assert not set(first) & set(second)
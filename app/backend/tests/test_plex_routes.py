@@ -0,0 +1,32 @@
+from types import SimpleNamespace
+import pytest
+from flask import Flask
+import plex_background
+from plex_background import PlexBackgroundSync
+from plex_client import PlexClient
+from routes.plex import plex_bp
+
+@pytest.fixture
+def connect(monkeypatch):
+    started = []
+    monkeypatch.setattr(PlexClient, 'connect_via_token', lambda self, token, name: SimpleNamespace(friendlyName='Fake Plex'))
+    monkeypatch.setattr(PlexBackgroundSync, 'start', lambda self: started.append(self.token))
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.config['PLEX_SYNC_ON_CONNECT'] = True
+    app.register_blueprint(plex_bp)
+
+    def connect(sync_token, *user_tokens):
+        monkeypatch.setattr(plex_background, '_background_sync', PlexBackgroundSync(token=sync_token))
+        for token in user_tokens:
+            assert app.test_client().post('/api/v1/plex/connect', json={'token': token}).status_code == 200
+        return started
+    return connect
+
+def test_sync_keeps_the_configured_token(connect):
+    assert connect('server-token', 'alice', 'bob') == ['server-token', 'server-token']
+    assert plex_background.get_background_sync().token == 'server-token'
+
+def test_no_sync_without_a_configured_token(connect, monkeypatch):
+    monkeypatch.setattr(plex_background.Config, 'PLEX_TOKEN', None)
+    assert connect(None, 'alice') == []
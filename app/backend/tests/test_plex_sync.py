@@ -0,0 +1,74 @@
+import pytest
+import trainer
+from bench.fake_plex import SECTIONS, FakePlex
+from database import Media, SyncState, get_session, init_db
+from plex_background import PlexBackgroundSync
+from plex_client import PlexClient
+
+@pytest.fixture
+def fake_plex(monkeypatch):
+    init_db()
+    session = get_session()
+    session.query(Media).delete()
+    session.query(SyncState).delete()
+    session.commit()
+    session.close()
+    fake = FakePlex(size=300, seed=3)
+    monkeypatch.setenv('PLEX_URL', fake.start())
+    yield fake
+    fake.stop()
+
+def synced_ids():
+    session = get_session()
+    try:
+        return {plex_id for (plex_id,) in session.query(Media.plex_id)}
+    finally:
+        session.close()
+
+def library_ids(fake):
+    return {r['plex_id'] for records in fake.records_by_section.values() for r in records}
+
+def test_item_edited_mid_sync_does_not_hide_unfetched_items(fake_plex, monkeypatch):
+    fetch_page = PlexClient.fetch_section_page
+    calls = []
+
+    def fetch_and_edit(self, server, section_key, **kwargs):
+        page = fetch_page(self, server, section_key, **kwargs)
+        calls.append(section_key)
+        if len(calls) == 2:
+            # An item from the first page is edited in Plex: it moves to the end of the updatedAt order
+            fake_plex.records_by_section[str(section_key)][0]['updated_at'] += 10 ** 6
+        return page
+
+    monkeypatch.setattr(PlexClient, 'fetch_section_page', fetch_and_edit)
+    PlexBackgroundSync(token='x', page_size=20)._sync_sections(full=False)
+    assert synced_ids() == library_ids(fake_plex)
+
+def test_more_ties_than_a_page(fake_plex):
+    # A bulk edit: more items share one updatedAt than fit in a page
+    for records in fake_plex.records_by_section.values():
+        for record in records[10:80]:
+            record['updated_at'] = records[10]['updated_at']
+    sync = PlexBackgroundSync(token='x', page_size=20)
+    sync._sync_sections(full=False)
+    assert synced_ids() == library_ids(fake_plex)
+    # Nothing changed since: only the items at each section's watermark are fetched again
+    at_watermark = {}
+    for key, section in SECTIONS.items():
+        records = fake_plex.records_by_section[key]
+        newest = max(r['updated_at'] for r in records)
+        at_watermark[section['title']] = sum(r['updated_at'] == newest for r in records)
+    assert sync._sync_sections(full=False) == at_watermark
+
+def test_similarity_rebuilt_only_when_rows_change(fake_plex, monkeypatch):
+    rebuilds = []
+    monkeypatch.setattr(trainer, 'submit_similarity', lambda: rebuilds.append(1))
+    sync = PlexBackgroundSync(token='x', page_size=50)
+    sync.incremental_sync()
+    assert sync.changes['inserted'] == len(library_ids(fake_plex)) and len(rebuilds) == 1
+    # The items at the watermark are fetched again, but nothing changed
+    sync.incremental_sync()
+    assert not any(sync.changes.values()) and len(rebuilds) == 1
+    fake_plex.touch(2)
+    sync.incremental_sync()
+    assert sync.changes['updated'] == 4 and len(rebuilds) == 2
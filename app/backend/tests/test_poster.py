@@ -0,0 +1,16 @@
+import pytest
+from flask import Flask
+from config import Config
+from routes.poster import poster_bp
+
+@pytest.fixture
+def client(monkeypatch):
+    # The configured token is for the background sync, never for anonymous visitors
+    monkeypatch.setattr(Config, 'PLEX_TOKEN', 'server-token')
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.register_blueprint(poster_bp)
+    return app.test_client()
+
+def test_poster_needs_a_plex_session(client):
+    assert client.get('/api/v1/poster/1').status_code == 401
@@ -0,0 +1,47 @@
+from datetime import datetime
+import json
+import pytest
+import profiles
+from database import PreferenceProfile, SessionLocal, get_session, init_db
+from feedback_queue import feedback_event, write_feedback
+
+@pytest.fixture
+def history():
+    """A session with feedback but no stored profile, as before profiles existed."""
+    init_db()
+    write_feedback([feedback_event('race', 'Heat', 'up', datetime.utcnow())])
+    session = get_session()
+    session.query(PreferenceProfile).filter_by(session_id='race').delete()
+    session.commit()
+    session.close()
+    yield
+    SessionLocal.remove()
+
+def stored_profile():
+    session = get_session()
+    try:
+        return [json.loads(p) for (p,) in session.query(PreferenceProfile.profile).filter_by(session_id='race')]
+    finally:
+        session.close()
+
+def test_lazy_build_is_stored(history):
+    feedback_map, _, _ = profiles.get_preferences('race')
+    assert feedback_map == {'Heat': 'up'}
+    assert [p['titles'] for p in stored_profile()] == [{'Heat': 'up'}]
+
+def test_concurrent_first_requests(history, monkeypatch):
+    build = profiles.profile_from_history
+
+    def build_while_another_request_stores(session, session_id):
+        profile = build(session, session_id)
+        # The other request gets its insert in between this one's read and commit
+        other = get_session()
+        other.add(PreferenceProfile(session_id=session_id, profile=json.dumps(profile)))
+        other.commit()
+        other.close()
+        return profile
+
+    monkeypatch.setattr(profiles, 'profile_from_history', build_while_another_request_stores)
+    feedback_map, _, _ = profiles.get_preferences('race')
+    assert feedback_map == {'Heat': 'up'}
+    assert len(stored_profile()) == 1
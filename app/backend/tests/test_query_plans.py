@@ -0,0 +1,64 @@
+import pytest
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import Session
+from database import Base, get_engine, init_db
+from migrations import MIGRATIONS, applied_versions, migrate
+from query_plans import hot_queries, explain
+
+MIGRATION_INDEXES = {
+    'recommendations': {'ix_recommendations_group_size_media_id', 'ix_recommendations_media_id'},
+    'feedback': {'ix_feedback_recommendation_id'},
+    'media': {'ix_media_title'},
+}
+
+@pytest.fixture
+def engine(tmp_path):
+    return get_engine(f"sqlite:///{tmp_path / 'plans.db'}")
+
+def index_names(engine, table):
+    return {index['name'] for index in inspect(engine).get_indexes(table)}
+
+def test_hot_queries_use_indexes(engine):
+    init_db(engine)
+    session = Session(bind=engine)
+    try:
+        for name, statement in hot_queries(session):
+            lines, scans = explain(session, statement)
+            assert lines, f"No plan for {name}"
+            assert not scans, f"{name} reads a whole table:\n" + '\n'.join(lines)
+    finally:
+        session.rollback()
+        session.close()
+
+def test_migrate_adds_indexes_once(engine):
+    # The schema as create_all() built it before migration 1
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        for names in MIGRATION_INDEXES.values():
+            for name in names:
+                conn.execute(text(f'DROP INDEX {name}'))
+    for table, names in MIGRATION_INDEXES.items():
+        assert not names & index_names(engine, table)
+
+    assert migrate(engine) == [version for version, _, _ in MIGRATIONS]
+    assert migrate(engine) == []
+    for table, names in MIGRATION_INDEXES.items():
+        assert names <= index_names(engine, table)
+    assert applied_versions(engine) == {version for version, _, _ in MIGRATIONS}
+    with engine.connect() as conn:
+        assert conn.execute(text('SELECT count(*) FROM schema_migrations')).scalar() == len(MIGRATIONS)
+
+def test_migrate_marks_feedback_placeholders(engine):
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO media (plex_id, title, type, content_hash, poster_path) VALUES "
+            "('Heat', 'Heat', 'movie', NULL, NULL), "  # created by feedback before the prefix existed
+            "('101', 'Alien', 'movie', 'abc', '/library/metadata/101/thumb/1'), "
+            "('1917', '1917', 'movie', 'def', NULL)"
+        ))
+    migrate(engine)
+    migrate(engine)
+    with engine.connect() as conn:
+        rows = dict(conn.execute(text('SELECT title, plex_id FROM media')).all())
+    assert rows == {'Heat': 'feedback:Heat', 'Alien': '101', '1917': '1917'}
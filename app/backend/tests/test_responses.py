@@ -0,0 +1,44 @@
+import pytest
+from flask import Flask
+import responses
+from config import Config
+from responses import api_response
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    responses.init_app(app)
+
+    @app.route('/api/items')
+    def items():
+        return api_response({'items': list(range(Config.API_COMPRESS_MIN_BYTES))})
+
+    @app.route('/api/small')
+    def small():
+        return api_response({'items': []})
+
+    return app.test_client()
+
+def revalidate(client, path, etag, encoding):
+    return client.get(path, headers={'If-None-Match': etag, 'Accept-Encoding': encoding})
+
+@pytest.mark.parametrize('encoding', ['gzip', 'br'])
+def test_not_modified_keeps_encoding_suffix(client, encoding):
+    if encoding == 'br' and responses.brotli is None:
+        pytest.skip('brotli is not installed')
+    response = client.get('/api/items', headers={'Accept-Encoding': encoding})
+    etag = response.headers['ETag']
+    assert response.headers['Content-Encoding'] == encoding and etag.endswith(f'-{encoding}"')
+    revalidated = revalidate(client, '/api/items', etag, encoding)
+    assert revalidated.status_code == 304
+    assert revalidated.headers['ETag'] == etag
+    assert 'Accept-Encoding' in revalidated.headers['Vary']
+
+def test_not_modified_without_compression(client):
+    etag = client.get('/api/small', headers={'Accept-Encoding': 'gzip'}).headers['ETag']
+    assert '-' not in etag
+    assert revalidate(client, '/api/small', etag, 'gzip').headers['ETag'] == etag
+    # An encoded variant still matches, but a client that no longer accepts it is told the plain tag
+    encoded = client.get('/api/items', headers={'Accept-Encoding': 'gzip'}).headers['ETag']
+    revalidated = revalidate(client, '/api/items', encoded, 'identity')
+    assert revalidated.status_code == 304 and revalidated.headers['ETag'] == encoded.replace('-gzip', '')
@@ -0,0 +1,70 @@
+import random
+import pytest
+from bench.synthetic import LibraryGenerator, media_dicts
+from routes.recommend import score_item
+from scoring import FeatureMatrix, score_batch
+
+GENERATOR = LibraryGenerator(seed=7)
+MEDIA = media_dicts(GENERATOR.records(500))
+FEATURES = FeatureMatrix(MEDIA)
+
+def people(items):
+    return {
+        'genres': set(g for item in items for g in item['genres']),
+        'directors': set(d for item in items for d in item['directors']),
+        'cast': set(c for item in items for c in item['cast']),
+    }
+
+def feedback_inputs(seed):
+    """A session's feedback as get_preferences() returns it: titles rated, liked and disliked attributes."""
+    rng = random.Random(seed)
+    sample = rng.sample(MEDIA, 10)
+    feedback_map = {item['title']: rng.choice(['up', 'down']) for item in sample[:5]}
+    return feedback_map, people(sample[5:8]), people(sample[8:10])
+
+def assert_same_scores(user, feedback_map=None, liked=None, disliked=None, seed=0, content_boost=True):
+    # Surprise mode draws from `random`: both sides must consume it in the same order
+    random.seed(seed)
+    expected = [score_item(item, user, feedback_map, liked, disliked, user['surprise'], content_boost=content_boost)
+                for item in MEDIA]
+    random.seed(seed)
+    actual = score_batch(FEATURES, user, feedback_map, liked, disliked, user['surprise'], content_boost=content_boost).tolist()
+    mismatches = [(MEDIA[i]['title'], e, a) for i, (e, a) in enumerate(zip(expected, actual)) if e != a]
+    assert not mismatches, f"{len(mismatches)} scores differ for {user}, e.g. {mismatches[:3]}"
+
+@pytest.mark.parametrize('user', GENERATOR.users(20))
+def test_questionnaire_without_feedback(user):
+    assert_same_scores(user)
+
+@pytest.mark.parametrize('seed', range(20))
+def test_questionnaire_with_feedback(seed):
+    user = GENERATOR.users(20)[seed]
+    assert_same_scores(user, *feedback_inputs(seed), seed=seed)
+
+@pytest.mark.parametrize('seed', range(10))
+def test_feedback_without_liked_or_disliked(seed):
+    feedback_map, _, _ = feedback_inputs(seed)
+    assert_same_scores(GENERATOR.users(10)[seed], feedback_map, None, None, seed=seed)
+
+@pytest.mark.parametrize('seed', range(10))
+def test_surprise_mode(seed):
+    user = dict(GENERATOR.users(10)[seed], surprise=True)
+    assert_same_scores(user, *feedback_inputs(seed), seed=seed)
+
+@pytest.mark.parametrize('seed', range(10))
+def test_comfort_mode(seed):
+    user = dict(GENERATOR.users(10)[seed], comfortMode=True)
+    assert_same_scores(user, *feedback_inputs(seed), seed=seed)
+
+@pytest.mark.parametrize('seed', range(10))
+def test_without_content_boost(seed):
+    # PERSONAL_BOOST=neighbors: liked/disliked only decide what is familiar to surprise mode
+    user = dict(GENERATOR.users(10)[seed], surprise=seed % 2 == 0)
+    assert_same_scores(user, *feedback_inputs(seed), seed=seed, content_boost=False)
+
+def test_subset_of_rows():
+    rows = FEATURES.rows_for(MEDIA[::7])
+    user = dict(GENERATOR.users(1)[0], comfortMode=True)
+    feedback_map, liked, disliked = feedback_inputs(1)
+    expected = [score_item(item, user, feedback_map, liked, disliked) for item in MEDIA[::7]]
+    assert score_batch(FEATURES, user, feedback_map, liked, disliked, rows=rows).tolist() == expected
@@ -0,0 +1,121 @@
+import threading
+import time
+import pytest
+from flask import Flask
+from bench.synthetic import LibraryGenerator, media_dicts
+from catalog import Catalog
+from database import init_db
+from routes import recommend
+from routes.recommend import LIBRARY_FLIGHT, RECOMMEND_CACHE, RECOMMEND_FLIGHT, recommend_bp
+from singleflight import SingleFlight
+
+CALLERS = 8
+MEDIA = media_dicts(LibraryGenerator(seed=2).records(200))
+USER = {'time': 'open', 'moods': [], 'genres': [], 'format': 'any'}
+
+def concurrently(flight, call, release, callers=CALLERS):
+    """
+    Run call() on `callers` threads and set `release` (which the call in
+    flight waits on) once all the others are waiting for it. Returns
+    ('ok', value) or ('error', exception) per thread.
+    """
+    coalesced = flight.stats()['coalesced']
+    results = [None] * callers
+
+    def run(i):
+        try:
+            results[i] = ('ok', call())
+        except Exception as e:
+            results[i] = ('error', e)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(callers)]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 10
+    while flight.stats()['coalesced'] - coalesced < callers - 1:
+        assert time.monotonic() < deadline, 'callers never joined the call in flight'
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join(10)
+    return results
+
+def test_concurrent_callers_share_one_call():
+    flight, release, calls = SingleFlight('test-shared'), threading.Event(), []
+
+    def fn():
+        calls.append(1)
+        release.wait(10)
+        return object()
+
+    results = concurrently(flight, lambda: flight.do('key', fn), release)
+    assert len(calls) == 1
+    assert len({id(value) for _, (value, _) in results}) == 1
+    assert sorted(shared for _, (_, shared) in results) == [False] + [True] * (CALLERS - 1)
+    assert flight.stats() == {'executed': 1, 'coalesced': CALLERS - 1, 'errors': 0, 'inflight': 0}
+
+def test_exception_reaches_every_waiter():
+    flight, release = SingleFlight('test-error'), threading.Event()
+    error = RuntimeError('Plex unreachable')
+
+    def fn():
+        release.wait(10)
+        raise error
+
+    results = concurrently(flight, lambda: flight.do('key', fn), release)
+    assert results == [('error', error)] * CALLERS
+    assert flight.stats()['errors'] == 1
+    # Nothing is kept: the next call runs again
+    assert flight.do('key', lambda: 'fresh') == ('fresh', False)
+
+@pytest.fixture
+def app():
+    init_db()
+    RECOMMEND_CACHE.clear()
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.register_blueprint(recommend_bp)
+    return app
+
+def client_for(app, **session_values):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session.update(plex_token='token', **session_values)
+    return client
+
+def test_identical_recommend_requests_rank_once(app, monkeypatch):
+    monkeypatch.setattr(recommend, 'get_catalog', lambda: Catalog(MEDIA, {}, (len(MEDIA), None), 1))
+    release, calls = threading.Event(), []
+    build_page = recommend.build_page
+
+    def slow_build_page(*args):
+        calls.append(1)
+        release.wait(10)
+        return build_page(*args)
+
+    monkeypatch.setattr(recommend, 'build_page', slow_build_page)
+    # One session in several tabs: the same cookie on every client
+    cookie = client_for(app).get_cookie('session').value
+    clients = [app.test_client() for _ in range(CALLERS)]
+    for client in clients:
+        client.set_cookie('session', cookie)
+    responses = concurrently(RECOMMEND_FLIGHT, lambda: clients.pop().post('/api/v1/recommend', json=USER), release)
+    assert len(calls) == 1
+    assert [r.status_code for _, r in responses] == [200] * CALLERS
+    assert len({r.get_data() for _, r in responses}) == 1
+
+def test_live_library_fetch_failure_reaches_every_request(app, monkeypatch):
+    # No synced catalog: every session's ranking needs the live library, fetched once for all of them
+    monkeypatch.setattr(recommend, 'get_catalog', lambda: Catalog([], {}, (0, None), 1))
+    release, calls = threading.Event(), []
+
+    def fetch_live_media(token, server_name, user_format):
+        calls.append(1)
+        release.wait(10)
+        raise RuntimeError('Plex unreachable')
+
+    monkeypatch.setattr(recommend, 'fetch_live_media', fetch_live_media)
+    clients = [client_for(app, visitor=i) for i in range(CALLERS)]
+    responses = concurrently(LIBRARY_FLIGHT, lambda: clients.pop().post('/api/v1/recommend', json=USER), release)
+    assert len(calls) == 1
+    assert [(r.status_code, r.get_json()) for _, r in responses] == [(500, {'error': 'Plex unreachable'})] * CALLERS
@@ -0,0 +1,186 @@
+import fcntl
+import json
+import multiprocessing
+import os
+import threading
+import uuid
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import numpy as np
+from artifacts import write_json, publish_artifact
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+def _job_path(job_id):
+    return os.path.join(Config.MODEL_DIR, 'jobs', f'{job_id}.json')
+
+def set_job_status(job_id, status, **fields):
+    job = job_status(job_id) or {'id': job_id}
+    job.update(fields, status=status, updated_at=datetime.utcnow().isoformat())
+    write_json(_job_path(job_id), job)
+    return job
+
+def job_status(job_id):
+    try:
+        with open(_job_path(job_id)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+def feedback_label(rating, would_watch_again):
+    """1 for a liked item, 0 for a disliked one, None when the feedback says neither."""
+    if rating == 1 or would_watch_again is False:
+        return 0
+    if rating == 5 or would_watch_again is True:
+        return 1
+    return None
+
+def training_data(session):
+    """(media dicts, labels) from every feedback event, oldest first."""
+    from catalog import media_to_dict
+    from database import Feedback, Recommendation, Media
+    media = []
+    labels = []
+    rows = (
+        session.query(Media, Feedback.rating, Feedback.would_watch_again)
+        .select_from(Feedback).join(Recommendation).join(Media)
+        .order_by(Feedback.id)
+    )
+    for item, rating, would_watch_again in rows:
+        label = feedback_label(rating, would_watch_again)
+        if label is not None:
+            media.append(media_to_dict(item))
+            labels.append(label)
+    return media, np.array(labels, dtype=np.float32)
+
+def fit_logistic(X, y, l2=1e-2, iterations=500, learning_rate=0.5):
+    """
+    Full-batch gradient descent on class-balanced, L2-regularised log loss.
+    Returns (weights, bias, metrics on the training set).
+    """
+    n, d = X.shape
+    positives = max(float(y.sum()), 1.0)
+    negatives = max(float(n - y.sum()), 1.0)
+    sample_weight = np.where(y == 1, n / (2 * positives), n / (2 * negatives)).astype(np.float32)
+    w = np.zeros(d, dtype=np.float32)
+    b = 0.0
+    for _ in range(iterations):
+        p = 1 / (1 + np.exp(-(X @ w + b)))
+        error = (p - y) * sample_weight
+        w -= learning_rate * (X.T @ error / n + l2 * w)
+        b -= learning_rate * float(error.mean())
+    p = np.clip(1 / (1 + np.exp(-(X @ w + b))), 1e-7, 1 - 1e-7)
+    metrics = {
+        'log_loss': float(-np.mean(y * np.log(p) + (1 - y) * np.log(1 - p))),
+        'accuracy': float(np.mean((p >= 0.5) == (y == 1))),
+    }
+    return w, b, metrics
+
+def train(job_id=None):
+    """
+    Refit the model from the feedback history and publish it. Runs in a
+    trainer process; an exclusive lock file serialises trainers started
+    from different web workers.
+    """
+    from database import get_session
+    from model import feature_vocab, item_features
+    model_dir = Config.MODEL_DIR
+    os.makedirs(model_dir, exist_ok=True)
+    with open(os.path.join(model_dir, '.train.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if job_id:
+            set_job_status(job_id, 'running', started_at=datetime.utcnow().isoformat())
+        session = get_session()
+        try:
+            media, y = training_data(session)
+        finally:
+            session.close()
+        if len(y) < Config.MODEL_MIN_SAMPLES or len(set(y.tolist())) < 2:
+            raise ValueError(
+                f'Not enough feedback to train: {len(y)} labelled events '
+                f'(need {Config.MODEL_MIN_SAMPLES}, with both likes and dislikes)'
+            )
+        vocab = feature_vocab(media)
+        X = item_features(media, vocab)
+        weights, bias, metrics = fit_logistic(X, y)
+        version = f"v{datetime.utcnow():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:6]}"
+        meta = {
+            'version': version,
+            'trained_at': datetime.utcnow().isoformat(),
+            'samples': int(len(y)),
+            'positives': int(y.sum()),
+            'bias': bias,
+            'vocab': vocab,
+            'metrics': metrics,
+        }
+        publish_artifact(model_dir, version, {'weights': weights.astype(np.float32)}, meta, keep=Config.MODEL_KEEP_VERSIONS)
+    logger.info(f"Trained model {version} on {len(y)} feedback events: {metrics}")
+    # The co-liked pairs in the similarity table come from the same feedback
+    run_similarity_job()
+    return meta
+
+def run_training_job(job_id):
+    """Process-pool entry point: train and record the outcome in the job file."""
+    try:
+        meta = train(job_id)
+    except Exception as e:
+        logger.exception("Training failed")
+        set_job_status(job_id, 'failed', error=str(e))
+        return None
+    set_job_status(job_id, 'succeeded', version=meta['version'], samples=meta['samples'], metrics=meta['metrics'])
+    return meta['version']
+
+def run_similarity_job():
+    """Process-pool entry point: rebuild the item-item neighbor table."""
+    from similarity import rebuild_similarity
+    try:
+        return rebuild_similarity()['version']
+    except Exception:
+        logger.exception("Similarity table build failed")
+        return None
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+def get_executor():
+    """
+    One-process pool per web worker, created on first use. Spawned (not
+    forked) so the trainer doesn't inherit the worker's threads, sockets or
+    database connections.
+    """
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn'))
+            _executor_pid = os.getpid()
+        return _executor
+
+def _submit(fn, *args):
+    try:
+        return get_executor().submit(fn, *args)
+    except Exception:
+        # A broken pool (e.g. the trainer process was killed) is rebuilt on the next request
+        global _executor
+        _executor = None
+        raise
+
+def submit_training():
+    """Queue a training run in the trainer process; returns the job record."""
+    job_id = uuid.uuid4().hex
+    job = set_job_status(job_id, 'queued', created_at=datetime.utcnow().isoformat())
+    try:
+        _submit(run_training_job, job_id)
+    except Exception as e:
+        set_job_status(job_id, 'failed', error=str(e))
+        raise
+    return job
+
+def submit_similarity():
+    """Queue a neighbor-table rebuild in the trainer process (after a sync changed the catalog)."""
+    try:
+        _submit(run_similarity_job)
+    except Exception as e:
+        logger.error(f"Could not queue similarity table build: {e}")
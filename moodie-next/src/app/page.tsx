@@ -67,6 +67,7 @@ function App() {
   const [recommendations, setRecommendations] = useState<any[]>([]);
   const [page, setPage] = useState(1);
   const [hasMore, setHasMore] = useState(false);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   // Plex connection state
   const [plexConnected, setPlexConnected] = useState(false);
   const [showPlexForm, setShowPlexForm] = useState(false);
@@ -113,6 +114,7 @@ function App() {
     setRecommendations([]);
     setPage(1);
     setHasMore(false);
+    setNextCursor(null);
     setLoading(true);
     const currentTime = override?.time ?? time;
     const currentMoods = override?.mood ?? selectedMoods;
@@ -150,6 +152,7 @@ function App() {
       recs = recs.map(r => ({ ...r, source: 'primary' }));
       setRecommendations(recs);
       setHasMore(!!data.hasMore);
+      setNextCursor(data.nextCursor ?? null);
       setPage(1);
     } catch (err: any) {
       setError(err.message || 'Failed to fetch recommendations');
@@ -170,7 +173,10 @@ function App() {
       genres: selectedGenres,
     };
     try {
-      const res = await fetch(`/api/v1/recommend?page=${nextPage}&size=3`, {
+      const query = nextCursor
+        ? `cursor=${encodeURIComponent(nextCursor)}&size=3`
+        : `page=${nextPage}&size=3`;
+      const res = await fetch(`/api/v1/recommend?${query}`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -178,6 +184,11 @@ function App() {
         credentials: 'include',
         body: JSON.stringify(payload),
       });
+      if (res.status === 410) {
+        // The ranking behind this list expired: fetch a fresh first page
+        await handleSubmit();
+        return;
+      }
       if (!res.ok) {
         throw new Error(`Error: ${res.status}`);
       }
@@ -191,6 +202,7 @@ function App() {
       recs = recs.map(r => ({ ...r, source: 'primary' }));
       setRecommendations(prev => [...prev, ...recs]);
       setHasMore(!!data.hasMore);
+      setNextCursor(data.nextCursor ?? null);
       setPage(nextPage);
     } catch (err: any) {
       setError(err.message || 'Failed to fetch recommendations');